@@ -0,0 +1,72 @@
+""" Measures the overhead of a monitored method call against a plain one,
+across arities, keyword arguments, and kinds of arguments.
+
+Run from the repository root:
+
+    python benchmarks/bench_calls.py
+"""
+import suite
+
+from pydyty.monitor import Monitored  # noqa
+
+
+class Point(object):
+
+    def __init__(self):
+        self.x = 1
+
+
+def _methods():
+    def arity0(self):
+        return 0
+
+    def arity1(self, a):
+        return a
+
+    def arity3(self, a, b, c):
+        return a
+
+    def kwargs(self, a, b=None, c=None):
+        return a
+
+    def varargs(self, *args, **kwargs):
+        return len(args)
+
+    return dict((f.__name__, f) for f in
+                (arity0, arity1, arity3, kwargs, varargs))
+
+
+Plain = type('Plain', (object,), _methods())
+Recorded = type(Monitored)('Recorded', (Monitored,), _methods())
+
+
+def cases(obj):
+    p = Point()
+    return {
+        'arity0': lambda: obj.arity0(),
+        'arity1': lambda: obj.arity1(1),
+        'arity3': lambda: obj.arity3(1, 'a', None),
+        'kwargs': lambda: obj.kwargs(1, b='a', c=None),
+        'varargs': lambda: obj.varargs(1, 'a', c=None),
+        'object': lambda: obj.arity1(p),
+        'objects': lambda: obj.arity3(p, p, p),
+    }
+
+
+def run(number=20000):
+    results = {}
+    for prefix, cls in (('plain', Plain), ('monitored', Recorded)):
+        for name, call in cases(cls()).items():
+            results['%s %s' % (prefix, name)] = suite.usec(call, number)
+    for name in cases(None):
+        results['overhead %s' % name] = (results['monitored %s' % name] -
+                                         results['plain %s' % name])
+    return results
+
+
+def main():
+    suite.report(run(), 'usec/call')
+
+
+if __name__ == '__main__':
+    main()
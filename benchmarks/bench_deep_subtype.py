@@ -0,0 +1,86 @@
+""" Measures Typing.is_subtype on deeply nested object types, with the
+subtype cache enabled and disabled.
+
+The methods of a level share their result type, so a check visits
+width ** depth methods when nothing is remembered, but only `width` per
+level when the comparisons of shared types are. The cached check must
+therefore beat the uncached one, by more as the depth grows; check()
+reports the depths where it does not. Deeper types are checked fewer
+times, so every depth takes about as long.
+
+Run from the repository root:
+
+    python benchmarks/bench_deep_subtype.py
+"""
+from __future__ import print_function
+
+import sys
+
+import suite
+
+from pydyty import types  # noqa
+from pydyty.typing import Typing  # noqa
+
+DEPTHS = (2, 4, 6, 8, 10)
+WIDTH = 2
+
+
+def nested(depth, width=WIDTH):
+    """ Returns an object type whose methods return object types, `depth`
+    levels deep. The methods of a level share their result type."""
+    leaf = types.NominalType('Leaf')
+    t = leaf
+    for level in range(depth):
+        attrs = {'x': leaf}
+        for i in range(width):
+            attrs['m%d' % i] = types.MethodType([leaf], {}, t)
+        t = types.ObjectType(attrs)
+    return t
+
+
+def run(number=200):
+    results = {}
+    prev = Typing.cache_size
+    try:
+        for depth in DEPTHS:
+            left, right = nested(depth), nested(depth)
+            call = lambda: Typing.is_subtype(left, right)  # noqa
+            checks = max(1, number * WIDTH ** DEPTHS[0] // WIDTH ** depth)
+            for name, size in (('uncached', 0), ('cached', prev or 4096)):
+                Typing.cache_size = size
+                Typing.clear_cache()
+                results['%s %d' % (name, depth)] = suite.usec(call, checks)
+    finally:
+        Typing.cache_size = prev
+        Typing.clear_cache()
+    return results
+
+
+def check(results):
+    """ Returns the depths at which the cached check is not faster than
+    the uncached one. At the smallest depth there is too little to share
+    for the difference to stand out from noise."""
+    return ['cached check not faster than uncached at depth %d' % depth
+            for depth in DEPTHS[1:]
+            if results['cached %d' % depth] >=
+            results['uncached %d' % depth]]
+
+
+def main():
+    results = run()
+    names = ['%s %d' % (name, depth) for name in ('uncached', 'cached')
+             for depth in DEPTHS]
+    suite.report(results, 'usec/check', names)
+    print()
+    speedups = dict(('speedup %d' % depth,
+                     results['uncached %d' % depth] /
+                     results['cached %d' % depth]) for depth in DEPTHS)
+    suite.report(speedups, 'x', ['speedup %d' % depth for depth in DEPTHS])
+    problems = check(results)
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+""" Compares the steady-state cost of a call to a plain method, a
+monitored method, and a monitored method that has been frozen.
+
+Run from the repository root:
+
+    python benchmarks/bench_freeze.py
+"""
+import suite
+
+from pydyty.monitor import Monitored  # noqa
+
+
+class Point(object):
+
+    def __init__(self):
+        self.x = 1
+
+
+class Plain(object):
+
+    def norm(self, p, scale):
+        return scale
+
+
+class Recorded(Monitored):
+
+    def norm(self, p, scale):
+        return scale
+
+
+class Frozen(Monitored):
+    __pydyty_freeze__ = 16
+
+    def norm(self, p, scale):
+        return scale
+
+
+def run(number=50000):
+    p = Point()
+    results = {}
+    for cls in (Plain, Recorded, Frozen):
+        obj = cls()
+        for _ in range(32):
+            obj.norm(p, 2)
+        call = lambda: obj.norm(p, 2)  # noqa
+        results[cls.__name__.lower()] = suite.usec(call, number)
+    return results
+
+
+def main():
+    suite.report(run(), 'usec/call', ('plain', 'recorded', 'frozen'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+""" Measures ObjectType.add_attr as the intersection type of an attribute
+grows, for a new signature and for one that is already a member.
+
+Run from the repository root:
+
+    python benchmarks/bench_intersection.py
+"""
+import suite
+
+from pydyty import types  # noqa
+
+SIZES = (1, 4, 16, 64)
+
+
+def signature(i):
+    arg = types.NominalType('C%d' % i)
+    return types.MethodType.of([arg], {}, arg)
+
+
+def run(number=200):
+    results = {}
+    for size in SIZES:
+        sigs = [signature(i) for i in range(size + 1)]
+        obj_t = types.ObjectType()
+        for sig in sigs[:size]:
+            obj_t.add_attr('m', sig)
+
+        def existing():
+            obj_t.add_attr('m', sigs[size - 1])
+
+        def grow():
+            o_t = types.ObjectType()
+            for sig in sigs:
+                o_t.add_attr('m', sig)
+
+        results['existing %d' % size] = suite.usec(existing, number * 10)
+        results['grow %d' % size] = suite.usec(grow, number,
+                                               ops=len(sigs))
+    return results
+
+
+def main():
+    results = run()
+    names = sorted(results, key=lambda name: (name.split()[0],
+                                              int(name.split()[1])))
+    suite.report(results, 'usec/add_attr', names)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+""" Compares the overhead of a monitored call that records call sites in
+frame capture mode against traceback capture mode.
+
+Run from the repository root:
+
+    python benchmarks/bench_location.py
+"""
+from __future__ import print_function
+
+import suite
+
+from pydyty import loc  # noqa
+from pydyty.object_wrapper import ObjectWrapper  # noqa
+
+
+class Point(object):
+
+    def __init__(self):
+        self.x = 1
+
+    def norm(self, scale):
+        return self.x * scale
+
+
+def run(number=20000):
+    wrapper = ObjectWrapper(Point())
+
+    def call():
+        wrapper.norm(2)
+
+    results = {}
+    for mode in (loc.CAPTURE_TRACEBACK, loc.CAPTURE_FRAME):
+        prev = loc.set_capture_mode(mode)
+        try:
+            results[mode] = suite.usec(call, number)
+        finally:
+            loc.set_capture_mode(prev)
+    return results
+
+
+def main():
+    results = run()
+    suite.report(results, 'usec/call')
+    print('speedup    %8.2fx' % (results[loc.CAPTURE_TRACEBACK] /
+                                  results[loc.CAPTURE_FRAME]))
+
+
+if __name__ == '__main__':
+    main()
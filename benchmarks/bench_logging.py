@@ -0,0 +1,48 @@
+""" Measures the per-call cost of a monitored call with tracing off and on,
+against a plain method call.
+
+Run from the repository root:
+
+    python benchmarks/bench_logging.py
+"""
+import suite
+
+from pydyty import log  # noqa
+from pydyty.monitor import Monitored  # noqa
+
+
+def _make_classes():
+    class Plain(object):
+        def foo(self, x):
+            return x
+
+    class Traced(Monitored):
+        def foo(self, x):
+            return x
+
+    return Plain, Traced
+
+
+def run(number=100000):
+    results = {}
+    level = log.logger.level
+    try:
+        for name, trace_level in (('tracing off', log.logger.level),
+                                  ('tracing on', log.TRACE)):
+            log.logger.setLevel(trace_level)
+            plain, monitored = _make_classes()
+            obj = monitored()
+            results[name] = suite.usec(lambda: obj.foo(1), number)
+    finally:
+        log.logger.setLevel(level)
+    obj = plain()
+    results['plain'] = suite.usec(lambda: obj.foo(1), number)
+    return results
+
+
+def main():
+    suite.report(run(), 'usec/call')
+
+
+if __name__ == '__main__':
+    main()
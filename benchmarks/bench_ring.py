@@ -0,0 +1,61 @@
+""" Compares the cost of a call to a plain method, a monitored method that
+records inline, and a monitored method in deferred mode, along with the
+time a flush takes to build the types of the deferred calls.
+
+Run from the repository root:
+
+    python benchmarks/bench_ring.py
+"""
+import suite
+
+from pydyty import ring  # noqa
+from pydyty.monitor import Monitored  # noqa
+
+
+class Point(object):
+
+    def __init__(self):
+        self.x = 1
+
+
+class Plain(object):
+
+    def norm(self, p, scale):
+        return scale
+
+
+class Recorded(Monitored):
+
+    def norm(self, p, scale):
+        return scale
+
+
+class Deferred(Monitored):
+    __pydyty_deferred__ = True
+
+    def norm(self, p, scale):
+        return scale
+
+
+def run(number=50000):
+    p = Point()
+    results = {}
+    for cls in (Plain, Recorded, Deferred):
+        obj = cls()
+        call = lambda: obj.norm(p, 2)  # noqa
+        results[cls.__name__.lower()] = suite.usec(call, number)
+        ring.flush()
+    obj = Deferred()
+    for _ in range(number):
+        obj.norm(p, 2)
+    results['flush'] = suite.usec(ring.flush, 1, repeat=1, ops=number)
+    return results
+
+
+def main():
+    suite.report(run(), 'usec/call',
+                 ('plain', 'recorded', 'deferred', 'flush'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+""" Measures rendering types with str(): a nominal type, a method, a wide
+intersection, and a nested object type.
+
+Run from the repository root:
+
+    python benchmarks/bench_str.py
+"""
+import suite
+
+from pydyty import types  # noqa
+
+
+def samples():
+    int_t = types.NominalType('int')
+    method_t = types.MethodType([int_t, types.NominalType('str')],
+                                {'k': int_t}, int_t)
+    inter_t = types.IntersectionType(
+        [types.MethodType([types.NominalType('C%d' % i)], {}, int_t)
+         for i in range(16)])
+    obj_t = int_t
+    for level in range(6):
+        obj_t = types.ObjectType({'a': types.MethodType([obj_t], {}, obj_t),
+                                  'b': inter_t})
+    return {
+        'nominal': int_t,
+        'method': method_t,
+        'intersection': inter_t,
+        'object': obj_t,
+    }
+
+
+def run(number=2000):
+    results = {}
+    for name, t in samples().items():
+        results[name] = suite.usec(lambda: str(t), number)
+    return results
+
+
+def main():
+    suite.report(run(), 'usec/str')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+""" Measures how fast repeated method signatures are merged into object
+types with the subtype cache enabled and disabled.
+
+Run from the repository root:
+
+    python benchmarks/bench_subtype.py
+"""
+from __future__ import print_function
+
+import suite
+
+from pydyty import types  # noqa
+from pydyty.typing import Typing  # noqa
+
+
+def signatures():
+    int_t = types.NominalType.of(1)
+    str_t = types.NominalType.of('')
+    float_t = types.NominalType.of(1.0)
+    return [
+        types.MethodType.of([int_t], {}, int_t),
+        types.MethodType.of([str_t], {}, int_t),
+        types.MethodType.of([int_t, float_t], {}, str_t),
+    ]
+
+
+def run(number=2000):
+    sigs = signatures()
+
+    def merge():
+        obj_t = types.ObjectType()
+        for _ in range(10):
+            for sig in sigs:
+                obj_t.add_attr('m', sig)
+
+    results = {}
+    prev = Typing.cache_size
+    try:
+        for name, size in (('uncached', 0), ('cached', prev or 4096)):
+            Typing.cache_size = size
+            Typing.clear_cache()
+            results[name] = suite.usec(merge, number,
+                                       ops=10 * len(sigs))
+    finally:
+        Typing.cache_size = prev
+        Typing.clear_cache()
+    return results
+
+
+def main():
+    results = run()
+    suite.report(results, 'usec/add_attr')
+    print('speedup    %8.2fx' % (results['uncached'] / results['cached']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+""" Measures the per-call cost of a monitored method taking primitive
+arguments and one taking structural (object) arguments.
+
+Run from the repository root:
+
+    python benchmarks/bench_wrapper.py
+"""
+import suite
+
+from pydyty.monitor import Monitored  # noqa
+
+
+class Point(object):
+
+    def __init__(self):
+        self.x = 1
+
+
+class Calc(Monitored):
+
+    def add(self, a, b, c):
+        return a
+
+    def norm(self, p, q, r):
+        return 1
+
+
+def run(number=20000):
+    calc = Calc()
+    p = Point()
+    cases = {
+        'primitive': lambda: calc.add(1, 'a', None),
+        'object': lambda: calc.norm(p, p, p),
+    }
+    results = {}
+    for name, call in cases.items():
+        results[name] = suite.usec(call, number)
+    return results
+
+
+def main():
+    suite.report(run(), 'usec/call')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+""" Measures the cost of going through an ObjectWrapper: reading an
+attribute, calling a method, and applying operators.
+
+Run from the repository root:
+
+    python benchmarks/bench_wrapper_ops.py
+"""
+import suite
+
+from pydyty.object_wrapper import ObjectWrapper  # noqa
+
+
+class Vector(object):
+
+    def __init__(self, x):
+        self.x = x
+
+    def norm(self):
+        return abs(self.x)
+
+    def __add__(self, other):
+        return Vector(self.x + other.x)
+
+    def __eq__(self, other):
+        return self.x == other.x
+
+    def __hash__(self):
+        return hash(self.x)
+
+    def __len__(self):
+        return 1
+
+
+def run(number=20000):
+    plain = Vector(1)
+    other = Vector(2)
+    results = {}
+    for prefix, obj in (('plain', plain), ('wrapped', ObjectWrapper(plain))):
+        cases = {
+            'attribute': lambda: obj.x,
+            'method': lambda: obj.norm(),
+            'add': lambda: obj + other,
+            'eq': lambda: obj == other,
+            'len': lambda: len(obj),
+        }
+        for name, call in cases.items():
+            results['%s %s' % (prefix, name)] = suite.usec(call, number)
+    results['wrap'] = suite.usec(lambda: ObjectWrapper(plain), number)
+    return results
+
+
+def main():
+    suite.report(run(), 'usec')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+""" Runs the benchmarks in this directory and writes their results as
+JSON, or compares them against an earlier run.
+
+Every bench_*.py module has a run() function returning a dict of
+measurements in microseconds; lower is better. Run from the repository
+root:
+
+    python benchmarks/suite.py -o baseline.json
+    python benchmarks/suite.py -o current.json --compare baseline.json
+
+With --compare, every measurement found in both runs is compared, and the
+exit status is 1 if any of them got slower by more than --threshold (a
+fraction; 0.25 by default). Measurements under --min-usec in the baseline
+are reported but never fail the comparison, since their noise dwarfs any
+change. Use -k to run only the modules whose name contains a string, and
+--input to compare a saved run instead of running the benchmarks.
+
+A module may also define check(results), returning what is wrong with
+its measurements relative to each other, e.g. a cache that does not beat
+the path without it. Problems are printed to stderr and make the exit
+status 1, with or without --compare.
+
+Benchmark modules import this one first: it puts the repository on
+sys.path, and usec() and report() time and print their measurements."""
+from __future__ import print_function
+
+import argparse
+import datetime
+import glob
+import importlib
+import json
+import os
+import platform
+import sys
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+for path in (HERE, ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+VERSION = 1
+
+
+def modules(keyword=None):
+    """ Returns the names of the benchmark modules, sorted."""
+    names = sorted(os.path.splitext(os.path.basename(p))[0]
+                   for p in glob.glob(os.path.join(HERE, 'bench_*.py')))
+    if keyword:
+        names = [n for n in names if keyword in n]
+    return names
+
+
+def usec(call, number, repeat=3, ops=1):
+    """ Returns the best of `repeat` timings of `number` calls, in
+    microseconds per call, or per operation if a call does `ops` of
+    them."""
+    best = min(timeit.repeat(call, number=number, repeat=repeat))
+    return best / (number * ops) * 1e6
+
+
+def report(results, unit, names=None, out=None):
+    """ Prints measurements one per line, sorted by name or in the order
+    of `names`."""
+    out = out or sys.stdout
+    names = sorted(results) if names is None else names
+    width = max(len(name) for name in names)
+    for name in names:
+        print('%-*s %10.3f %s' % (width, name, results[name], unit),
+              file=out)
+
+
+def run(names, out=sys.stderr):
+    results = {}
+    for name in names:
+        print('running %s...' % name, file=out)
+        results[name] = importlib.import_module(name).run()
+    return {
+        'version': VERSION,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'time': datetime.datetime.utcnow().isoformat() + 'Z',
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=0.25, min_usec=0.5):
+    """ Returns (module, measurement, baseline usec, current usec, ratio,
+    regressed) for every measurement found in both runs."""
+    rows = []
+    for module, measures in sorted(current['results'].items()):
+        base_measures = baseline['results'].get(module, {})
+        for name, usec in sorted(measures.items()):
+            base = base_measures.get(name)
+            if base is None:
+                continue
+            ratio = usec / base if base > 0 else float('inf')
+            regressed = base >= min_usec and ratio > 1 + threshold
+            rows.append((module, name, base, usec, ratio, regressed))
+    return rows
+
+
+def check(current):
+    """ Returns the problems found by the check() function of the modules
+    in a run."""
+    problems = []
+    for module, measures in sorted(current['results'].items()):
+        try:
+            check_module = importlib.import_module(module).check
+        except (ImportError, AttributeError):
+            continue
+        problems.extend('%s: %s' % (module, problem)
+                        for problem in check_module(measures))
+    return problems
+
+
+def _load(path):
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('version') != VERSION:
+        raise ValueError('Unsupported results version: %r' %
+                         (data.get('version'),))
+    return data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python benchmarks/suite.py',
+        description='Runs the pydyty benchmarks.')
+    parser.add_argument('-o', '--output',
+                        help='write the results to this JSON file')
+    parser.add_argument('-k', '--keyword',
+                        help='only run modules whose name contains this')
+    parser.add_argument('--input',
+                        help='compare these saved results instead of '
+                             'running the benchmarks')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='compare against these saved results')
+    parser.add_argument('--threshold', type=float, default=0.25)
+    parser.add_argument('--min-usec', type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    if args.input:
+        current = _load(args.input)
+    else:
+        current = run(modules(args.keyword))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=1, sort_keys=True)
+    problems = check(current)
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    if not args.compare:
+        if not args.output:
+            json.dump(current, sys.stdout, indent=1, sort_keys=True)
+            print()
+        return 1 if problems else 0
+
+    regressions = 0
+    for module, name, base, usec, ratio, regressed in compare(
+            _load(args.compare), current, args.threshold, args.min_usec):
+        regressions += regressed
+        print('%-20s %-22s %10.2f %10.2f %6.2fx%s' % (
+            module, name, base, usec, ratio,
+            '  REGRESSED' if regressed else ''))
+    if regressions:
+        print('%d measurement(s) regressed by more than %d%%' %
+              (regressions, args.threshold * 100))
+        return 1
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
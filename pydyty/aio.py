@@ -0,0 +1,124 @@
+""" Proxies for coroutine and async generator methods. This module uses
+async syntax and is only imported on Python 3.6 and later."""
+import asyncio
+import inspect
+from . import types
+from .object_wrapper import _unwrap, wrap
+
+
+def is_async(func):
+    return (inspect.iscoroutinefunction(func) or
+            inspect.isasyncgenfunction(func))
+
+
+def _defer(callback, *args):
+    """ Runs the callback on the next iteration of the running event loop,
+    so the awaited result reaches the caller before anything is
+    recorded."""
+    try:
+        loop = asyncio.get_running_loop()
+    except AttributeError:  # Python < 3.7
+        loop = asyncio.get_event_loop()
+    except RuntimeError:  # no running loop
+        callback(*args)
+        return
+    loop.call_soon(callback, *args)
+
+
+def _wrap_args(args, kwargs):
+    new_args = [wrap(arg) for arg in args]
+    new_kwargs = dict((k, wrap(v)) for k, v in kwargs.items())
+    return new_args, new_kwargs
+
+
+def _one_of(type_list):
+    if not type_list:
+        return types.BottomType()
+    if len(type_list) == 1:
+        return type_list[0]
+    return types.UnionType(list(type_list))
+
+
+def _add_type(type_list, value):
+    t = types.NominalType.of(value)
+    if t not in type_list:
+        type_list.append(t)
+
+
+def _iterator_type(item_types, sent_types):
+    """ Returns the structural type of an async generator: __anext__()
+    gives the yielded types, and asend() takes the sent ones if any value
+    was sent. Like coroutines, the awaited types are recorded, not the
+    awaitables."""
+    item_type = _one_of(item_types)
+    attrs = {'__anext__': types.MethodType([], {}, item_type)}
+    if sent_types:
+        attrs['asend'] = types.MethodType([_one_of(sent_types)], {},
+                                          item_type)
+    return types.ObjectType(attrs)
+
+
+def proxy(func, should_record, finish):
+    """ Returns a proxy of the coroutine or async generator function
+    `func`. `should_record()` decides whether a call is recorded and
+    `finish(new_args, new_kwargs, result, ret_type)` records it."""
+    if inspect.isasyncgenfunction(func):
+        return _async_generator_proxy(func, should_record, finish)
+
+    async def coroutine_proxy(self, *args, **kwargs):
+        if not should_record():
+            return await func(self, *args, **kwargs)
+        new_args, new_kwargs = _wrap_args(args, kwargs)
+        result = await func(self, *new_args, **new_kwargs)
+        _defer(finish, new_args, new_kwargs, result)
+        return _unwrap(result)
+
+    return coroutine_proxy
+
+
+def _async_generator_proxy(func, should_record, finish):
+    """ The proxy drives the original generator the way `yield from` would:
+    values sent, exceptions thrown and aclose() are passed on to it, so its
+    finally blocks run when the proxy is closed."""
+
+    async def async_generator_proxy(self, *args, **kwargs):
+        record = should_record()
+        if record:
+            new_args, new_kwargs = _wrap_args(args, kwargs)
+        else:
+            new_args, new_kwargs = args, kwargs
+        item_types = []
+        sent_types = []
+        agen = func(self, *new_args, **new_kwargs)
+        try:
+            try:
+                item = await agen.__anext__()
+            except StopAsyncIteration:
+                return
+            while True:
+                if record:
+                    _add_type(item_types, item)
+                try:
+                    sent = yield _unwrap(item)
+                except GeneratorExit:
+                    await agen.aclose()
+                    raise
+                except BaseException as exc:
+                    next_item = agen.athrow(exc)
+                else:
+                    if sent is None:
+                        next_item = agen.__anext__()
+                    else:
+                        if record:
+                            _add_type(sent_types, sent)
+                        next_item = agen.asend(sent)
+                try:
+                    item = await next_item
+                except StopAsyncIteration:
+                    return
+        finally:
+            if record:
+                _defer(finish, new_args, new_kwargs, None,
+                       _iterator_type(item_types, sent_types))
+
+    return async_generator_proxy
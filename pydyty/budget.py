@@ -0,0 +1,339 @@
+""" Bounds the memory held by recorded types.
+
+Once `limit` is set, every type merged by pydyty.recorder is accounted
+for: the estimated size of each attribute type is kept per object type
+and per attribute. Sizes are estimates (sys.getsizeof of the types, their
+containers and their locations). Canonical nominal, top and bottom types
+are shared by everything that uses them and are not counted.
+
+When the total goes over the limit, recording degrades one level at a
+time until it fits again:
+
+    COARSE  locations keep only their `coarse_sites` most hit sites; the
+            counts of the others are folded into Location.other.
+    WIDE    intersections collapse to the top type and stay there.
+    CLOSED  attributes not seen so far are not recorded anymore.
+
+A level applies to the types recorded so far and to those recorded
+afterwards. Locations grow without changing their type, so the attributes
+observed without a change are measured again every `recheck_every`
+observations.
+
+    budget.set_limit(64 << 20)
+    ...
+    budget.stats().bytes"""
+import collections
+import sys
+import weakref
+from . import hierarchy
+from . import registry
+from . import types
+from .loc import Location
+
+# Degradation levels.
+NORMAL = 0
+COARSE = 1
+WIDE = 2
+CLOSED = 3
+
+LEVEL_NAMES = ('normal', 'coarse', 'wide', 'closed')
+
+# Estimated bytes of recorded types allowed. None means unbounded.
+limit = None
+
+# Number of sites a location keeps from level COARSE on.
+coarse_sites = 1
+
+# Number of observations that did not change a type between two
+# measurements of the attributes they were merged into.
+recheck_every = 1024
+
+Stats = collections.namedtuple(
+    'Stats', ['limit', 'bytes', 'entries', 'evictions', 'level', 'classes'])
+
+_level = NORMAL
+_bytes = 0
+_unchanged = 0
+_accounts = {}      # id(object type) -> _Account
+_touched = set()    # (id(object type), name) observed without a change
+_forgotten = []     # (id(object type), weakref) of collected types
+_evictions = {'sites': 0, 'intersections': 0, 'methods': 0}
+_max_sites = None   # Location.max_sites before level COARSE
+
+# Bytes of the attribute dictionary of a type or location.
+_ATTRS_BYTES = sys.getsizeof(dict.fromkeys(range(6)))
+
+# Bytes of an entry of the eviction heap of a location.
+_HEAP_ENTRY_BYTES = sys.getsizeof((0, 0, 0, None))
+
+# Containers held by types.
+_CONTAINERS = ('types', '_members', 'arg_types', 'kwarg_types', 'attrs',
+               '_parents')
+
+
+class _Account(object):
+    """ Bytes accounted to the attributes of one object type."""
+
+    def __init__(self, obj_type, key):
+        self.ref = weakref.ref(obj_type, _forget_callback(key))
+        self.sizes = {}
+
+
+def _forget_callback(key):
+    # Called by the garbage collector, possibly without the merge lock:
+    # the account is dropped by _forget, under the lock.
+    def forget(ref):
+        _forgotten.append((key, ref))
+    return forget
+
+
+def _forget():
+    """ Drops the accounts of the collected object types."""
+    global _bytes
+    while _forgotten:
+        key, ref = _forgotten.pop()
+        account = _accounts.get(key)
+        if account is not None and account.ref is ref:
+            del _accounts[key]
+            _bytes -= sum(account.sizes.values())
+
+
+def _shared(t):
+    """ Whether a type is shared by all the types using it. Canonical
+    method types are signatures recorded for an attribute, so they are
+    counted with it."""
+    return t._canonical and not isinstance(t, types.MethodType)
+
+
+def _walk(t):
+    """ Yields `t` and the types making it up, each once, except shared
+    ones."""
+    seen = set([id(t)])
+    stack = [t]
+    while stack:
+        t = stack.pop()
+        yield t
+        for child in t._children():
+            if child is not None and not _shared(child) and \
+                    id(child) not in seen:
+                seen.add(id(child))
+                stack.append(child)
+
+
+def _sizeof_loc(loc):
+    size = sys.getsizeof(loc) + _ATTRS_BYTES + \
+        sys.getsizeof(loc.counts) + sys.getsizeof(loc._index)
+    if loc._scores is not None:
+        size += sys.getsizeof(loc._scores) + sys.getsizeof(loc._heap) + \
+            len(loc._heap) * _HEAP_ENTRY_BYTES
+    for site in loc._index.values():
+        size += sys.getsizeof(site) + _ATTRS_BYTES + \
+            sys.getsizeof(site.key)
+    return size
+
+
+def sizeof(t):
+    """ Returns the estimated bytes held by a type and the types and
+    locations it is made of. The type itself is counted even if it is
+    shared."""
+    size = 0
+    for part in _walk(t):
+        size += sys.getsizeof(part) + _ATTRS_BYTES
+        for name in _CONTAINERS:
+            container = getattr(part, name, None)
+            if container is not None:
+                size += sys.getsizeof(container)
+        if part.loc is not None:
+            size += _sizeof_loc(part.loc)
+    return size
+
+
+def _degrade(attr_type):
+    """ Applies the current level to an attribute type."""
+    if _level >= COARSE:
+        for part in _walk(attr_type):
+            if part.loc is not None:
+                _evictions['sites'] += part.loc.coarsen(coarse_sites)
+    if _level >= WIDE and isinstance(attr_type, types.IntersectionType):
+        if attr_type.widen():
+            _evictions['intersections'] += 1
+
+
+def _account(obj_type, name):
+    global _bytes
+    if _forgotten:
+        _forget()
+    key = id(obj_type)
+    account = _accounts.get(key)
+    if account is None or account.ref() is not obj_type:
+        account = _accounts[key] = _Account(obj_type, key)
+    attr_type = obj_type.attrs.get(name)
+    if attr_type is not None:
+        _degrade(attr_type)
+        size = sizeof(attr_type)
+    else:
+        size = 0
+    _bytes += size - account.sizes.get(name, 0)
+    account.sizes[name] = size
+
+
+def add_attr(obj_type, name, attr_type):
+    """ Adds an attribute type like ObjectType.add_attr, within the
+    budget. Returns whether the type of the attribute changed. The caller
+    holds recorder.merge_lock."""
+    global _unchanged
+    if _level >= CLOSED and name not in obj_type.attrs:
+        _evictions['methods'] += 1
+        return False
+    changed = obj_type.add_attr(name, attr_type)
+    if changed:
+        _account(obj_type, name)
+        if limit is not None and _bytes > limit and _level < CLOSED:
+            _enforce(full=False)
+    else:
+        key = id(obj_type)
+        account = _accounts.get(key)
+        if account is None or account.ref() is not obj_type:
+            _account(obj_type, name)
+        else:
+            _touched.add((key, name))
+        _unchanged += 1
+        if _unchanged >= recheck_every:
+            _enforce(full=False)
+    return changed
+
+
+def _measure_touched():
+    """ Measures the attributes observed without a change since the last
+    measurement."""
+    global _bytes
+    touched = list(_touched)
+    _touched.clear()
+    for key, name in touched:
+        account = _accounts.get(key)
+        obj_type = account.ref() if account is not None else None
+        if obj_type is None:
+            continue
+        if name in obj_type.attrs:
+            _account(obj_type, name)
+        elif name in account.sizes:
+            _bytes -= account.sizes.pop(name)
+
+
+def _measure():
+    """ Measures the types accounted so far and those of the monitored
+    classes."""
+    global _bytes
+    _forget()
+    _touched.clear()
+    obj_types = [account.ref() for account in list(_accounts.values())]
+    obj_types.extend(t for _, t in registry.monitored.items())
+    for obj_type in obj_types:
+        if obj_type is None:
+            continue
+        account = _accounts.get(id(obj_type))
+        if account is not None and account.ref() is obj_type:
+            for name in list(account.sizes):
+                if name not in obj_type.attrs:
+                    _bytes -= account.sizes.pop(name)
+        for name in list(obj_type.attrs):
+            _account(obj_type, name)
+
+
+def _enforce(full=True):
+    """ Measures everything, or only the attributes observed since the
+    last measurement if not `full`, and raises the level until the total
+    fits in the limit. Raising the level measures everything."""
+    global _level, _unchanged, _max_sites
+    _unchanged = 0
+    if full:
+        _measure()
+    else:
+        _measure_touched()
+    while limit is not None and _bytes > limit and _level < CLOSED:
+        _level += 1
+        if _level == COARSE:
+            _max_sites = Location.max_sites
+            if _max_sites is None or _max_sites > coarse_sites:
+                Location.max_sites = coarse_sites
+        if _level < CLOSED:
+            _measure()
+
+
+def _merge_lock():
+    from . import recorder
+    return recorder.merge_lock
+
+
+def set_limit(n):
+    """ Sets the number of bytes recorded types may take, or None for no
+    limit, and applies it to the types recorded so far. The level starts
+    over from NORMAL, but what was dropped is not restored. Returns the
+    previous limit."""
+    global limit, _level
+    if n is not None and n < 1:
+        raise ValueError('limit must be positive')
+    with _merge_lock():
+        prev = limit
+        limit = n
+        if _level >= COARSE:
+            Location.max_sites = _max_sites
+        _level = NORMAL
+        _enforce()
+    return prev
+
+
+def enforce():
+    """ Measures the recorded types and degrades recording if they take
+    more than the limit. Returns the level reached."""
+    with _merge_lock():
+        _enforce()
+    return _level
+
+
+def level():
+    return _level
+
+
+def _class_names():
+    names = {}
+    for klass, obj_type in registry.monitored.items():
+        names[id(obj_type)] = hierarchy.qualname(klass)
+    return names
+
+
+def stats():
+    """ Returns the accounted bytes, the number of accounted attributes,
+    the evictions so far by kind, the level and, per class, the bytes of
+    each attribute. Classes not in registry.monitored are named after the
+    id of their type."""
+    names = _class_names()
+    with _merge_lock():
+        _forget()
+        classes = {}
+        entries = 0
+        for key, account in list(_accounts.items()):
+            if account.ref() is None:
+                continue
+            name = names.get(key, '<type 0x%x>' % key)
+            classes.setdefault(name, {}).update(account.sizes)
+            entries += len(account.sizes)
+        return Stats(limit, _bytes, entries, dict(_evictions),
+                     LEVEL_NAMES[_level], classes)
+
+
+def reset():
+    """ Forgets the accounting and the evictions, and goes back to level
+    NORMAL. The limit is kept."""
+    global _level, _bytes, _unchanged
+    with _merge_lock():
+        if _level >= COARSE:
+            Location.max_sites = _max_sites
+        _level = NORMAL
+        _bytes = 0
+        _unchanged = 0
+        _accounts.clear()
+        _touched.clear()
+        del _forgotten[:]
+        for kind in _evictions:
+            _evictions[kind] = 0
@@ -0,0 +1,422 @@
+""" Generates type documentation from a profile.
+
+For every module of a store.Profile, by default the one collected from
+registry.monitored, generate() writes:
+
+    <module path>.pyi   PEP 484 stub, e.g. pkg/mod.pyi
+    <module>.json       JSON schema of the classes, e.g. pkg.mod.json
+    <module>.md         Markdown listing the signatures
+
+Types are translated as follows. An intersection of method types becomes
+one @overload per member, and a union becomes Union[...]. An object type
+used as an argument or result becomes a Protocol declaring the attributes
+that were used. Top is Any and bottom is NoReturn. Recorded arguments
+have no names; they are positional-only (__arg0, __arg1, ...), and keyword
+arguments are keyword-only.
+
+Modules are independent, so they are rendered in worker processes when
+jobs > 1. Each module is written as soon as it is rendered, and the paths
+come back as they are done.
+
+    python -m pydyty.docgen -o docs/ -j 8 worker-*.json"""
+import argparse
+import io
+import json
+import os
+import sys
+from . import store
+from . import types
+
+try:
+    import builtins
+except ImportError:  # Python 2
+    import __builtin__ as builtins
+
+FORMATS = ('pyi', 'json', 'md')
+
+_SCHEMA = 'http://json-schema.org/draft-07/schema#'
+
+# JSON schema of builtin classes that have a JSON counterpart.
+_JSON_TYPES = {
+    'int': 'integer', 'long': 'integer', 'float': 'number',
+    'str': 'string', 'unicode': 'string', 'bool': 'boolean',
+    'NoneType': 'null', 'list': 'array', 'tuple': 'array',
+    'dict': 'object',
+}
+
+# Builtin classes whose name is not usable in a stub.
+_STUB_NAMES = {
+    'NoneType': 'None',
+    'function': 'Callable[..., Any]',
+    'builtin_function_or_method': 'Callable[..., Any]',
+    'generator': 'Generator[Any, Any, Any]',
+}
+
+
+def split_name(name):
+    """ Splits the qualified name of a profiled class into module and
+    class name. The module is the longest prefix naming an imported
+    module. Failing that, the class name starts at the function a local
+    class is defined in, or after the last dot. Nested classes keep their
+    dotted name, e.g. ('mod', 'Outer.Inner')."""
+    if '.' not in name:
+        return '__main__', name
+    parts = name.split('.')
+    for i in range(len(parts) - 1, 0, -1):
+        module = '.'.join(parts[:i])
+        if module in sys.modules:
+            return module, '.'.join(parts[i:])
+    if '<locals>' in parts[1:]:
+        i = max(parts.index('<locals>') - 1, 1)
+        return '.'.join(parts[:i]), '.'.join(parts[i:])
+    return tuple(name.rsplit('.', 1))
+
+
+def _modules(profile):
+    by_module = {}
+    for name, obj_type in profile.classes.items():
+        module, cls_name = split_name(name)
+        by_module.setdefault(module, []).append((cls_name, obj_type))
+    return by_module
+
+
+def _members(t):
+    if isinstance(t, types.IntersectionType):
+        return t.types
+    return [t]
+
+
+class _StubWriter(object):
+    """ Renders the stub of one module, collecting the imports and
+    protocols its annotations need along the way."""
+
+    def __init__(self, module):
+        self.module = module
+        self.typing = set(['Any'])
+        self.imports = set()
+        self.protocols = []     # (name, lines)
+        self._protocol_names = {}
+
+    def annotation(self, t, hint):
+        """ Returns the annotation of a type. `hint` names a protocol
+        created for it."""
+        if t is None or isinstance(t, types.TopType):
+            return 'Any'
+        if isinstance(t, types.BottomType):
+            self.typing.add('NoReturn')
+            return 'NoReturn'
+        if isinstance(t, types.NominalType):   # includes fusion types
+            return self._nominal(t)
+        if isinstance(t, types.ObjectType):
+            return self._protocol(t, hint)
+        if isinstance(t, types.UnionType):
+            members = []
+            for i, m in enumerate(t.types):
+                a = self.annotation(m, '%s_%d' % (hint, i))
+                if a not in members:
+                    members.append(a)
+            if len(members) == 1:
+                return members[0]
+            self.typing.add('Union')
+            return 'Union[%s]' % ', '.join(members)
+        if isinstance(t, types.MethodType):
+            self.typing.add('Callable')
+            args = [self.annotation(a, '%s_arg%d' % (hint, i))
+                    for i, a in enumerate(t.arg_types)]
+            if t.kwarg_types:
+                return 'Callable[..., %s]' % self.annotation(
+                    t.ret_type, hint + '_ret')
+            return 'Callable[[%s], %s]' % (
+                ', '.join(args), self.annotation(t.ret_type, hint + '_ret'))
+        return 'Any'
+
+    def _nominal(self, t):
+        qualname = t.qualname
+        if '.' not in qualname:
+            name = _STUB_NAMES.get(qualname)
+            if name is not None:
+                for word in ('Callable', 'Generator'):
+                    if word in name:
+                        self.typing.add(word)
+                return name
+            if hasattr(builtins, qualname):
+                return qualname
+            return 'Any'
+        if '<locals>' in qualname:
+            return 'Any'
+        module, name = split_name(qualname)
+        if module == self.module:
+            return name
+        self.imports.add(module)
+        return qualname
+
+    def _protocol(self, obj_type, hint):
+        if not obj_type.attrs:
+            return 'object'
+        lines = []
+        for name in sorted(obj_type.attrs):
+            lines.extend(self.attr_lines(name, obj_type.attrs[name],
+                                         '%s_%s' % (hint, name)))
+        key = tuple(lines)
+        proto_name = self._protocol_names.get(key)
+        if proto_name is None:
+            proto_name = '_%s' % hint
+            self._protocol_names[key] = proto_name
+            self.protocols.append((proto_name, lines))
+            self.typing.add('Protocol')
+        return proto_name
+
+    def signature(self, name, method_type, hint):
+        params = ['self']
+        for i, arg_type in enumerate(method_type.arg_types):
+            params.append('__arg%d: %s' % (
+                i, self.annotation(arg_type, '%s_arg%d' % (hint, i))))
+        if method_type.kwarg_types:
+            params.append('*')
+            for k in sorted(method_type.kwarg_types):
+                params.append('%s: %s' % (k, self.annotation(
+                    method_type.kwarg_types[k], '%s_%s' % (hint, k))))
+        return 'def %s(%s) -> %s: ...' % (
+            name, ', '.join(params),
+            self.annotation(method_type.ret_type, hint + '_ret'))
+
+    def attr_lines(self, name, attr_type, hint):
+        """ Returns the lines declaring an attribute in a class body."""
+        members = _members(attr_type)
+        if not all(isinstance(m, types.MethodType) for m in members):
+            return ['%s: %s' % (name, self.annotation(attr_type, hint))]
+        if len(members) == 1:
+            return [self.signature(name, members[0], hint)]
+        self.typing.add('overload')
+        lines = []
+        for i, member in enumerate(members):
+            lines.append('@overload')
+            lines.append(self.signature(name, member, '%s%d' % (hint, i)))
+        return lines
+
+    def class_lines(self, cls_name, obj_type):
+        body = []
+        for name in sorted(obj_type.attrs):
+            body.extend(self.attr_lines(name, obj_type.attrs[name],
+                                        '%s_%s' % (cls_name, name)))
+        return body or ['...']
+
+    def header(self):
+        lines = ['# Generated by pydyty from recorded types.']
+        lines.append('from typing import %s' % ', '.join(sorted(self.typing)))
+        for module in sorted(self.imports):
+            lines.append('import %s' % module)
+        return lines
+
+
+def _indent(lines):
+    return ['    ' + line if line else line for line in lines]
+
+
+def _class_tree(classes):
+    """ Nests classes by their dotted names. Returns {name: [obj_type,
+    nested tree]}; obj_type is None for an enclosing class that was not
+    profiled. Local classes cannot be named in a stub and are left out."""
+    tree = {}
+    for cls_name, obj_type in classes:
+        if '<locals>' in cls_name:
+            continue
+        node = [None, tree]
+        for part in cls_name.split('.'):
+            node = node[1].setdefault(part, [None, {}])
+        node[0] = obj_type
+    return tree
+
+
+def _class_block(writer, path, tree):
+    lines = []
+    for name in sorted(tree):
+        obj_type, nested = tree[name]
+        hint = '_'.join(path + [name])
+        body = writer.class_lines(hint, obj_type) if obj_type is not None \
+            else []
+        body.extend(_class_block(writer, path + [name], nested))
+        if body and body[0] == '...' and len(body) > 1:
+            del body[0]
+        lines.append('')
+        lines.append('class %s:' % name)
+        lines.extend(_indent(body or ['...']))
+    return lines
+
+
+def render_stub(module, classes):
+    """ Returns the stub of a module with the given (name, ObjectType)
+    classes."""
+    writer = _StubWriter(module)
+    body = _class_block(writer, [], _class_tree(classes))
+    lines = writer.header()
+    for proto_name, proto_lines in writer.protocols:
+        lines.append('')
+        lines.append('class %s(Protocol):' % proto_name)
+        lines.extend(_indent(proto_lines))
+    lines.extend(body)
+    return '\n'.join(lines) + '\n'
+
+
+def schema(t):
+    """ Returns the JSON schema of a type."""
+    if t is None or isinstance(t, types.TopType):
+        return {}
+    if isinstance(t, types.BottomType):
+        return {'not': {}}
+    if isinstance(t, types.FusionType):
+        data = _object_schema(t)
+        data['x-python-class'] = t.qualname
+        return data
+    if isinstance(t, types.NominalType):
+        json_type = _JSON_TYPES.get(t.qualname)
+        if json_type is not None:
+            return {'type': json_type}
+        return {'x-python-class': t.qualname}
+    if isinstance(t, types.ObjectType):
+        return _object_schema(t)
+    if isinstance(t, types.UnionType):
+        return {'anyOf': [schema(m) for m in t.types]}
+    if isinstance(t, types.IntersectionType):
+        return {'allOf': [schema(m) for m in t.types]}
+    if isinstance(t, types.MethodType):
+        return {
+            'x-method': {
+                'args': [schema(a) for a in t.arg_types],
+                'kwargs': dict((k, schema(v))
+                               for k, v in t.kwarg_types.items()),
+                'returns': schema(t.ret_type),
+            },
+        }
+    return {}
+
+
+def _object_schema(obj_type):
+    return {
+        'type': 'object',
+        'properties': dict((n, schema(t)) for n, t in obj_type.attrs.items()),
+    }
+
+
+def render_schema(module, classes):
+    data = {
+        '$schema': _SCHEMA,
+        'title': module,
+        'definitions': dict((cls_name, _object_schema(obj_type))
+                            for cls_name, obj_type in classes),
+    }
+    return json.dumps(data, indent=1, sort_keys=True) + '\n'
+
+
+def render_markdown(module, classes):
+    writer = _StubWriter(module)
+    lines = ['# `%s`' % module]
+    for cls_name, obj_type in sorted(classes, key=lambda c: c[0]):
+        lines.extend(['', '## `%s`' % cls_name])
+        for name in sorted(obj_type.attrs):
+            lines.extend(['', '### `%s`' % name, '', '```python'])
+            lines.extend(writer.attr_lines(name, obj_type.attrs[name],
+                                           '%s_%s' % (cls_name, name)))
+            lines.append('```')
+    for proto_name, proto_lines in writer.protocols:
+        lines.extend(['', '## `%s` (protocol)' % proto_name, '',
+                      '```python', 'class %s(Protocol):' % proto_name])
+        lines.extend(_indent(proto_lines))
+        lines.append('```')
+    return '\n'.join(lines) + '\n'
+
+
+_RENDERERS = {
+    'pyi': render_stub,
+    'json': render_schema,
+    'md': render_markdown,
+}
+
+
+def _paths(outdir, module):
+    return {
+        'pyi': os.path.join(outdir, *module.split('.')) + '.pyi',
+        'json': os.path.join(outdir, module + '.json'),
+        'md': os.path.join(outdir, module + '.md'),
+    }
+
+
+def _write(path, text):
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.isdir(dirname):
+        try:
+            os.makedirs(dirname)
+        except OSError:  # created by another worker
+            if not os.path.isdir(dirname):
+                raise
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(text if isinstance(text, type(u'')) else text.decode('utf-8'))
+
+
+def _generate_module(job):
+    """ Renders and writes one module. Runs in a worker process, so the
+    classes come encoded."""
+    outdir, module, encoded, formats = job
+    classes = [(name, store.decode(data)) for name, data in encoded]
+    paths = _paths(outdir, module)
+    written = []
+    for fmt in formats:
+        _write(paths[fmt], _RENDERERS[fmt](module, classes))
+        written.append(paths[fmt])
+    return written
+
+
+def iter_generate(profile, outdir, formats=FORMATS, jobs=1):
+    """ Writes the documentation of every module in the profile, yielding
+    the paths written for each module as soon as it is done. If `profile`
+    is None, it is collected from registry.monitored."""
+    for fmt in formats:
+        if fmt not in _RENDERERS:
+            raise ValueError('Unknown format: %r' % (fmt,))
+    if profile is None:
+        profile = store.Profile.collect()
+    jobs_ = ((outdir, module,
+              [(name, store.encode(t)) for name, t in classes], formats)
+             for module, classes in sorted(_modules(profile).items()))
+    if jobs <= 1:
+        for job in jobs_:
+            for path in _generate_module(job):
+                yield path
+        return
+    import multiprocessing
+    pool = multiprocessing.Pool(jobs)
+    try:
+        for written in pool.imap_unordered(_generate_module, jobs_):
+            for path in written:
+                yield path
+    finally:
+        pool.close()
+        pool.join()
+
+
+def generate(profile, outdir, formats=FORMATS, jobs=1):
+    """ Writes the documentation of every module in the profile, or of
+    every monitored class if `profile` is None. Returns the paths
+    written."""
+    return list(iter_generate(profile, outdir, formats, jobs))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m pydyty.docgen',
+        description='Generates stubs, JSON schemas and Markdown from '
+                    'pydyty profiles.')
+    parser.add_argument('profiles', nargs='+')
+    parser.add_argument('-o', '--output', required=True)
+    parser.add_argument('-f', '--formats', default=','.join(FORMATS),
+                        help='comma-separated subset of %s' %
+                             ', '.join(FORMATS))
+    parser.add_argument('-j', '--jobs', type=int, default=1)
+    args = parser.parse_args(argv)
+    profile = store.merge_files(args.profiles, args.jobs)
+    formats = [f for f in args.formats.split(',') if f]
+    generate(profile, args.output, formats, args.jobs)
+
+
+if __name__ == '__main__':
+    main()
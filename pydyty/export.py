@@ -0,0 +1,353 @@
+""" Streams recorded types to rotating, append-only log files.
+
+An Exporter periodically looks at the types recorded for the classes
+returned by `source()` and appends what changed since its last look, one
+JSON object per line:
+
+    {"class": "mod.A", "name": "foo", "type": ["M", ...], "count": 3,
+     "sites": [[file, line, func, code, count], ...]}
+
+`type` is the type of the attribute without its location, encoded as in
+pydyty.store, and `class` is the qualified name of the class. A member of
+an intersection gets a line of its own. `count` and the counts of `sites`
+are the hits added since the previous line for the same signature. Only
+types recorded with a location count their hits (see ring.capture_sites);
+a type without one is written once, when it first appears, without
+`count` and with no sites. Each file starts with a header line holding
+the format version and the id of the writing process.
+
+Lines are buffered and written by a background thread. A file is closed
+once it reaches `max_bytes` and the next one is opened; files are never
+rewritten. After a fork, the child process starts its own files and only
+exports what it records itself. Before Python 3.7, the child notices the
+fork on its next export instead, and also exports what the parent
+recorded after its own last export.
+
+read() and iter_records() go through logs one line at a time, so logs of
+any size can be processed incrementally."""
+import collections
+import io
+import json
+import os
+import re
+import threading
+import weakref
+from . import hierarchy
+from . import recorder
+from . import registry
+from . import ring
+from . import store
+from . import types
+from .periodic import Periodic
+
+# Exported observation. `type` is decoded, `count` is None for a type
+# recorded without a location, and `sites` holds (file, line, func, code,
+# count) tuples.
+Record = collections.namedtuple(
+    'Record', ['cls', 'name', 'type', 'count', 'sites', 'pid'])
+
+_exporters = weakref.WeakSet()
+
+
+def _signature(t):
+    """ Returns the encoding of a type without its location."""
+    data = store.encode(t)
+    if t.loc is None:
+        return data
+    data = data[:-1]
+    return data[0] if len(data) == 1 else data
+
+
+def _members(attr_type):
+    if isinstance(attr_type, types.IntersectionType):
+        return attr_type.types
+    return [attr_type]
+
+
+def _dumps(data):
+    line = json.dumps(data, separators=(',', ':'), sort_keys=True) + '\n'
+    return line.encode('ascii')
+
+
+class Exporter(object):
+    """ Appends the types recorded for the classes returned by `source()`,
+    or for every class in registry.monitored if it is None, to files named
+    `path`.0, `path`.1, and so on, every `interval` seconds. '{pid}' in the
+    path is replaced by the id of the writing process. If `backup_count` is
+    set, only that many files are kept besides the one being written."""
+
+    def __init__(self, path, source=None, interval=10.0, max_bytes=64 << 20,
+                 backup_count=None, buffer_size=1 << 16):
+        if max_bytes < 1:
+            raise ValueError('max_bytes must be positive')
+        self.path = path
+        self.source = source or registry.monitored.classes
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.buffer_size = buffer_size
+        self._lock = threading.RLock()
+        self._thread = None
+        self._reset()
+        _exporters.add(self)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._seen = {}     # (class, name, signature) -> (count, sites)
+        self._fd = None
+        self._buffer = []
+        self._buffered = 0
+        self._size = 0
+        self._header_size = 0
+        self._index = None
+
+    @property
+    def base(self):
+        return self.path.format(pid=os.getpid())
+
+    def segments(self):
+        """ Returns the files written by this process so far, oldest
+        first."""
+        return segments(self.base)
+
+    def start(self):
+        """ Starts the background thread."""
+        with self._lock:
+            self._check_fork()
+            if self._thread is None:
+                self._thread = Periodic('pydyty-exporter', self.export,
+                                        self.interval)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stops the background thread, exports one last time and closes
+        the current file."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.stop()
+        self.export()
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                self._flush()
+                os.close(self._fd)
+                self._fd = None
+
+    def export(self):
+        """ Appends what changed since the previous export. Returns the
+        number of lines written."""
+        with self._lock:
+            self._check_fork()
+            lines = self._collect()
+            for line in lines:
+                self._write(line)
+            self._flush()
+            return len(lines)
+
+    def _check_fork(self):
+        # Covers interpreters without os.register_at_fork(), where what
+        # was recorded since the parent's last export is exported again.
+        if self._pid != os.getpid():
+            self._after_fork(skip_recorded=False)
+
+    def _snapshot(self):
+        """ Yields (key, signature, count, sites) for every recorded type.
+        Classes no longer monitored are skipped. The caller holds the merge
+        lock."""
+        for klass in self.source():
+            obj_type = registry.monitored.type_of(klass)
+            if obj_type is None:
+                continue
+            name = hierarchy.qualname(klass)
+            for attr, attr_type in list(obj_type.attrs.items()):
+                for member in _members(attr_type):
+                    sig = _signature(member)
+                    key = (name, attr, json.dumps(sig, sort_keys=True))
+                    loc = member.loc
+                    if loc is None:
+                        yield key, sig, None, {}
+                        continue
+                    sites = dict(
+                        ((s.file, s.line, s.func, s.code), loc.counts[s.key])
+                        for s in loc.locs)
+                    yield key, sig, loc.hits, sites
+
+    def _collect(self):
+        ring.flush()
+        recorder.flush()
+        lines = []
+        seen = self._seen
+        with recorder.merge_lock:
+            for key, sig, count, sites in self._snapshot():
+                if count is None:
+                    if key in seen:
+                        continue
+                    seen[key] = (None, sites)
+                    lines.append(_dumps({
+                        'class': key[0], 'name': key[1], 'type': sig,
+                        'sites': [],
+                    }))
+                    continue
+                prev_count, prev_sites = seen.get(key, (0, {}))
+                # A type first written without a location has no count.
+                prev_count = prev_count or 0
+                if count <= prev_count:
+                    continue
+                seen[key] = (count, sites)
+                lines.append(_dumps({
+                    'class': key[0],
+                    'name': key[1],
+                    'type': sig,
+                    'count': count - prev_count,
+                    'sites': [list(site) + [n - prev_sites.get(site, 0)]
+                              for site, n in sites.items()
+                              if n > prev_sites.get(site, 0)],
+                }))
+        return lines
+
+    def _write(self, line):
+        if self._fd is not None and self._size + len(line) > \
+                self.max_bytes and self._size > self._header_size:
+            self.close()
+        if self._fd is None:
+            self._open()
+        self._buffer.append(line)
+        self._buffered += len(line)
+        self._size += len(line)
+        if self._buffered >= self.buffer_size:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            data = b''.join(self._buffer)
+            self._buffer = []
+            self._buffered = 0
+            while data:
+                data = data[os.write(self._fd, data):]
+
+    def _open(self):
+        base = self.base
+        if self._index is None:
+            existing = segments(base)
+            self._index = _segment_index(existing[-1]) + 1 \
+                if existing else 0
+        else:
+            self._index += 1
+        path = '%s.%d' % (base, self._index)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                           0o644)
+        header = _dumps({'version': store.VERSION, 'pid': os.getpid()})
+        self._buffer = [header]
+        self._buffered = self._size = self._header_size = len(header)
+        if self.backup_count is not None:
+            for old in segments(base)[:-(self.backup_count + 1)]:
+                os.remove(old)
+
+    def _after_fork(self, skip_recorded=True):
+        """ Called in a child process. The parent keeps its files and its
+        thread; the child starts new ones, and skips what the parent has
+        recorded so far."""
+        running = self._thread is not None
+        self._lock = threading.RLock()
+        if self._fd is not None:
+            # The parent writes its own buffered lines.
+            os.close(self._fd)
+        seen = self._seen
+        self._reset()
+        self._thread = None
+        if skip_recorded:
+            # Only this thread runs in the child, so the merge lock is not
+            # needed (and may have been held by another thread at the
+            # fork).
+            for key, _, count, sites in self._snapshot():
+                self._seen[key] = (count, sites)
+        else:
+            self._seen = seen
+        if running:
+            self.start()
+
+
+def _before_fork():
+    for exporter in list(_exporters):
+        exporter._lock.acquire()
+
+
+def _after_fork_in_parent():
+    for exporter in list(_exporters):
+        exporter._lock.release()
+
+
+def _after_fork_in_child():
+    for exporter in list(_exporters):
+        exporter._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_before_fork,
+                        after_in_parent=_after_fork_in_parent,
+                        after_in_child=_after_fork_in_child)
+
+
+def _segment_index(path):
+    return int(path.rsplit('.', 1)[1])
+
+
+def segments(base):
+    """ Returns the files written under `base`, oldest first."""
+    dirname, name = os.path.split(base)
+    pattern = re.compile(re.escape(name) + r'\.\d+$')
+    try:
+        names = os.listdir(dirname or '.')
+    except OSError:
+        return []
+    paths = [os.path.join(dirname, n) for n in names if pattern.match(n)]
+    return sorted(paths, key=_segment_index)
+
+
+def iter_records(paths):
+    """ Yields the lines of the given log files as dicts, with the id of
+    the writing process under 'pid'. Headers are skipped, and so is a
+    line cut short by a process that died while writing it."""
+    for path in paths:
+        pid = None
+        with io.open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                data = json.loads(line.decode('ascii'))
+                if 'version' in data:
+                    if data['version'] != store.VERSION:
+                        raise ValueError('Unsupported log version: %r' %
+                                         (data['version'],))
+                    pid = data['pid']
+                    continue
+                data['pid'] = pid
+                yield data
+
+
+def read(paths):
+    """ Yields the records of the given log files."""
+    for data in iter_records(paths):
+        yield Record(data['class'], data['name'], store.decode(data['type']),
+                     data.get('count'), [tuple(s) for s in data['sites']],
+                     data['pid'])
+
+
+def to_profile(paths):
+    """ Merges the records of the given log files into a store.Profile.
+    Memory grows with the number of distinct types, not with the size of
+    the logs."""
+    profile = store.Profile()
+    for data in iter_records(paths):
+        t = data['type']
+        if data['sites']:
+            t = list(t) if isinstance(t, list) else [t]
+            t.append([data['sites'], 0])
+        profile.merge_class(
+            data['class'],
+            types.ObjectType({data['name']: store.decode(t)}))
+    return profile
@@ -0,0 +1,73 @@
+""" Class hierarchy index used for nominal subtyping.
+
+The qualified names of the ancestors of a class are computed once, from its
+MRO, and kept until the class is garbage collected. Checks against abstract
+base classes, which may have virtual subclasses, go through issubclass() the
+first time and are remembered until a class is registered with any ABC."""
+import abc
+import inspect
+import weakref
+
+# Classes from these modules are named without their module, so that
+# NominalType('int') and the type observed for 1 are the same.
+_BUILTIN_MODULES = frozenset(['builtins', '__builtin__', 'exceptions'])
+
+_ancestors = weakref.WeakKeyDictionary()
+_abc_results = weakref.WeakKeyDictionary()
+# ABC cache token _abc_results were computed under.
+_abc_token = None
+
+
+def qualname(klass):
+    """ Returns the name of a class qualified by its module, or the bare
+    name of a builtin class."""
+    name = getattr(klass, '__qualname__', None) or klass.__name__
+    module = getattr(klass, '__module__', None)
+    if module is None or module in _BUILTIN_MODULES:
+        return name
+    return '%s.%s' % (module, name)
+
+
+def ancestors(klass):
+    """ Returns the qualified names of the class and all its bases."""
+    try:
+        return _ancestors[klass]
+    except KeyError:
+        pass
+    names = frozenset(qualname(base) for base in inspect.getmro(klass))
+    try:
+        _ancestors[klass] = names
+    except TypeError:  # cannot be weakly referenced
+        pass
+    return names
+
+
+def abc_cache_token():
+    """ Returns a value that changes whenever a virtual subclass is
+    registered with an ABC."""
+    get_cache_token = getattr(abc, 'get_cache_token', None)
+    if get_cache_token is not None:
+        return get_cache_token()
+    return abc.ABCMeta._abc_invalidation_counter  # Python 2
+
+
+def is_subclass(klass, base):
+    """ Returns whether `klass` is `base` or one of its subclasses,
+    including virtual subclasses of abstract base classes."""
+    global _abc_token
+    if klass is base or qualname(base) in ancestors(klass):
+        return True
+    if not isinstance(base, abc.ABCMeta):
+        return False
+    token = abc_cache_token()
+    if token != _abc_token:
+        _abc_results.clear()
+        _abc_token = token
+    try:
+        results = _abc_results[klass]
+    except KeyError:
+        results = _abc_results[klass] = weakref.WeakKeyDictionary()
+    result = results.get(base)
+    if result is None:
+        result = results[base] = issubclass(klass, base)
+    return result
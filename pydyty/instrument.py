@@ -0,0 +1,144 @@
+""" Attaches monitoring to existing classes, modules and functions at
+runtime, and detaches it again.
+
+attach() replaces the methods of a class, or the functions and classes
+defined in a module, with recording proxies and remembers the original
+attributes; detach() puts them back. Recorded types are kept in the
+`__pydyty_type__` attribute of the class or module, which stays after
+detaching so a profile can still be collected from it. Attached classes
+are registered in registry.monitored and stay there too. To stop
+recording everywhere at once without detaching anything, use
+monitor.disable()."""
+import inspect
+from . import monitor
+from . import registry
+from . import types
+
+# Attachments keyed by their target class or module.
+_attached = {}
+
+
+class _Attachment(object):
+
+    def __init__(self, target, obj_type):
+        self.target = target
+        self.obj_type = obj_type
+        self.originals = []     # (name, original attribute)
+        self.freezers = []
+        self.children = []      # classes attached along with a module
+
+
+def attach(target, sampler=None, freeze_after=None):
+    """ Starts monitoring a class, a module, or a function.
+
+    For a class, its own methods are monitored. For a module, the
+    functions and classes defined in it are. Both are changed in place and
+    returned. For a function, a monitored copy is returned; its calls are
+    recorded in the `__pydyty_type__` attribute of the copy, and detach()
+    on the copy returns the original.
+
+    `sampler` and `freeze_after` default to monitor.default_sampler and
+    monitor.default_freeze_after. Only methods are frozen. Classes
+    created by the Monitor metaclass, and targets attached already, are
+    left as they are."""
+    if sampler is None:
+        sampler = monitor.default_sampler
+    if freeze_after is None:
+        freeze_after = monitor.default_freeze_after
+    if inspect.isclass(target):
+        _attach_class(target, sampler, freeze_after)
+    elif inspect.ismodule(target):
+        _attach_module(target, sampler, freeze_after)
+    elif inspect.isfunction(target):
+        obj_type = types.ObjectType()
+        proxy = monitor._function_proxy(obj_type, target.__name__, target,
+                                        sampler)
+        proxy.__pydyty_type__ = obj_type
+        return proxy
+    else:
+        raise TypeError('Cannot attach to %r' % (target,))
+    return target
+
+
+def _attachable(target):
+    return (target not in _attached and
+            not isinstance(target, monitor.Monitor))
+
+
+def _attach_class(cls, sampler, freeze_after):
+    if not _attachable(cls):
+        return None
+    obj_type = cls.__dict__.get('__pydyty_type__') or types.ObjectType()
+    attachment = _Attachment(cls, obj_type)
+    for name, value in list(cls.__dict__.items()):
+        if not inspect.isfunction(value):
+            continue
+        freezer = None
+        if freeze_after:
+            freezer = monitor.Freezer(name, value, freeze_after)
+            freezer.owner = cls
+            attachment.freezers.append(freezer)
+        proxy = monitor._proxy(obj_type, name, value, sampler,
+                               '%s.%s' % (cls.__name__, name), freezer)
+        attachment.originals.append((name, value))
+        setattr(cls, name, proxy)
+    cls.__pydyty_type__ = obj_type
+    registry.monitored.register(cls, obj_type)
+    _attached[cls] = attachment
+    return attachment
+
+
+def _attach_module(module, sampler, freeze_after):
+    if module in _attached:
+        return
+    obj_type = module.__dict__.get('__pydyty_type__') or types.ObjectType()
+    attachment = _Attachment(module, obj_type)
+    for name, value in list(vars(module).items()):
+        if getattr(value, '__module__', None) != module.__name__:
+            continue
+        if inspect.isclass(value):
+            child = _attach_class(value, sampler, freeze_after)
+            if child is not None:
+                attachment.children.append(value)
+        elif (inspect.isfunction(value) and
+              not (monitor.aio and monitor.aio.is_async(value))):
+            proxy = monitor._function_proxy(
+                obj_type, name, value, sampler,
+                '%s.%s' % (module.__name__, name))
+            attachment.originals.append((name, value))
+            setattr(module, name, proxy)
+    module.__pydyty_type__ = obj_type
+    _attached[module] = attachment
+
+
+def detach(target):
+    """ Stops monitoring a target passed to attach(), restoring its
+    original attributes. For a monitored copy of a function, returns the
+    original function."""
+    attachment = _attached.pop(target, None)
+    if attachment is None:
+        if inspect.isfunction(target) and \
+                hasattr(target, '__pydyty_type__'):
+            return target.__wrapped__
+        raise ValueError('%r is not attached' % (target,))
+    for freezer in attachment.freezers:
+        freezer.owner = None
+        freezer.frozen = False
+    for name, value in attachment.originals:
+        setattr(target, name, value)
+    for child in attachment.children:
+        if child in _attached:
+            detach(child)
+    return target
+
+
+def detach_all():
+    """ Detaches every attached class and module."""
+    for target in list(_attached):
+        if target in _attached:
+            detach(target)
+
+
+def attached():
+    """ Returns the classes and modules currently attached."""
+    return list(_attached)
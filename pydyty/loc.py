@@ -1,13 +1,67 @@
+import collections
+import dis
+import heapq
+import linecache
+import sys
+import traceback
+
+# Capture modes. CAPTURE_FRAME keeps only the raw (code object, lasti) pair
+# of the calling frame and resolves it lazily. CAPTURE_TRACEBACK eagerly
+# extracts the whole stack (and reads source lines) at capture time.
+CAPTURE_FRAME = 'frame'
+CAPTURE_TRACEBACK = 'traceback'
+
+_capture_mode = CAPTURE_FRAME if hasattr(sys, '_getframe') \
+    else CAPTURE_TRACEBACK
+
+
+def get_capture_mode():
+    return _capture_mode
+
+
+def set_capture_mode(mode):
+    """ Sets how call sites are captured. Returns the previous mode."""
+    global _capture_mode
+    if mode not in (CAPTURE_FRAME, CAPTURE_TRACEBACK):
+        raise ValueError('Unknown capture mode: %r' % (mode,))
+    if mode == CAPTURE_FRAME and not hasattr(sys, '_getframe'):
+        raise ValueError('Frame capture is not supported on this platform')
+    prev = _capture_mode
+    _capture_mode = mode
+    return prev
+
+
+def _line_of(co, lasti):
+    """ Maps a bytecode offset to its source line number."""
+    line = co.co_firstlineno
+    for offset, lineno in dis.findlinestarts(co):
+        if offset > lasti:
+            break
+        if lineno is not None:
+            line = lineno
+    return line
+
+
 class _SingleLocation(object):
     """ Represents a single location. Do not use this directly outside of
     this module. The purpose is to represent a single stack trace slice,
-    which consists of file, line, func, and code."""
+    which consists of file, line, func, and code.
+
+    A location captured from a frame only holds the code object and the
+    last executed instruction. File, line, func, and code are resolved the
+    first time any of them is accessed."""
 
     def __init__(self, **kwargs):
-        self.file = kwargs.get('file')
-        self.line = kwargs.get('line')
-        self.func = kwargs.get('func')
-        self.code = kwargs.get('code')
+        self._co = kwargs.get('co')
+        self._lasti = kwargs.get('lasti')
+        self._file = kwargs.get('file')
+        self._line = kwargs.get('line')
+        self._func = kwargs.get('func')
+        self._code = kwargs.get('code')
+        if self._co is not None:
+            self.key = (self._co, self._lasti)
+        else:
+            self.key = (self._file, self._line, self._func, self._code)
 
     @classmethod
     def create(cls, trace_slice):
@@ -18,24 +72,122 @@ class _SingleLocation(object):
             code=trace_slice[3]
         )
 
+    @classmethod
+    def from_frame(cls, frame):
+        return cls(co=frame.f_code, lasti=frame.f_lasti)
+
+    def _resolve(self):
+        co = self._co
+        if co is None:
+            return
+        line = _line_of(co, self._lasti)
+        code = linecache.getline(co.co_filename, line)
+        self._file = co.co_filename
+        self._line = line
+        self._func = co.co_name
+        self._code = code.strip() if code else None
+        self._co = None
+
+    @property
+    def file(self):
+        if self._co is not None:
+            self._resolve()
+        return self._file
+
+    @property
+    def line(self):
+        if self._co is not None:
+            self._resolve()
+        return self._line
+
+    @property
+    def func(self):
+        if self._co is not None:
+            self._resolve()
+        return self._func
+
+    @property
+    def code(self):
+        if self._co is not None:
+            self._resolve()
+        return self._code
+
+    def __str__(self):
+        return '%s:%s in %s' % (self.file, self.line, self.func)
+
 
 class Location(object):
     """ Represents a location which may consist of an actual code location
-    or a list of multiple code locations."""
+    or a list of multiple code locations.
+
+    Distinct call sites are kept once each, in the order they were first
+    seen, together with the number of times they were hit. If `max_sites`
+    is set, adding a new site beyond that many evicts the site with the
+    lowest score and its count is folded into `other`.
+
+    Scores follow the Space-Saving scheme: a site is scored by its hits,
+    and a site admitted by evicting another starts from the score of the
+    evicted one. A new site thus outranks the sites hit as rarely as the
+    one it replaced and stays while they go first, and long-kept sites
+    that stop being hit are overtaken as new ones come in. Scores are
+    kept in a heap whose stale entries are pushed again when they reach
+    the top, so an eviction takes O(log n) amortized time."""
+
+    # Maximum number of distinct sites kept per location. None means
+    # unbounded.
+    max_sites = None
 
     def __init__(self):
-        self.locs = []
+        self.counts = {}
+        self.other = 0
+        self._index = collections.OrderedDict()
+        self._last = None
+        self._scores = None     # key -> score, from the first eviction on
+        self._heap = None       # [(score, count, seq, key)]
+        self._seq = 0
+
+    @property
+    def locs(self):
+        return list(self._index.values())
 
     def __getitem__(self, i):
         return self.locs[i]
 
+    def __len__(self):
+        return len(self._index)
+
+    def __str__(self):
+        parts = []
+        for loc in self._index.values():
+            count = self.counts[loc.key]
+            parts.append('%s (x%d)' % (loc, count) if count > 1
+                         else str(loc))
+        if self.other:
+            parts.append('%d more' % self.other)
+        return ', '.join(parts)
+
     @property
     def first(self):
         return self.locs[0]
 
     @property
     def last(self):
-        return self.locs[-1]
+        """ The most recently hit site."""
+        return self._last
+
+    @property
+    def hits(self):
+        return sum(self.counts.values()) + self.other
+
+    def count(self, loc):
+        return self.counts.get(loc.key, 0)
+
+    def most_common(self, n=None):
+        """ Returns (site, count) pairs, most hit first."""
+        pairs = sorted(((loc, self.counts[loc.key])
+                        for loc in self._index.values()),
+                       key=lambda pair: -pair[1])
+        return pairs if n is None else pairs[:n]
 
     @classmethod
     def create(cls, trace_slice):
@@ -43,8 +195,92 @@ class Location(object):
         loc.add_trace_slice(trace_slice)
         return loc
 
+    @classmethod
+    def of_code(cls, co, lasti):
+        """ Creates a location for the instruction `lasti` of a code
+        object, resolved lazily like a captured frame."""
+        loc = cls()
+        loc.add_site(_SingleLocation(co=co, lasti=lasti))
+        return loc
+
+    @classmethod
+    def capture(cls, depth=0):
+        """ Creates a location for the call site `depth` frames above the
+        caller of this method, using the current capture mode."""
+        loc = cls()
+        if _capture_mode == CAPTURE_FRAME:
+            frame = sys._getframe(depth + 1)
+            loc.add_site(_SingleLocation.from_frame(frame))
+        else:
+            loc.add_trace_slice(traceback.extract_stack()[-(depth + 2)])
+        return loc
+
+    def add_site(self, site, count=1):
+        key = site.key
+        if key in self.counts:
+            self.counts[key] += count
+            if self._scores is not None:
+                self._scores[key] += count
+            self._last = self._index[key]
+            return
+        score = count
+        if self.max_sites is not None and len(self._index) >= self.max_sites:
+            score += self._evict()
+        self.counts[key] = count
+        self._index[key] = site
+        self._last = site
+        if self._scores is not None:
+            self._scores[key] = score
+            self._push(key)
+
+    def _push(self, key):
+        self._seq += 1
+        heapq.heappush(self._heap, (self._scores[key], self.counts[key],
+                                    self._seq, key))
+
+    def _start_scoring(self):
+        self._scores = dict(self.counts)
+        self._heap = [(count, count, seq, key) for seq, (key, count)
+                      in enumerate(self.counts.items())]
+        heapq.heapify(self._heap)
+        self._seq = len(self._heap)
+
+    def _evict(self):
+        """ Evicts the site with the lowest score, the least hit one among
+        equal scores. Returns its score."""
+        if self._scores is None:
+            self._start_scoring()
+        heap = self._heap
+        while True:
+            score, _, seq, key = heapq.heappop(heap)
+            current = self._scores.get(key)
+            if current == score:
+                break
+            if current is not None:
+                heapq.heappush(heap, (current, self.counts[key], seq, key))
+        del self._scores[key]
+        del self._index[key]
+        self.other += self.counts.pop(key)
+        return score
+
+    def coarsen(self, n):
+        """ Keeps only the `n` sites with the highest scores, folding the
+        counts of the others into `other`. Returns the number of sites
+        evicted."""
+        evicted = 0
+        while len(self._index) > n:
+            self._evict()
+            evicted += 1
+        if self._last is not None and self._last.key not in self._index:
+            self._last = None
+        return evicted
+
     def add_loc(self, loc):
-        self.locs.extend(loc.locs)
+        for site in loc._index.values():
+            self.add_site(site, loc.counts[site.key])
+        self.other += loc.other
+        if loc._last is not None:
+            self._last = self._index.get(loc._last.key, self._last)
 
-    def add_trace_slice(self, trace_slice):
-        self.locs.append(_SingleLocation.create(trace_slice))
+    def add_trace_slice(self, trace_slice, count=1):
+        self.add_site(_SingleLocation.create(trace_slice), count)
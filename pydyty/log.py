@@ -0,0 +1,16 @@
+import logging
+
+# Level below DEBUG used to trace every monitored call. Tracing is decided
+# when a proxy is built, so it has to be enabled before the monitored
+# classes are defined, e.g.
+#
+#     logging.getLogger('pydyty').setLevel(pydyty.log.TRACE)
+TRACE = 5
+logging.addLevelName(TRACE, 'TRACE')
+
+logger = logging.getLogger('pydyty')
+logger.addHandler(logging.NullHandler())
+
+
+def trace_enabled():
+    return logger.isEnabledFor(TRACE)
@@ -1,47 +1,506 @@
-import logging
+import functools
+import inspect
+from . import recorder
+from . import registry
+from . import ring
 from . import types
-from .object_wrapper import ObjectWrapper
+from .log import logger, trace_enabled, TRACE
+from .object_wrapper import ObjectWrapper, _unwrap, type_of, wrap
 
+try:
+    from . import aio
+except SyntaxError:  # no async def before Python 3.6
+    aio = None
 
-def _invoke(recv, cls_type, func_name, func, *args, **kwargs):
-    new_args = []
-    new_kwargs = {}
 
-    logging.info("{} is being invoked...".format(func_name))
+class _Switch(object):
+    """ Global kill switch. Every proxy checks it once per call."""
 
-    for arg in args:
-        obj = arg.__pydyty__ if hasattr(arg, '__pydyty__') else arg
-        new_args.append(ObjectWrapper(obj))
+    on = True
 
-    for k, v in kwargs.iteritems():
-        obj = v.__pydyty__ if hasattr(v, '__pydyty__') else v
-        new_kwargs[k] = obj
 
-    result = func(recv, *new_args, **new_kwargs)
+_switch = _Switch()
+
+
+def enable():
+    """ Turns recording back on after disable()."""
+    _switch.on = True
+
+
+def disable():
+    """ Turns recording off everywhere. Monitored methods then call the
+    original function right away, without wrapping anything."""
+    _switch.on = False
 
-    # TODO: gather type information and store in cls
 
-    arg_types = [arg.__pydyty_type__ for arg in new_args]
+def is_enabled():
+    return _switch.on
+
+
+def _record(cls_type, func_name, new_args, new_kwargs, result, observe,
+            ret_type=None):
+    arg_types = [type_of(arg) for arg in new_args]
     kwarg_types = {}
-    for k, v in new_kwargs.iteritems():
-        kwarg_types[k] = v.__pydyty_type__
+    for k, v in new_kwargs.items():
+        kwarg_types[k] = type_of(v)
+
+    if ret_type is None:
+        ret_type = types.NominalType.of(result)
+
+    new_method_type = types.MethodType.of(arg_types, kwarg_types, ret_type)
+    changed = recorder.record(cls_type, func_name, new_method_type)
+    if observe is not None:
+        observe(changed, new_args, new_kwargs)
+    return new_method_type
+
+
+def _bind_keywords(params, args, kwargs):
+    """ Moves the keyword arguments naming the positional parameters that
+    follow `args` to the positional arguments, in order, so that a call
+    is recorded the same way whether it passes them by position or by
+    name. `params` are the names of the positional parameters, not
+    counting self."""
+    args = list(args)
+    kwargs = dict(kwargs)
+    for name in params[len(args):]:
+        if name not in kwargs:
+            break
+        args.append(kwargs.pop(name))
+    return args, kwargs
+
+
+def _invoke(recv, cls_type, func_name, func, args, kwargs, observe=None,
+            params=None):
+    if kwargs and params:
+        args, kwargs = _bind_keywords(params, args, kwargs)
+    new_args = [wrap(arg) for arg in args]
+    new_kwargs = {}
+    for k, v in kwargs.items():
+        new_kwargs[k] = wrap(v)
+
+    result = func(recv, *new_args, **new_kwargs)
+
+    _record(cls_type, func_name, new_args, new_kwargs, result, observe)
+    return _unwrap(result)
+
+
+# Number of argument shapes, and of result classes per argument shape,
+# whose method types a specialized proxy keeps.
+max_known_shapes = 32
+
+
+def _is_nominal(value):
+    return not isinstance(value, ObjectWrapper) and \
+        type(value) is value.__class__
+
+
+def _finisher(cls_type, func_name, observe):
+    """ Returns the functions a specialized proxy calls with the wrapped
+    positional arguments and the result of the original method: `finish`
+    records the call, and `hit` records it with a method type found in
+    `known`. `known` maps the classes of the arguments, then the class of
+    the result, to the method type of a call where none of them was
+    wrapped. A call of a known shape is neither wrapped, nor are its
+    nominal types looked up or its method type interned."""
+    no_kwargs = {}
+    known = {}
+
+    def finish(new_args, result):
+        method_type = _record(cls_type, func_name, new_args, no_kwargs,
+                              result, observe)
+        if _is_nominal(result) and all(map(_is_nominal, new_args)):
+            shape = tuple(arg.__class__ for arg in new_args)
+            results = known.get(shape)
+            if results is None and len(known) < max_known_shapes:
+                results = known[shape] = {}
+            if results is not None and len(results) < max_known_shapes:
+                results[result.__class__] = method_type
+        return _unwrap(result)
+
+    def hit(method_type, new_args):
+        changed = recorder.record(cls_type, func_name, method_type)
+        if observe is not None:
+            observe(changed, new_args, no_kwargs)
+
+    return finish, hit, known
+
+
+_getargspec = getattr(inspect, 'getfullargspec', None) or inspect.getargspec
+
+
+def _positional_params(func):
+    """ Returns the parameter names of a function that only takes a fixed
+    number of positional parameters (including self), or None."""
+    try:
+        spec = _getargspec(func)
+    except TypeError:
+        return None
+    if (spec.varargs or spec[2] or spec.defaults or not spec.args or
+            getattr(spec, 'kwonlyargs', None)):
+        return None
+    for a in spec.args:
+        # Tuple parameters, or names that clash with the generated code.
+        if not isinstance(a, str) or a.startswith('_pydyty_'):
+            return None
+    return spec.args
+
+
+def _keyword_params(func):
+    """ Returns the names of the parameters of a function that can be
+    passed by position or by name (including self), or None."""
+    try:
+        spec = _getargspec(func)
+    except TypeError:
+        return None
+    names = []
+    for a in spec.args:
+        if not isinstance(a, str):  # a tuple parameter
+            break
+        names.append(a)
+    return names
+
+
+_SPECIALIZED_TEMPLATE = """\
+def _pydyty_make(_pydyty_func, _pydyty_wrap, _pydyty_finish, _pydyty_hit,
+                 _pydyty_known, _pydyty_counter, _pydyty_should_sample,
+                 _pydyty_switch):
+    def proxy(%(params)s):
+%(body)s
+    return proxy
+"""
+
+
+def _specialized_source(params, sampled):
+    recv, args = params[0], params[1:]
+    wrapped = ['_pydyty_w%d' % i for i in range(len(args))]
+    body = ['if not _pydyty_switch.on:',
+            '    return _pydyty_func(%s)' % ', '.join(params)]
+    if sampled:
+        body += ['_pydyty_counter.calls += 1',
+                 'if not _pydyty_should_sample(_pydyty_counter):',
+                 '    return _pydyty_func(%s)' % ', '.join(params),
+                 '_pydyty_counter.sampled += 1']
+    # A known shape has no argument to wrap.
+    raw_args = '(%s)' % ''.join(a + ', ' for a in args)
+    body += ['_pydyty_results = _pydyty_known.get((%s))' %
+             ''.join(a + '.__class__, ' for a in args),
+             'if _pydyty_results is not None:',
+             '    _pydyty_result = _pydyty_func(%s)' % ', '.join(params),
+             '    _pydyty_type = _pydyty_results.get('
+             '_pydyty_result.__class__)',
+             '    if _pydyty_type is None:',
+             '        return _pydyty_finish(%s, _pydyty_result)' % raw_args,
+             '    _pydyty_hit(_pydyty_type, %s)' % raw_args,
+             '    return _pydyty_result']
+    for w, a in zip(wrapped, args):
+        body.append('%s = _pydyty_wrap(%s)' % (w, a))
+    body.append('_pydyty_result = _pydyty_func(%s)' %
+                ', '.join([recv] + wrapped))
+    body.append('return _pydyty_finish((%s), _pydyty_result)' %
+                ''.join(w + ', ' for w in wrapped))
+    return _SPECIALIZED_TEMPLATE % {
+        'params': ', '.join(params),
+        'body': '\n'.join(' ' * 8 + line for line in body),
+    }
+
+
+def _observer(sampler, counter, freezer):
+    """ Returns the function called after a call has been recorded, with
+    whether the method type changed and the arguments, or None."""
+    if freezer is None:
+        if sampler is None:
+            return None
+        return (lambda changed, new_args, new_kwargs:
+                sampler.observe(counter, changed))
+    if sampler is None:
+        return freezer.observe
+
+    def observe(changed, new_args, new_kwargs):
+        sampler.observe(counter, changed)
+        freezer.observe(changed, new_args, new_kwargs)
+
+    return observe
+
+
+def _specialized_proxy(cls_type, func_name, func, params, sampler, key,
+                       freezer=None):
+    """ Generates a proxy with the exact positional signature of `func`,
+    so a call neither packs *args nor builds a kwargs dict."""
+    if sampler is not None:
+        counter = sampler.counter(key)
+        should_sample = sampler.should_sample
+    else:
+        counter = should_sample = None
+    observe = _observer(sampler, counter, freezer)
+    finish, hit, known = _finisher(cls_type, func_name, observe)
+    namespace = {}
+    exec(_specialized_source(params, sampler is not None), namespace)
+    return namespace['_pydyty_make'](
+        func, wrap, finish, hit, known, counter, should_sample, _switch)
 
-    ret_type = types.NominalType(result, is_object=True)
 
-    new_method_type = types.MethodType(arg_types, kwarg_types, ret_type)
-    cls_type.add_attr(func_name, new_method_type)
+def _generic_proxy(cls_type, func_name, func, sampler, key, freezer=None,
+                   params=None):
+    """ Builds a proxy taking *args and **kwargs. Keyword arguments naming
+    the positional parameters `params` (not counting self) are recorded
+    as positional arguments."""
+    if sampler is None:
+        observe = _observer(None, None, freezer)
 
-    # The return value might be an ObjectWrapper object (e.g., a formal
-    # argument was returned). In that case, strip it.
-    if hasattr(result, "__pydyty__"):
-        result = result.__pydyty_obj__
+        def proxy(self, *args, **kwargs):
+            if not _switch.on:
+                return func(self, *args, **kwargs)
+            return _invoke(self, cls_type, func_name, func, args, kwargs,
+                           observe, params)
 
-    return result
+        return proxy
 
+    counter = sampler.counter(key)
+    observe = _observer(sampler, counter, freezer)
 
-def _proxy(cls_type, func_name, func):
-    return (lambda self, *args, **kwargs:
-            _invoke(self, cls_type, func_name, func, *args, **kwargs))
+    def proxy(self, *args, **kwargs):
+        if not _switch.on:
+            return func(self, *args, **kwargs)
+        counter.calls += 1
+        if not sampler.should_sample(counter):
+            return func(self, *args, **kwargs)
+        counter.sampled += 1
+        return _invoke(self, cls_type, func_name, func, args, kwargs,
+                       observe, params)
+
+    return proxy
+
+
+def _async_proxy(cls_type, func_name, func, sampler, key):
+    """ Builds the proxy of a coroutine or async generator method, which
+    records the awaited (or yielded) types instead of the coroutine."""
+    observe = None
+    if sampler is None:
+        should_record = lambda: _switch.on  # noqa
+    else:
+        counter = sampler.counter(key)
+        observe = _observer(sampler, counter, None)
+
+        def should_record():
+            if not _switch.on:
+                return False
+            counter.calls += 1
+            if not sampler.should_sample(counter):
+                return False
+            counter.sampled += 1
+            return True
+
+    def finish(new_args, new_kwargs, result, ret_type=None):
+        _record(cls_type, func_name, new_args, new_kwargs, result, observe,
+                ret_type)
+
+    return aio.proxy(func, should_record, finish)
+
+
+def _deferred_proxy(cls_type, func_name, func, sampler, key, params=None):
+    """ Builds the proxy of a method in deferred mode. Arguments are not
+    wrapped; the classes of the arguments and of the result are appended
+    to the ring buffer, and types are built when it is flushed. Keyword
+    arguments are bound as by the generic proxy."""
+    counter = observe = None
+    if sampler is not None:
+        counter = sampler.counter(key)
+        observe = lambda changed: sampler.observe(counter, changed)  # noqa
+    method_id = ring.register(cls_type, func_name, observe)
+    append = ring.append
+
+    def proxy(self, *args, **kwargs):
+        if not _switch.on:
+            return func(self, *args, **kwargs)
+        if counter is not None:
+            counter.calls += 1
+            if not sampler.should_sample(counter):
+                return func(self, *args, **kwargs)
+            counter.sampled += 1
+        result = func(self, *args, **kwargs)
+        if kwargs and params:
+            args, kwargs = _bind_keywords(params, args, kwargs)
+        append(method_id, tuple(map(type, args)), tuple(kwargs),
+               tuple(map(type, kwargs.values())), type(result))
+        return result
+
+    return proxy
+
+
+def _tracing_proxy(proxy, key):
+    def traced(self, *args, **kwargs):
+        logger.log(TRACE, '%s is being invoked...', key)
+        return proxy(self, *args, **kwargs)
+
+    return traced
+
+
+def _wraps(proxy, func):
+    """ Copies the metadata of `func` that exists onto the proxy."""
+    assigned = [a for a in functools.WRAPPER_ASSIGNMENTS
+                if hasattr(func, a)]
+    proxy = functools.wraps(func, assigned=assigned)(proxy)
+    proxy.__wrapped__ = func
+    return proxy
+
+
+def _proxy(cls_type, func_name, func, sampler=None, key=None, freezer=None,
+           deferred=False):
+    """ Builds the monitoring proxy of a method. Functions taking a fixed
+    number of positional parameters get a specialized proxy; anything
+    else goes through the generic *args/**kwargs one. Coroutine and async
+    generator methods are never frozen or deferred."""
+    key = key or func_name
+    if aio is not None and aio.is_async(func):
+        return _wraps(_async_proxy(cls_type, func_name, func, sampler, key),
+                      func)
+
+    params = None if deferred else _positional_params(func)
+    keywords = None
+    if params is None:
+        keywords = (_keyword_params(func) or [])[1:]
+    if deferred:
+        proxy = _deferred_proxy(cls_type, func_name, func, sampler, key,
+                                keywords)
+    elif params is not None:
+        proxy = _specialized_proxy(cls_type, func_name, func, params,
+                                   sampler, key, freezer)
+    else:
+        proxy = _generic_proxy(cls_type, func_name, func, sampler, key,
+                               freezer, keywords)
+
+    if trace_enabled():
+        proxy = _tracing_proxy(proxy, key)
+    proxy = _wraps(proxy, func)
+    if freezer is not None:
+        freezer.proxy = proxy
+        freezer.params = params
+        freezer.keywords = keywords
+    return proxy
+
+
+def _function_proxy(obj_type, func_name, func, sampler=None, key=None):
+    """ Builds the monitoring proxy of a plain function. Its calls are
+    recorded as calls of method `func_name` of `obj_type`."""
+    proxy = _generic_proxy(obj_type, func_name,
+                           lambda _, *args, **kwargs: func(*args, **kwargs),
+                           sampler, key or func_name,
+                           params=_keyword_params(func))
+
+    def function_proxy(*args, **kwargs):
+        return proxy(None, *args, **kwargs)
+
+    return _wraps(function_proxy, func)
+
+
+_GUARD_TEMPLATE = """\
+def _pydyty_make(_pydyty_func, _pydyty_shapes, _pydyty_miss, _pydyty_type):
+    def guard(%(params)s):
+        if (%(shape)s) in _pydyty_shapes:
+            return _pydyty_func(%(params)s)
+        return _pydyty_miss(%(params)s)
+    return guard
+"""
+
+
+def _guard_source(params):
+    return _GUARD_TEMPLATE % {
+        'params': ', '.join(params),
+        'shape': ''.join('_pydyty_type(%s), ' % a for a in params[1:]),
+    }
+
+
+class Freezer(object):
+    """ Freezes a method once its recorded type has converged.
+
+    After `after` recorded calls in a row that leave the method type
+    unchanged, the proxy on the class is swapped for a guard. The guard
+    only compares the classes of the positional arguments with those seen
+    while recording, and calls the original function when they match.
+    Keyword arguments naming positional parameters count as positional. A
+    call with a new shape, or with other keyword arguments, unfreezes the
+    method and is recorded. A method without arguments is swapped for the
+    original function itself."""
+
+    def __init__(self, func_name, func, after):
+        self.func_name = func_name
+        self.func = func
+        self.after = after
+        self.owner = None   # the class, once it has been created
+        self.proxy = None
+        self.params = None
+        self.keywords = None
+        self.shapes = set()
+        self.stable = 0
+        self.frozen = False
+        self._guard = None
+
+    def observe(self, changed, new_args, new_kwargs):
+        if new_kwargs:
+            self.stable = 0
+            return
+        self.shapes.add(tuple(type(_unwrap(arg)) for arg in new_args))
+        self.stable = 0 if changed else self.stable + 1
+        if self.stable >= self.after:
+            self.freeze()
+
+    def freeze(self):
+        if self.frozen or self.owner is None:
+            return
+        if self._guard is None:
+            self._guard = self._make_guard()
+        self.frozen = True
+        self.stable = 0
+        setattr(self.owner, self.func_name, self._guard)
+
+    def unfreeze(self):
+        if self.frozen:
+            self.frozen = False
+            setattr(self.owner, self.func_name, self.proxy)
+
+    def _miss(self, *args, **kwargs):
+        if not _switch.on:
+            return self.func(*args, **kwargs)
+        self.unfreeze()
+        return self.proxy(*args, **kwargs)
+
+    def _make_guard(self):
+        func = self.func
+        params = self.params
+        if params is not None and len(params) == 1:
+            return func
+        if params is not None:
+            namespace = {}
+            exec(_guard_source(params), namespace)
+            guard = namespace['_pydyty_make'](func, self.shapes, self._miss,
+                                              type)
+        else:
+            shapes = self.shapes
+            miss = self._miss
+            keywords = self.keywords
+
+            def guard(recv, *args, **kwargs):
+                if kwargs and keywords:
+                    args, kwargs = _bind_keywords(keywords, args, kwargs)
+                if not kwargs and tuple(map(type, args)) in shapes:
+                    return func(recv, *args)
+                return miss(recv, *args, **kwargs)
+
+        return _wraps(guard, func)
+
+
+# Sampler used by monitored classes that do not set __pydyty_sampler__.
+# None records every call.
+default_sampler = None
+
+# Number of unchanged recorded calls after which a method is frozen, for
+# monitored classes that do not set __pydyty_freeze__. None never freezes.
+default_freeze_after = None
+
+# Whether monitored classes that do not set __pydyty_deferred__ record
+# through the ring buffer (see pydyty.ring). Deferred methods are never
+# frozen.
+default_deferred = False
 
 
 class Monitor(type):
@@ -49,19 +508,33 @@ class Monitor(type):
     def __new__(cls, name, bases, attrs):
 
         cls_type = types.ObjectType()  # TODO: probably ClassType()
-        setattr(cls, '__pydyty_type__', cls_type)
-        new_attrs = {}
+        new_attrs = {'__pydyty_type__': cls_type}
+        sampler = attrs.get('__pydyty_sampler__', default_sampler)
+        freeze_after = attrs.get('__pydyty_freeze__', default_freeze_after)
+        deferred = attrs.get('__pydyty_deferred__', default_deferred)
+        freezers = []
 
-        for k, v in attrs.iteritems():
-            if hasattr(v, '__call__'):
-                logging.info("{} method is being monitored...".format(k))
-                new_attrs[k] = _proxy(cls_type, k, v)
+        for k, v in attrs.items():
+            if (hasattr(v, '__call__') and
+                    not isinstance(v, (staticmethod, classmethod))):
+                logger.debug('%s method is being monitored...', k)
+                freezer = None
+                if freeze_after and not deferred:
+                    freezer = Freezer(k, v, freeze_after)
+                    freezers.append(freezer)
+                new_attrs[k] = _proxy(cls_type, k, v, sampler,
+                                      '%s.%s' % (name, k), freezer, deferred)
             else:
                 new_attrs[k] = v
 
-        return super(Monitor, cls).__new__(cls, name, bases, new_attrs)
-
+        new_cls = super(Monitor, cls).__new__(cls, name, bases, new_attrs)
+        for freezer in freezers:
+            freezer.owner = new_cls
+        registry.monitored.register(new_cls, cls_type)
+        return new_cls
 
-class Monitored(object):
 
-    __metaclass__ = Monitor
+# Base class of monitored classes. Created by calling the metaclass so that
+# the same definition works on Python 2 and 3.
+Monitored = Monitor('Monitored', (object,), {})
+registry.monitored.unregister(Monitored)
@@ -1,6 +1,42 @@
-import traceback
-import types
-from pydyty.loc import Location
+import operator
+import sys
+import weakref
+from . import types
+from .loc import Location
+
+_setattr = object.__setattr__
+
+# Whether instances of a class are typed structurally (they have a __dict__)
+# rather than nominally, keyed by class.
+_structural = weakref.WeakKeyDictionary()
+
+
+def is_structural(obj):
+    """ Returns whether the object is typed by its attributes rather than
+    by its class. The answer is computed once per class."""
+    klass = type(obj)
+    try:
+        return _structural[klass]
+    except KeyError:
+        result = _structural[klass] = hasattr(obj, '__dict__')
+        return result
+
+
+def wrap(obj):
+    """ Wraps a structural object. Nominally typed values (numbers,
+    strings, None, builtin containers...) are returned as they are, since
+    there is nothing to sniff on them."""
+    if isinstance(obj, ObjectWrapper) or is_structural(obj):
+        return ObjectWrapper(obj)
+    return obj
+
+
+def type_of(obj):
+    """ Returns the type gathered by a wrapper, or the nominal type of an
+    unwrapped value."""
+    if isinstance(obj, ObjectWrapper):
+        return obj.__pydyty_type__
+    return types.NominalType.of(obj)
 
 
 class ObjectWrapper(object):
@@ -8,62 +44,51 @@ class ObjectWrapper(object):
     a context. For our purose, this means a method call. At each method
     call, each argument will be wrapped. Then, any calls to that object is
     "sniffed" by this wrapper, determining the type of the object within the
-    method."""
+    method.
 
-    def __init__(self, obj):
-        """ Wraps around the object with a new ObjectWrapper instance."""
+    Operators and protocol methods (len(), iteration, indexing, comparison,
+    hashing, with statements...) are looked up on the class rather than
+    through __getattr__. They are generated from the _DUNDERS table below
+    and recorded like any other method call. A wrapper only has those the
+    class of the wrapped object has, so hasattr() and ABC checks answer
+    the same for the wrapper as for the object: ObjectWrapper(obj) returns
+    an instance of a subclass declaring them, shared by the classes with
+    the same protocol methods.
 
-        self.__pydyty__ = True
+    Wrappers are slotted and set up without going through __setattr__, as
+    one is created for every structural argument of every recorded call."""
 
-        if hasattr(obj, "__pydyty__"):
-            self.__pydyty_obj__ = obj.__pydyty_obj__
-        else:
-            self.__pydyty_obj__ = obj
+    __slots__ = ('__pydyty_obj__', '__pydyty_type__', '__weakref__')
 
-        if hasattr(obj, "__dict__"):
-            self.__pydyty_type__ = types.ObjectType()
-        else:
-            self.__pydyty_type__ = types.NominalType(obj, is_object=True)
+    __pydyty__ = True
 
-    def __getattribute__(self, name):
-        """ This takes a complete control over attribute access. Any non
-        __pydyty_* attributes will result in an AttributeError which
-        triggers __getattr__ method. """
+    def __new__(cls, obj):
+        if cls is ObjectWrapper:
+            cls = _wrapper_class(type(_unwrap(obj)))
+        return object.__new__(cls)
 
-        attr = object.__getattribute__(self, name)
-        return attr
+    def __init__(self, obj):
+        """ Wraps around the object with a new ObjectWrapper instance."""
+
+        if isinstance(obj, ObjectWrapper):
+            obj = obj.__pydyty_obj__
+        _setattr(self, '__pydyty_obj__', obj)
+        if is_structural(obj):
+            _setattr(self, '__pydyty_type__', types.ObjectType())
+        else:
+            _setattr(self, '__pydyty_type__', types.NominalType.of(obj))
 
     def __setattr__(self, name, value):
         """ Any attribute setter call is routed to here."""
 
         if not name.startswith('__pydyty'):
             object.__setattr__(self.__pydyty_obj__, name, value)
-            self.__pydyty_type__.add_attr(name, types.NominalType(value, is_object=True))  # noqa
+            if isinstance(self.__pydyty_type__, types.ObjectType):
+                self.__pydyty_type__.add_attr(name,
+                                              types.NominalType.of(value))
         else:
             object.__setattr__(self, name, value)
 
-    def __add__(self, other):
-        """ Strip off the argument and apply the original operator. Unless
-        __add__ is overriden, it is NOT possible to wrap the argument. So do
-        not wrap it. We will just NOT support structural type for the
-        argument for now. """
-
-        if hasattr(other, "__pydyty__"):
-            other_obj = other.__pydyty_obj__
-        else:
-            other_obj = other
-        ret_val = self.__pydyty_obj__ + other_obj
-
-        if not isinstance(self.__pydyty_type__, types.NominalType):
-            # Try to get the caller information
-            loc = Location.create(traceback.extract_stack()[-1])
-            arg_types = [types.NominalType(other, is_object=True, loc=loc)]
-            ret_type = types.NominalType(ret_val, is_object=True, loc=loc)
-            method_type = types.MethodType(arg_types, {}, ret_type, loc=loc)
-            self.__pydyty_type__.add_attr("__add__", method_type)
-
-        return ret_val
-
     def __getattr__(self, name):
         """ Any non-__pydyty_* attributes will be routed to here. There are
         methods and fields, which are distinguished by checking '__call__'
@@ -75,35 +100,11 @@ class ObjectWrapper(object):
             original method, records the return type, and returns the actual
             result of the original method call."""
 
-            # Try to get the caller information
-            loc = Location.create(traceback.extract_stack()[-2])
-
-            # Get types of the arguments
-            arg_types = []
-            for arg in args:
-                if hasattr(arg, "__pydyty__"):
-                    arg_types.append(arg.__pydyty_type__)
-                else:
-                    arg_types.append(types.NominalType(arg, is_object=True,
-                                     loc=loc))
-
-            # Get types of the dictionary arguments
-            kwarg_types = {}
-            for kwarg_name, kwarg_val in kwargs.iteritems():
-                if hasattr(kwarg_val, '__pydyty__'):
-                    kwarg_type = kwarg_val.__pydyty_type__
-                else:
-                    kwarg_type = types.NominalType(kwarg_val, is_object=True,
-                                                   loc=loc)
-                kwarg_types[kwarg_name] = kwarg_type
-
-            # Lastly, return type. Run the original method first.
             ret_val = attr(*args, **kwargs)
-            ret_type = types.NominalType(ret_val, is_object=True, loc=loc)
-            method_type = types.MethodType(arg_types, kwarg_types, ret_type,
-                                           loc=loc)
-
-            self.__pydyty_type__.add_attr(name, method_type)
+            if isinstance(self.__pydyty_type__, types.ObjectType):
+                # Try to get the caller information
+                loc = Location.capture(1)
+                _record_call(self, name, args, kwargs, ret_val, loc)
             return ret_val
 
         # Two possibilities: method and field
@@ -114,11 +115,165 @@ class ObjectWrapper(object):
         attr = getattr(self.__pydyty_obj__, name)
         if hasattr(attr, '__call__'):
             return __method_missing__
+        if not isinstance(self.__pydyty_type__, types.ObjectType):
+            return attr
 
         # Try to get the caller information
-        loc = Location.create(traceback.extract_stack()[-1])
+        loc = Location.capture(1)
 
         self.__pydyty_type__.add_attr(
             name, types.NominalType(attr, is_object=True, loc=loc))
 
         return attr
+
+
+def _unwrap(obj):
+    """ Returns the object wrapped by an ObjectWrapper (e.g., a formal
+    argument that a method returns), or the object itself."""
+    if isinstance(obj, ObjectWrapper):
+        return obj.__pydyty_obj__
+    return obj
+
+
+def _arg_type(arg, loc):
+    if isinstance(arg, ObjectWrapper):
+        return arg.__pydyty_type__
+    return types.NominalType(arg, is_object=True, loc=loc)
+
+
+def _record_call(wrapper, name, args, kwargs, ret_val, loc):
+    """ Records a call of method `name` on a structurally typed wrapper."""
+    arg_types = [_arg_type(arg, loc) for arg in args]
+    kwarg_types = {}
+    for kwarg_name, kwarg_val in kwargs.items():
+        kwarg_types[kwarg_name] = _arg_type(kwarg_val, loc)
+    ret_type = types.NominalType(ret_val, is_object=True, loc=loc)
+    method_type = types.MethodType(arg_types, kwarg_types, ret_type, loc=loc)
+    wrapper.__pydyty_type__.add_attr(name, method_type)
+
+
+_NO_KWARGS = {}
+
+
+def _unary(name, op):
+    def dunder(self):
+        ret_val = op(self.__pydyty_obj__)
+        if isinstance(self.__pydyty_type__, types.ObjectType):
+            _record_call(self, name, (), _NO_KWARGS, ret_val,
+                         Location.capture(1))
+        return ret_val
+    return dunder
+
+
+def _binary(name, op):
+    def dunder(self, other):
+        ret_val = op(self.__pydyty_obj__, _unwrap(other))
+        if isinstance(self.__pydyty_type__, types.ObjectType):
+            _record_call(self, name, (other,), _NO_KWARGS, ret_val,
+                         Location.capture(1))
+        return ret_val
+    return dunder
+
+
+def _variadic(name, op):
+    def dunder(self, *args):
+        ret_val = op(self.__pydyty_obj__, *[_unwrap(arg) for arg in args])
+        if isinstance(self.__pydyty_type__, types.ObjectType):
+            _record_call(self, name, args, _NO_KWARGS, ret_val,
+                         Location.capture(1))
+        return ret_val
+    return dunder
+
+
+def _reflected(op):
+    return lambda obj, other: op(other, obj)
+
+
+_PY2 = sys.version_info[0] == 2
+
+_NUMERIC = [
+    ('add', operator.add), ('sub', operator.sub), ('mul', operator.mul),
+    ('truediv', operator.truediv), ('floordiv', operator.floordiv),
+    ('mod', operator.mod), ('divmod', divmod), ('pow', pow),
+    ('lshift', operator.lshift), ('rshift', operator.rshift),
+    ('and', operator.and_), ('xor', operator.xor), ('or', operator.or_),
+]
+if _PY2:
+    _NUMERIC.append(('div', operator.div))
+if hasattr(operator, 'matmul'):
+    _NUMERIC.append(('matmul', operator.matmul))
+
+# (name, maker, operation) of every generated dunder method. The operation
+# is applied to the wrapped object and the unwrapped arguments.
+_DUNDERS = []
+for _name, _op in _NUMERIC:
+    _DUNDERS.append(('__%s__' % _name, _binary, _op))
+    _DUNDERS.append(('__r%s__' % _name, _binary, _reflected(_op)))
+    _iop = getattr(operator, 'i%s' % _name, None)
+    if _iop is not None:
+        _DUNDERS.append(('__i%s__' % _name, _binary, _iop))
+_DUNDERS += [
+    ('__neg__', _unary, operator.neg),
+    ('__pos__', _unary, operator.pos),
+    ('__abs__', _unary, abs),
+    ('__invert__', _unary, operator.invert),
+    ('__int__', _unary, int),
+    ('__float__', _unary, float),
+    ('__complex__', _unary, complex),
+    ('__index__', _unary, operator.index),
+    ('__nonzero__' if _PY2 else '__bool__', _unary, bool),
+    ('__lt__', _binary, operator.lt),
+    ('__le__', _binary, operator.le),
+    ('__eq__', _binary, operator.eq),
+    ('__ne__', _binary, operator.ne),
+    ('__gt__', _binary, operator.gt),
+    ('__ge__', _binary, operator.ge),
+    ('__hash__', _unary, hash),
+    ('__len__', _unary, len),
+    ('__getitem__', _binary, operator.getitem),
+    ('__setitem__', _variadic, operator.setitem),
+    ('__delitem__', _binary, operator.delitem),
+    ('__contains__', _binary, operator.contains),
+    ('__iter__', _unary, iter),
+    ('__reversed__', _unary, reversed),
+    ('next' if _PY2 else '__next__', _unary, next),
+    ('__enter__', _unary, lambda obj: obj.__enter__()),
+    ('__exit__', _variadic, lambda obj, *args: obj.__exit__(*args)),
+]
+del _name, _op, _iop
+
+_DUNDER_METHODS = {}
+for _name, _maker, _op in _DUNDERS:
+    _dunder = _maker(_name, _op)
+    _dunder.__name__ = _name
+    _DUNDER_METHODS[_name] = _dunder
+del _name, _maker, _op, _dunder
+
+# Wrapper classes keyed by the class of the wrapped objects, and by the
+# protocol methods they declare.
+_wrapper_classes = weakref.WeakKeyDictionary()
+_wrapper_classes_by_dunders = {}
+
+
+def _wrapper_class(klass):
+    """ Returns the wrapper class for objects of the given class. It has
+    the protocol methods of the class; those the class sets to None (e.g.
+    __hash__ of a class defining __eq__ only) are None on it as well."""
+    try:
+        return _wrapper_classes[klass]
+    except KeyError:
+        pass
+    dunders = frozenset(
+        (name, getattr(klass, name) is None)
+        for name in _DUNDER_METHODS if hasattr(klass, name))
+    wrapper_class = _wrapper_classes_by_dunders.get(dunders)
+    if wrapper_class is None:
+        attrs = {'__slots__': ()}
+        for name, is_none in dunders:
+            attrs[name] = None if is_none else _DUNDER_METHODS[name]
+        wrapper_class = type('ObjectWrapper', (ObjectWrapper,), attrs)
+        wrapper_class.__module__ = __name__
+        wrapper_class = _wrapper_classes_by_dunders.setdefault(
+            dunders, wrapper_class)
+    _wrapper_classes[klass] = wrapper_class
+    return wrapper_class
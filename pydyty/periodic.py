@@ -0,0 +1,29 @@
+""" Background threads running a task at a fixed interval.
+
+The recorder's flusher, the ring buffer's consumer, the exporter and the
+profile writer all run one: a daemon thread that waits on a stop event
+for `interval` seconds, runs its task, and starts over until stopped."""
+import threading
+
+
+class Periodic(threading.Thread):
+    """ Daemon thread calling `task()` every `interval` seconds until
+    stop() is called."""
+
+    def __init__(self, name, task, interval):
+        super(Periodic, self).__init__(name=name)
+        self.daemon = True
+        self.task = task
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.task()
+
+    def stop(self):
+        """ Stops the thread and waits for the task running, if any, to
+        finish."""
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
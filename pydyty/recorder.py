@@ -0,0 +1,169 @@
+""" Thread-safe recording of observed attribute types.
+
+Every thread records into its own buffer. Buffers are merged into the
+shared object types under a single merge lock, either by the recording
+thread once its buffer holds `flush_every` observations, by an explicit
+flush(), or periodically by a background flusher. With the default
+`flush_every` of 1 each observation is merged right away, so the types
+can be read as soon as a call returns. An observation of a canonical type
+that the attribute already has changes nothing, and is dropped without
+taking the lock; once the signatures of a method are known, recording
+threads do not contend. If a pydyty.budget limit is set, merging goes
+through the budget."""
+import collections
+import threading
+from . import budget
+from .periodic import Periodic
+from .types import IntersectionType
+
+# Number of observations a thread buffers before merging them.
+flush_every = 1
+
+_local = threading.local()
+_buffers = []
+_buffers_lock = threading.Lock()
+# Held while observations are merged into shared types. Hold it to read a
+# consistent snapshot of them.
+merge_lock = threading.Lock()
+_flusher = None
+
+
+class _Buffer(object):
+    """ Observations recorded by one thread. Only the owning thread
+    appends; any thread may drain it. Both are atomic on a deque."""
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.items = collections.deque()
+
+
+def set_flush_every(n):
+    """ Sets how many observations a thread buffers before merging them.
+    Pending observations are merged first. Returns the previous value."""
+    global flush_every
+    if n < 1:
+        raise ValueError('flush_every must be positive')
+    flush()
+    prev = flush_every
+    flush_every = n
+    return prev
+
+
+def _buffer():
+    try:
+        return _local.buffer
+    except AttributeError:
+        buf = _local.buffer = _Buffer(threading.current_thread())
+        with _buffers_lock:
+            _buffers.append(buf)
+        return buf
+
+
+def record(obj_type, name, attr_type):
+    """ Records that attribute `name` of `obj_type` was observed with type
+    `attr_type`. Returns whether this changed the type of the attribute.
+    For buffered observations the answer is based on the last merged
+    state."""
+    if _is_known(obj_type, name, attr_type):
+        return False
+    if flush_every <= 1:
+        with merge_lock:
+            if budget.limit is not None:
+                return budget.add_attr(obj_type, name, attr_type)
+            return obj_type.add_attr(name, attr_type)
+    buf = _buffer()
+    buf.items.append((obj_type, name, attr_type))
+    if len(buf.items) >= flush_every:
+        _merge([buf])
+    return _is_new(obj_type, name, attr_type)
+
+
+def _is_known(obj_type, name, attr_type):
+    """ Returns whether merging a canonical type would leave the attribute
+    as it is. Reads without the merge lock: attributes and the members of
+    intersections are replaced, not changed in place."""
+    if not attr_type._canonical:
+        return False
+    exist = obj_type.attrs.get(name)
+    if exist is attr_type:
+        return True
+    return isinstance(exist, IntersectionType) and \
+        attr_type in exist._members
+
+
+def _is_new(obj_type, name, attr_type):
+    exist = obj_type.attrs.get(name)
+    if exist is None:
+        return True
+    if exist is attr_type or exist == attr_type:
+        return False
+    if isinstance(exist, IntersectionType):
+        return attr_type not in exist._members
+    return True
+
+
+def _drain(buf):
+    items = buf.items
+    for _ in range(len(items)):
+        yield items.popleft()
+
+
+def _merge(buffers):
+    """ Merges the observations of the given buffers. Duplicates are
+    dropped, and the rest are applied in a fixed order per object type (by
+    attribute name, then by hash), so the result of a merge does not depend
+    on how the threads interleaved. Separate merges apply in the order they
+    happen."""
+    by_type = collections.OrderedDict()
+    seen = set()
+    for buf in buffers:
+        for obj_type, name, attr_type in _drain(buf):
+            key = (id(obj_type), name, attr_type)
+            if key not in seen:
+                seen.add(key)
+                by_type.setdefault(id(obj_type), (obj_type, []))[1].append(
+                    (name, hash(attr_type), attr_type))
+    if not by_type:
+        return
+    with merge_lock:
+        add_attr = budget.add_attr if budget.limit is not None else None
+        for obj_type, observations in by_type.values():
+            observations.sort(key=lambda obs: obs[:2])
+            for name, _, attr_type in observations:
+                if add_attr is not None:
+                    add_attr(obj_type, name, attr_type)
+                else:
+                    obj_type.add_attr(name, attr_type)
+
+
+def flush():
+    """ Merges the buffered observations of all threads."""
+    with _buffers_lock:
+        buffers = list(_buffers)
+    _merge(buffers)
+    with _buffers_lock:
+        _buffers[:] = [buf for buf in _buffers
+                       if buf.items or buf.thread.is_alive()]
+
+
+def pending():
+    """ Returns the number of buffered observations not merged yet."""
+    with _buffers_lock:
+        return sum(len(buf.items) for buf in _buffers)
+
+
+def start_flusher(interval=1.0):
+    """ Starts a daemon thread that flushes every `interval` seconds."""
+    global _flusher
+    stop_flusher()
+    _flusher = Periodic('pydyty-flusher', flush, interval)
+    _flusher.start()
+    return _flusher
+
+
+def stop_flusher():
+    global _flusher
+    if _flusher is not None:
+        _flusher.stop()
+        _flusher = None
+        flush()
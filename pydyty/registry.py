@@ -0,0 +1,119 @@
+""" Index of monitored classes.
+
+Every class created by the Monitor metaclass, and every class attached
+with pydyty.instrument, is registered in `monitored` together with its
+ObjectType. Classes are held weakly: once a class is garbage collected
+its entry, and the reference to its type, go away.
+
+Classes can be looked up by their qualified name ('module.Qualname', or
+the bare name of a builtin) or listed by module. If several live classes
+share a qualified name (e.g. classes defined in a function that ran more
+than once), lookups and module listings return the one registered last;
+the others are still iterated over."""
+import threading
+import weakref
+from . import hierarchy
+from . import types
+
+
+class Registry(object):
+    """ Maps monitored classes to their object types."""
+
+    def __init__(self):
+        self._types = weakref.WeakKeyDictionary()
+        self._by_name = {}      # qualified name -> weak reference
+        self._by_module = {}    # module -> {qualified name: weak reference}
+        self._lock = threading.RLock()
+
+    def register(self, klass, obj_type=None):
+        """ Registers a class and returns its object type: `obj_type` if
+        given, else the type it already has, else a new one."""
+        with self._lock:
+            if obj_type is None:
+                obj_type = self._types.get(klass)
+                if obj_type is None:
+                    obj_type = types.ObjectType()
+            self._types[klass] = obj_type
+            name = hierarchy.qualname(klass)
+            module = getattr(klass, '__module__', None)
+            ref = weakref.ref(klass, self._forget_callback(name, module))
+            self._by_name[name] = ref
+            self._by_module.setdefault(module, {})[name] = ref
+            return obj_type
+
+    def _forget_callback(self, name, module):
+        owner = weakref.ref(self)
+
+        def forget(ref):
+            registry = owner()
+            if registry is not None:
+                registry._forget(name, module, ref)
+
+        return forget
+
+    def _forget(self, name, module, ref):
+        with self._lock:
+            if self._by_name.get(name) is ref:
+                del self._by_name[name]
+            names = self._by_module.get(module)
+            if names is not None and names.get(name) is ref:
+                del names[name]
+                if not names:
+                    del self._by_module[module]
+
+    def unregister(self, klass):
+        with self._lock:
+            self._types.pop(klass, None)
+            name = hierarchy.qualname(klass)
+            module = getattr(klass, '__module__', None)
+            ref = self._by_name.get(name)
+            if ref is not None and ref() is klass:
+                self._forget(name, module, ref)
+
+    def type_of(self, klass):
+        """ Returns the object type of a registered class, or None."""
+        return self._types.get(klass)
+
+    def lookup(self, name):
+        """ Returns the registered class with the given qualified name, or
+        None."""
+        ref = self._by_name.get(name)
+        return ref() if ref is not None else None
+
+    def in_module(self, module):
+        """ Returns the registered classes of a module."""
+        with self._lock:
+            refs = list(self._by_module.get(module, {}).values())
+        return [k for k in (ref() for ref in refs) if k is not None]
+
+    def modules(self):
+        with self._lock:
+            return sorted(m for m in self._by_module if m is not None)
+
+    def items(self):
+        """ Returns (class, object type) pairs for the registered classes."""
+        with self._lock:
+            return list(self._types.items())
+
+    def classes(self):
+        with self._lock:
+            return list(self._types.keys())
+
+    def clear(self):
+        with self._lock:
+            self._types.clear()
+            self._by_name.clear()
+            self._by_module.clear()
+
+    def __iter__(self):
+        return iter(self.classes())
+
+    def __len__(self):
+        return len(self._types)
+
+    def __contains__(self, klass):
+        return klass in self._types
+
+
+# Classes monitored in this process.
+monitored = Registry()
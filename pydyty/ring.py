@@ -0,0 +1,172 @@
+""" Deferred recording through a preallocated ring buffer.
+
+In deferred mode a monitored call does not build any type. It appends one
+compact tuple to a ring buffer: the id of the method, the classes of the
+positional arguments, the keyword names and the classes of their values,
+the class of the result, and optionally the call site as a (code object,
+instruction) pair. flush(), or a background consumer, later turns the
+pending tuples into method types and merges them with the recorder.
+
+The buffer has a fixed number of slots. Writers never block: if they get
+a full buffer ahead of the consumer, the oldest pending observations are
+overwritten and counted in `dropped`. Since only classes are kept,
+arguments are typed nominally in this mode."""
+import itertools
+import sys
+import threading
+import weakref
+from . import recorder
+from . import types
+from .loc import Location
+from .periodic import Periodic
+
+# Whether deferred calls also record their call site.
+capture_sites = False
+
+# method id -> (weak reference to the object type, name, observe)
+_methods = {}
+_method_ids = itertools.count()
+_consumer = None
+
+
+def register(obj_type, name, observe=None):
+    """ Returns the id under which calls of method `name` of `obj_type`
+    are appended. `observe(changed)` is called when one is merged. The
+    method is forgotten once `obj_type` is garbage collected, and its
+    pending calls are dropped."""
+    method_id = next(_method_ids)
+    # The callback may run in the middle of any code, so it takes no lock.
+    ref = weakref.ref(obj_type, lambda _: _methods.pop(method_id, None))
+    _methods[method_id] = (ref, name, observe)
+    return method_id
+
+
+class RingBuffer(object):
+    """ Fixed-size buffer of observations. Any thread may append; one
+    consumer at a time drains it."""
+
+    def __init__(self, size=65536):
+        if size < 1:
+            raise ValueError('size must be positive')
+        self.size = size
+        self.dropped = 0
+        self._slots = [None] * size
+        self._counter = itertools.count()
+        self._read = 0
+        self._lock = threading.Lock()
+
+    def append(self, method_id, arg_classes, kwarg_keys, kwarg_classes,
+               ret_class, site=None):
+        seq = next(self._counter)
+        self._slots[seq % self.size] = (seq, method_id, arg_classes,
+                                        kwarg_keys, kwarg_classes,
+                                        ret_class, site)
+
+    def drain(self):
+        """ Returns the observations appended since the last drain, oldest
+        first, and at most `size` of them. Slots are read in order as long
+        as they hold the expected sequence number, so draining takes no
+        slot of its own. An observation whose writer has claimed a slot
+        but not filled it yet is left for the next drain, with everything
+        after it."""
+        with self._lock:
+            size = self.size
+            slots = self._slots
+            read = self._read
+            entries = []
+            while len(entries) < size:
+                entry = slots[read % size]
+                if entry is None or entry[0] < read:
+                    break   # not written yet
+                if entry[0] > read:
+                    # Overwritten: everything up to the oldest observation
+                    # still in the buffer is lost.
+                    skip_to = max(read + 1, entry[0] - size + 1)
+                    self.dropped += skip_to - read
+                    read = skip_to
+                    continue
+                entries.append(entry)
+                read += 1
+            self._read = read
+            return entries
+
+
+buffer = RingBuffer()
+
+
+def set_size(size):
+    """ Replaces the buffer with one of `size` slots. Pending observations
+    are merged first. Returns the previous size."""
+    global buffer
+    prev = buffer.size
+    flush()
+    buffer = RingBuffer(size)
+    return prev
+
+
+def append(method_id, arg_classes, kwarg_keys, kwarg_classes, ret_class,
+           depth=1):
+    """ Appends a call of a registered method. The call site is taken
+    `depth` frames above the caller if capture_sites is set."""
+    site = None
+    if capture_sites:
+        frame = sys._getframe(depth + 1)
+        site = (frame.f_code, frame.f_lasti)
+    buffer.append(method_id, arg_classes, kwarg_keys, kwarg_classes,
+                  ret_class, site)
+
+
+def _method_type(entry):
+    _, _, arg_classes, kwarg_keys, kwarg_classes, ret_class, site = entry
+    of_class = types.NominalType.of_class
+    arg_types = [of_class(c) for c in arg_classes]
+    kwarg_types = dict((k, of_class(c))
+                       for k, c in zip(kwarg_keys, kwarg_classes))
+    ret_type = of_class(ret_class)
+    if site is None:
+        return types.MethodType.of(arg_types, kwarg_types, ret_type)
+    return types.MethodType(arg_types, kwarg_types, ret_type,
+                            loc=Location.of_code(*site))
+
+
+def flush():
+    """ Builds the types of the pending observations and merges them.
+    Returns the number of observations merged."""
+    entries = buffer.drain()
+    built = {}      # repeated observations share their method type
+    merged = 0
+    for entry in entries:
+        method = _methods.get(entry[1])
+        obj_type = method[0]() if method is not None else None
+        if obj_type is None:
+            continue
+        _, name, observe = method
+        if entry[6] is None:
+            key = entry[2:6]
+            method_type = built.get(key)
+            if method_type is None:
+                method_type = built[key] = _method_type(entry)
+        else:
+            method_type = _method_type(entry)
+        changed = recorder.record(obj_type, name, method_type)
+        if observe is not None:
+            observe(changed)
+        merged += 1
+    return merged
+
+
+def start_consumer(interval=0.1):
+    """ Starts a daemon thread that flushes every `interval` seconds."""
+    global _consumer
+    stop_consumer()
+    _consumer = Periodic('pydyty-ring', flush, interval)
+    _consumer.start()
+    return _consumer
+
+
+def stop_consumer():
+    global _consumer
+    if _consumer is not None:
+        _consumer.stop()
+        _consumer = None
+        flush()
@@ -0,0 +1,103 @@
+import random
+from .errors import AbstractClassError
+
+
+class SampleCounter(object):
+    """ Per-method sampling counters. `calls` is the number of invocations
+    seen by the proxy and `sampled` is the number of those that were
+    actually recorded."""
+
+    def __init__(self, key):
+        self.key = key
+        self.calls = 0
+        self.sampled = 0
+        self.stable = 0     # consecutive samples that changed nothing
+        self.interval = 1   # record one call out of `interval`
+        self.skip = 0       # calls left to skip before the next sample
+
+    @property
+    def coverage(self):
+        return float(self.sampled) / self.calls if self.calls else 0.0
+
+    def __repr__(self):
+        return '<SampleCounter %s: %d/%d>' % (self.key, self.sampled,
+                                              self.calls)
+
+
+class Sampler(object):
+    """ Abstract sampler. Decides, per call, whether a monitored method
+    invocation is recorded. Counters are kept per method, keyed by
+    'Class.method', so a single sampler may be shared by many classes."""
+
+    def __init__(self):
+        self.counters = {}
+
+    def counter(self, key):
+        counter = self.counters.get(key)
+        if counter is None:
+            counter = self.counters[key] = SampleCounter(key)
+        return counter
+
+    def should_sample(self, counter):
+        raise AbstractClassError()
+
+    def observe(self, counter, changed):
+        """ Called after a sampled call has been recorded. `changed` tells
+        whether the inferred type of the method changed."""
+        pass
+
+
+class EveryNthSampler(Sampler):
+    """ Records the first call and every nth call after that."""
+
+    def __init__(self, n):
+        super(EveryNthSampler, self).__init__()
+        if n < 1:
+            raise ValueError('n must be positive')
+        self.n = n
+
+    def should_sample(self, counter):
+        return (counter.calls - 1) % self.n == 0
+
+
+class RateSampler(Sampler):
+    """ Records each call with the given probability."""
+
+    def __init__(self, rate, rand=random.random):
+        super(RateSampler, self).__init__()
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError('rate must be between 0 and 1')
+        self.rate = rate
+        self.rand = rand
+
+    def should_sample(self, counter):
+        return counter.calls == 1 or self.rand() < self.rate
+
+
+class ConvergenceSampler(Sampler):
+    """ Records every call until the method type stops changing. After
+    `patience` consecutive samples without a change, the sampling interval
+    doubles, up to `max_interval`. Any change resets the interval to 1."""
+
+    def __init__(self, patience=16, max_interval=1024):
+        super(ConvergenceSampler, self).__init__()
+        self.patience = patience
+        self.max_interval = max_interval
+
+    def should_sample(self, counter):
+        if counter.skip:
+            counter.skip -= 1
+            return False
+        return True
+
+    def observe(self, counter, changed):
+        if changed:
+            counter.stable = 0
+            counter.interval = 1
+        else:
+            counter.stable += 1
+            if counter.stable >= self.patience:
+                counter.stable = 0
+                counter.interval = min(counter.interval * 2,
+                                       self.max_interval)
+        counter.skip = counter.interval - 1
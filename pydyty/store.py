@@ -0,0 +1,296 @@
+""" Persistent, mergeable type profiles.
+
+A profile maps qualified class names to the ObjectType recorded for them.
+Profiles are stored as compact JSON. Each process can write its own
+profile periodically with a ProfileWriter, and profiles written by many
+worker processes can be merged offline:
+
+    python -m pydyty.store -o merged.json worker-*.json
+
+Types are encoded as lists tagged by their first element:
+
+    "T"                             top
+    "B"                             bottom
+    ["N", name]                     nominal
+    ["M", [args], {kwargs}, ret]    method
+    ["O", {attrs}]                  object
+    ["F", name, {attrs}]            fusion
+    ["I", [types], saturated]       intersection
+    ["U", [types]]                  union
+
+A type with a location has one more element, [[site, ...], other], where
+each site is [file, line, func, code, count]."""
+import argparse
+import json
+import os
+from . import hierarchy
+from . import recorder
+from . import registry
+from . import ring
+from . import types
+from .loc import Location
+from .periodic import Periodic
+
+try:
+    basestring
+except NameError:  # Python 3
+    basestring = str
+
+VERSION = 1
+
+_TAGS = {
+    types.TopType: 'T',
+    types.BottomType: 'B',
+    types.NominalType: 'N',
+    types.MethodType: 'M',
+    types.ObjectType: 'O',
+    types.FusionType: 'F',
+    types.IntersectionType: 'I',
+    types.UnionType: 'U',
+}
+
+
+def _encode_loc(loc):
+    sites = [[s.file, s.line, s.func, s.code, loc.counts[s.key]]
+             for s in loc.locs]
+    return [sites, loc.other]
+
+
+def _decode_loc(data):
+    loc = Location()
+    sites, loc.other = data
+    for f, line, func, code, count in sites:
+        loc.add_trace_slice((f, line, func, code), count)
+    return loc
+
+
+def _encode_attrs(attrs):
+    return dict((n, encode(t)) for n, t in attrs.items())
+
+
+def _decode_attrs(data):
+    return dict((n, decode(t)) for n, t in data.items())
+
+
+def encode(t):
+    """ Encodes a type into JSON-compatible lists, strings and dicts."""
+    if t is None:
+        return None
+    tag = _TAGS[type(t)]
+    if tag in ('T', 'B'):
+        data = [tag]
+    elif tag == 'N':
+        data = [tag, t.name]
+        if t.qualname != t.name:
+            data.append(t.qualname)
+    elif tag == 'M':
+        data = [tag, [encode(a) for a in t.arg_types],
+                _encode_attrs(t.kwarg_types), encode(t.ret_type)]
+    elif tag == 'O':
+        data = [tag, _encode_attrs(t.attrs)]
+    elif tag == 'F':
+        data = [tag, t.name, _encode_attrs(t.attrs)]
+        if t.qualname != t.name:
+            data.append(t.qualname)
+    elif tag == 'I':
+        data = [tag, [encode(m) for m in t.types], t.saturated]
+    else:
+        data = [tag, [encode(m) for m in t.types]]
+    if t.loc is not None:
+        data.append(_encode_loc(t.loc))
+    elif len(data) == 1:
+        return tag
+    return data
+
+
+# Number of elements of each encoded type, not counting the location. The
+# name of a nominal or fusion type may be followed by a qualified name.
+_ARITY = {'T': 1, 'B': 1, 'N': 2, 'M': 4, 'O': 2, 'F': 3, 'I': 3, 'U': 2}
+
+
+def decode(data):
+    """ Decodes a type produced by encode(). Location-free types come back
+    as their canonical instances."""
+    if data is None:
+        return None
+    if not isinstance(data, list):
+        data = [data]
+    tag = data[0]
+    arity = _ARITY[tag]
+    qualname = None
+    if len(data) > arity and isinstance(data[arity], basestring):
+        qualname = data[arity]
+        arity += 1
+    loc = None
+    if len(data) > arity:
+        loc = _decode_loc(data[-1])
+    if tag == 'T':
+        t = types.TopType(loc=loc)
+    elif tag == 'B':
+        t = types.BottomType(loc=loc)
+    elif tag == 'N':
+        t = types.NominalType(data[1], qualname=qualname, loc=loc)
+    elif tag == 'M':
+        t = types.MethodType([decode(a) for a in data[1]],
+                             _decode_attrs(data[2]), decode(data[3]),
+                             loc=loc)
+    elif tag == 'O':
+        t = types.ObjectType(_decode_attrs(data[1]), loc=loc)
+    elif tag == 'F':
+        t = types.FusionType(data[1], _decode_attrs(data[2]),
+                             qualname=qualname, loc=loc)
+    elif tag == 'I':
+        t = types.IntersectionType([decode(m) for m in data[1]], loc=loc)
+        t.saturated = data[2]
+    else:
+        t = types.UnionType([decode(m) for m in data[1]], loc=loc)
+    return types.intern_type(t)
+
+
+def merge_type(into, obj_type):
+    """ Merges the attributes of `obj_type` into the object type `into`
+    with the same subtyping rules used while recording. A saturated
+    intersection saturates the attribute it is merged into. The types of
+    `obj_type` are copied first: `into` may change later, and must not
+    change them, e.g. the live type of a class."""
+    obj_type = decode(encode(obj_type))
+    for name, attr_type in obj_type.attrs.items():
+        if isinstance(attr_type, types.IntersectionType):
+            for member in attr_type.types:
+                into.add_attr(name, member)
+            if attr_type.saturated:
+                merged = into.attrs[name]
+                if not isinstance(merged, types.IntersectionType):
+                    merged = types.IntersectionType([merged])
+                    into._set_attr(name, merged)
+                merged.saturate()
+        else:
+            into.add_attr(name, attr_type)
+    return into
+
+
+class Profile(object):
+    """ Maps qualified class names to their recorded object types."""
+
+    def __init__(self, classes=None):
+        self.classes = classes if classes is not None else {}
+
+    @classmethod
+    def collect(cls, monitored_classes=None):
+        """ Creates a profile from the given monitored classes, or from
+        every class in registry.monitored."""
+        if monitored_classes is None:
+            pairs = registry.monitored.items()
+        else:
+            pairs = [(klass, klass.__pydyty_type__)
+                     for klass in monitored_classes]
+        profile = cls()
+        ring.flush()
+        recorder.flush()
+        with recorder.merge_lock:
+            for klass, obj_type in pairs:
+                profile.merge_class(hierarchy.qualname(klass), obj_type)
+        return profile
+
+    def merge_class(self, name, obj_type):
+        into = self.classes.get(name)
+        if into is None:
+            into = self.classes[name] = types.ObjectType()
+        merge_type(into, obj_type)
+
+    def merge(self, other):
+        for name, obj_type in other.classes.items():
+            self.merge_class(name, obj_type)
+        return self
+
+    def to_dict(self):
+        return {
+            'version': VERSION,
+            'classes': dict((n, encode(t)) for n, t in self.classes.items()),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version') != VERSION:
+            raise ValueError('Unsupported profile version: %r' %
+                             (data.get('version'),))
+        return cls(dict((n, decode(t))
+                        for n, t in data['classes'].items()))
+
+    def dump(self, path):
+        """ Writes the profile atomically: readers never see a partially
+        written file."""
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(self.to_dict(), f, separators=(',', ':'),
+                      sort_keys=True)
+        os.rename(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def _merge_chunk(paths):
+    profile = Profile()
+    for path in paths:
+        profile.merge(Profile.load(path))
+    return profile.to_dict()
+
+
+def merge_files(paths, jobs=1):
+    """ Merges the profiles stored at `paths`. With jobs > 1, chunks of
+    files are merged in worker processes first."""
+    paths = list(paths)
+    if jobs <= 1 or len(paths) <= jobs:
+        return Profile.from_dict(_merge_chunk(paths))
+    import multiprocessing
+    chunks = [paths[i::jobs] for i in range(jobs)]
+    pool = multiprocessing.Pool(jobs)
+    try:
+        partials = pool.map(_merge_chunk, chunks)
+    finally:
+        pool.close()
+        pool.join()
+    profile = Profile()
+    for data in partials:
+        profile.merge(Profile.from_dict(data))
+    return profile
+
+
+class ProfileWriter(Periodic):
+    """ Periodically writes the profile of `source()`, a callable returning
+    the monitored classes, to `path`. '{pid}' in the path is replaced by
+    the id of the writing process, so each worker gets its own file."""
+
+    def __init__(self, path, source, interval=60.0):
+        super(ProfileWriter, self).__init__('pydyty-profile-writer',
+                                            self.write, interval)
+        self.path = path
+        self.source = source
+
+    def write(self):
+        path = self.path.format(pid=os.getpid())
+        Profile.collect(self.source()).dump(path)
+        return path
+
+    def stop(self):
+        """ Stops the writer and writes the profile one last time."""
+        super(ProfileWriter, self).stop()
+        return self.write()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m pydyty.store',
+        description='Merges pydyty profiles written by worker processes.')
+    parser.add_argument('profiles', nargs='+')
+    parser.add_argument('-o', '--output', required=True)
+    parser.add_argument('-j', '--jobs', type=int, default=1)
+    args = parser.parse_args(argv)
+    merge_files(args.profiles, args.jobs).dump(args.output)
+
+
+if __name__ == '__main__':
+    main()
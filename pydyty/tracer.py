@@ -0,0 +1,299 @@
+""" Collects types from call and return events instead of proxies.
+
+A Tracer watches every Python function and method whose module name starts
+with one of the given prefixes, without changing any definition. At a call
+it reads the arguments from the frame locals, and at the return it records
+a method type from them and the returned value. On Python 3.12 and later
+it uses sys.monitoring, where the events of code outside the prefixes are
+disabled after their first call; before that it falls back to
+sys.setprofile.
+
+Arguments are typed nominally, by their class, since nothing is wrapped.
+Methods (functions whose first parameter is `self` or `cls`) are recorded
+in the type of the class defining them, and other functions in the type
+of their module. Generators and coroutines are skipped, and so are calls
+into C code, whose arguments are not visible to either API. Calls that
+raise are not recorded. sys.setprofile reports them as returning None, so
+the instruction a frame stopped at tells them apart from returns. Before
+Python 3.9, a frame leaving through a finally block stops at the same
+instruction either way. There, sys.settrace is also set, to tell whether
+an exception was raised in the frame."""
+import dis
+import sys
+import threading
+from . import recorder
+from . import store
+from . import types
+
+# Code flags of generators, coroutines and async generators.
+_CO_SUSPENDABLE = 0x20 | 0x80 | 0x100 | 0x200
+
+# Instructions a frame returns normally at.
+_RETURN_OPS = frozenset(dis.opmap[name] for name in
+                        ('RETURN_VALUE', 'RETURN_CONST')
+                        if name in dis.opmap)
+# Before Python 3.9, the instruction ending a finally block, whether the
+# frame returns or raises.
+_END_FINALLY = dis.opmap.get('END_FINALLY')
+
+BACKEND_MONITORING = 'monitoring'
+BACKEND_SETPROFILE = 'setprofile'
+
+
+def default_backend():
+    if hasattr(sys, 'monitoring'):
+        return BACKEND_MONITORING
+    return BACKEND_SETPROFILE
+
+
+class _Target(object):
+    """ What is known about the code object of a traced function."""
+
+    def __init__(self, code, module):
+        self.code = code
+        self.module = module
+        self.name = getattr(code, 'co_qualname', code.co_name)
+        nargs = code.co_argcount
+        nkwargs = getattr(code, 'co_kwonlyargcount', 0)
+        names = code.co_varnames
+        self.args = names[:nargs]
+        self.kwargs = names[nargs:nargs + nkwargs]
+        self.is_method = bool(self.args) and self.args[0] in ('self', 'cls')
+        self.owner = None   # the class defining the method, once found
+        self.ops = bytearray(code.co_code)
+
+
+class Tracer(object):
+    """ Records the types of functions and methods of the modules whose
+    name starts with any of `prefixes`. Use start() and stop(), or use the
+    tracer as a context manager. Types are kept in `types`, keyed by the
+    qualified name of the class or the name of the module."""
+
+    def __init__(self, prefixes, backend=None):
+        if isinstance(prefixes, str):
+            prefixes = (prefixes,)
+        self.prefixes = tuple(prefixes)
+        self.backend = backend or default_backend()
+        if self.backend not in (BACKEND_MONITORING, BACKEND_SETPROFILE):
+            raise ValueError('Unknown backend: %r' % (self.backend,))
+        if self.backend == BACKEND_MONITORING and \
+                not hasattr(sys, 'monitoring'):
+            raise ValueError('sys.monitoring is not available')
+        self.types = {}
+        self.running = False
+        self._targets = {}
+        self._local = threading.local()
+        self._types_lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def start(self):
+        if self.running:
+            return
+        if self.backend == BACKEND_MONITORING:
+            self._start_monitoring()
+        else:
+            threading.setprofile(self._profile)
+            sys.setprofile(self._profile)
+            if _END_FINALLY is not None:
+                threading.settrace(self._trace)
+                sys.settrace(self._trace)
+        self.running = True
+
+    def stop(self):
+        if not self.running:
+            return
+        if self.backend == BACKEND_MONITORING:
+            self._stop_monitoring()
+        else:
+            sys.setprofile(None)
+            threading.setprofile(None)
+            if _END_FINALLY is not None:
+                sys.settrace(None)
+                threading.settrace(None)
+        self.running = False
+
+    def profile(self):
+        """ Returns the types recorded so far as a store.Profile."""
+        profile = store.Profile()
+        recorder.flush()
+        with recorder.merge_lock:
+            for name, obj_type in list(self.types.items()):
+                profile.merge_class(name, obj_type)
+        return profile
+
+    def _start_monitoring(self):
+        mon = sys.monitoring
+        tool = mon.PROFILER_ID
+        mon.use_tool_id(tool, 'pydyty')
+        events = mon.events
+        mon.register_callback(tool, events.PY_START, self._on_start)
+        mon.register_callback(tool, events.PY_RETURN, self._on_return)
+        mon.register_callback(tool, events.PY_UNWIND, self._on_unwind)
+        mon.set_events(tool, events.PY_START | events.PY_RETURN |
+                       events.PY_UNWIND)
+        # Code disabled by an earlier tracer may match our prefixes.
+        mon.restart_events()
+
+    def _stop_monitoring(self):
+        mon = sys.monitoring
+        tool = mon.PROFILER_ID
+        mon.set_events(tool, 0)
+        for event in (mon.events.PY_START, mon.events.PY_RETURN,
+                      mon.events.PY_UNWIND):
+            mon.register_callback(tool, event, None)
+        mon.free_tool_id(tool)
+
+    def _target(self, code, frame):
+        """ Returns the target of a code object, or False if it is not
+        traced."""
+        target = self._targets.get(code)
+        if target is None:
+            module = frame.f_globals.get('__name__') or ''
+            if (module.startswith(self.prefixes) and
+                    module != 'pydyty' and
+                    not module.startswith('pydyty.') and
+                    not code.co_flags & _CO_SUSPENDABLE):
+                target = _Target(code, module)
+            else:
+                target = False
+            self._targets[code] = target
+        return target
+
+    def _stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            stack = self._local.stack = []
+            return stack
+
+    def _raised(self):
+        """ Ids of the frames of this thread an exception was raised in,
+        for Python before 3.9."""
+        try:
+            return self._local.raised
+        except AttributeError:
+            raised = self._local.raised = set()
+            return raised
+
+    def _call(self, target, frame):
+        f_locals = frame.f_locals
+        args = target.args
+        if target.is_method:
+            obj_type, name = self._method_type(target, f_locals.get(args[0]))
+            args = args[1:]
+        else:
+            obj_type, name = self._type(target.module), target.name
+        arg_types = [types.NominalType.of(f_locals.get(a)) for a in args]
+        kwarg_types = dict((k, types.NominalType.of(f_locals.get(k)))
+                           for k in target.kwargs)
+        self._stack().append((target.code, obj_type, name, arg_types,
+                              kwarg_types))
+
+    def _return(self, code, retval):
+        stack = self._stack()
+        while stack:
+            entry = stack.pop()
+            if entry[0] is code:
+                _, obj_type, name, arg_types, kwarg_types = entry
+                method_type = types.MethodType.of(
+                    arg_types, kwarg_types, types.NominalType.of(retval))
+                recorder.record(obj_type, name, method_type)
+                return
+
+    def _unwind(self, code):
+        stack = self._stack()
+        if stack and stack[-1][0] is code:
+            stack.pop()
+
+    def _type(self, name):
+        obj_type = self.types.get(name)
+        if obj_type is None:
+            with self._types_lock:
+                obj_type = self.types.setdefault(name, types.ObjectType())
+        return obj_type
+
+    def _method_type(self, target, recv):
+        """ Finds the class defining the method, looking up the class of
+        `self` (or `cls` itself) the first time."""
+        owner = target.owner
+        if owner is None:
+            klass = recv if isinstance(recv, type) else type(recv)
+            for base in getattr(klass, '__mro__', (klass,)):
+                func = base.__dict__.get(target.code.co_name)
+                func = getattr(func, '__func__', func)
+                if getattr(func, '__code__', None) is target.code:
+                    owner = base
+                    break
+            else:
+                return self._type(target.module), target.name
+            target.owner = owner = '%s.%s' % (
+                owner.__module__,
+                getattr(owner, '__qualname__', owner.__name__))
+        return self._type(owner), target.code.co_name
+
+    # sys.monitoring callbacks
+
+    def _on_start(self, code, offset):
+        frame = sys._getframe(1)
+        target = self._target(code, frame)
+        if not target:
+            return sys.monitoring.DISABLE
+        self._call(target, frame)
+
+    def _on_return(self, code, offset, retval):
+        target = self._targets.get(code)
+        if target is False:
+            return sys.monitoring.DISABLE
+        if target is not None:
+            self._return(code, retval)
+
+    def _on_unwind(self, code, offset, exc):
+        if self._targets.get(code):
+            self._unwind(code)
+
+    # sys.setprofile callback
+
+    def _profile(self, frame, event, arg):
+        if event == 'call':
+            target = self._target(frame.f_code, frame)
+            if target:
+                self._call(target, frame)
+        elif event == 'return':
+            target = self._targets.get(frame.f_code)
+            if target:
+                if self._unwinding(target, frame):
+                    self._unwind(frame.f_code)
+                else:
+                    self._return(frame.f_code, arg)
+
+    def _unwinding(self, target, frame):
+        """ Returns whether a frame reported as returning is unwinding
+        because of an exception."""
+        op = target.ops[frame.f_lasti]
+        if _END_FINALLY is not None:
+            raised = self._raised()
+            if id(frame) in raised:
+                raised.discard(id(frame))
+                if op == _END_FINALLY:
+                    return True
+        return op not in _RETURN_OPS and op != _END_FINALLY
+
+    # sys.settrace callbacks, before Python 3.9
+
+    def _trace(self, frame, event, arg):
+        if event == 'call' and self._target(frame.f_code, frame):
+            if hasattr(frame, 'f_trace_lines'):
+                frame.f_trace_lines = False
+            return self._trace_frame
+
+    def _trace_frame(self, frame, event, arg):
+        if event == 'exception':
+            self._raised().add(id(frame))
+        return self._trace_frame
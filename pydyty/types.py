@@ -1,52 +1,166 @@
 # import logging
-from typing import Typing
-from errors import AbstractClassError
-from errors import NominalTypeInitError
+import weakref
+from . import hierarchy
+from .typing import Typing
+from .errors import AbstractClassError
+from .errors import NominalTypeInitError
+from .loc import Location
+
+try:
+    basestring
+except NameError:  # Python 3
+    basestring = str
+
+# Canonical instances of location-free, immutable types keyed by their
+# structural key. Entries go away once nothing else refers to them.
+_interned = weakref.WeakValueDictionary()
+
+# Canonical nominal types keyed by the class of the observed objects.
+_nominal_by_class = weakref.WeakKeyDictionary()
+
+# Marks a type whose rendering is in progress. A change to it (or to any
+# type inside it) meanwhile replaces the mark, so the result is not kept.
+_RENDERING = object()
+
+
+def intern_type(t):
+    """ Returns the canonical instance that is structurally identical to
+    the given type. Types that carry a location or may still change (object
+    types, composite types) are returned as they are."""
+    if t._canonical or not t._can_intern():
+        return t
+    canon = _interned.setdefault(t._key, t)
+    canon._canonical = True
+    return canon
 
 
 class PydytyType(object):
     """ Abstract type to represent a type. """
 
+    # Whether the structure of the type can change after construction.
+    # Frozen types precompute their hash.
+    _frozen = False
+
+    # Whether this is the single shared instance of its structure. Two
+    # canonical types are equal only if they are identical.
+    _canonical = False
+
+    # The rendered form, or None if it has to be rendered again.
+    _str = None
+
+    # Weak references to the rendered types this type is a part of, so
+    # that they are rendered again when it changes. Only types that can
+    # change have them.
+    _parents = None
+
     def __init__(self, loc=None, **kwargs):
         self.loc = loc
 
     def __str__(self):
+        s = self._str
+        if s is None or s is _RENDERING:
+            self._str = _RENDERING
+            if not self._frozen:
+                # Link first, so a part changing meanwhile is noticed.
+                for child in self._children():
+                    self._link(child)
+            s = self._render()
+            if self._str is _RENDERING:
+                self._str = s
+        return s
+
+    def _render(self):
         raise AbstractClassError()
 
+    def _children(self):
+        """ Returns the types rendered as part of this type."""
+        return ()
+
+    def _link(self, child):
+        """ Makes `child` part of this type for rendering purposes."""
+        if child is None or child._frozen:
+            return
+        parents = child._parents
+        if parents is None:
+            child._parents = [weakref.ref(self)]
+            return
+        alive = []
+        for ref in parents:
+            parent = ref()
+            if parent is self:
+                return
+            if parent is not None:
+                alive.append(ref)
+        alive.append(weakref.ref(self))
+        child._parents = alive
+
+    def _changed(self):
+        """ Drops the rendered form of this type and of every type it is a
+        part of. A type that is not rendered has no rendered parents, so
+        the walk stops there."""
+        if self._str is None:
+            return
+        self._str = None
+        for ref in self._parents or ():
+            parent = ref()
+            if parent is not None:
+                parent._changed()
+
     def __eq__(self, other):
         raise AbstractClassError()
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
+    def __hash__(self):
+        raise AbstractClassError()
+
+    def _can_intern(self):
+        return self._frozen and self.loc is None
+
     def add_loc(self, loc):
-        if self.loc is not None:
-            self.loc.add_loc(loc)
-        else:
-            self.loc = loc
+        if loc is None or self._canonical:
+            # Canonical types are shared and never carry a location.
+            return
+        if self.loc is None:
+            # Do not share the other type's location; it may still grow.
+            self.loc = Location()
+        self.loc.add_loc(loc)
 
 
 class TopType(PydytyType):
     """ Represents the top type of all. Should not be used in real life.
     Only used to represent untyped/uninferred methods/properties."""
 
+    _frozen = True
+    _key = ('T',)
+
     def __str__(self):
         return '<<Top>>'
 
     def __eq__(self, other):
         return isinstance(other, TopType)
 
+    def __hash__(self):
+        return hash(self._key)
+
 
 class BottomType(PydytyType):
     """ Represents the bottom type. Should not be used in real life. Only
     used to represent untyped/uninferred methods/properties."""
 
+    _frozen = True
+    _key = ('B',)
+
     def __str__(self):
         return '<<Bottom>>'
 
     def __eq__(self, other):
         return isinstance(other, BottomType)
 
+    def __hash__(self):
+        return hash(self._key)
+
 
 class CompositeType(PydytyType):
     """ Abstract type that consists of one or more types."""
@@ -58,13 +172,16 @@ class CompositeType(PydytyType):
     def add_type(self, _type):
         """ Adds another type to the list of possible types. """
         self.types.append(_type)
+        self._changed()
         self.add_loc(_type.loc)
         return self
 
-    def __str__(self):
-        raise AbstractClassError()
+    def _children(self):
+        return self.types
 
     def __eq__(self, other):
+        if self is other:
+            return True
         result = isinstance(other, self.__class__)
         if result:
             if len(self.types) != len(other.types):
@@ -76,24 +193,212 @@ class CompositeType(PydytyType):
                     break
         return result
 
+    def __hash__(self):
+        return hash((self.__class__.__name__, tuple(self.types)))
+
 
 class UnionType(CompositeType):
     """ Represents an union type. This can be any of the types expressed in
     the union type. To avoid complicated typing, we will not be using this
     with method types."""
 
-    def __str__(self):
+    def __init__(self, types, **kwargs):
+        super(UnionType, self).__init__(types, **kwargs)
+        self._members = set(types)
+
+    def add_type(self, _type):
+        self._members.add(_type)
+        return super(UnionType, self).add_type(_type)
+
+    def _render(self):
         return ' or '.join(['(%s)' % str(t) for t in self.types])
 
 
 class IntersectionType(CompositeType):
     """ Represents an intersection type. This means ALL of the types
     expressed in this type must be true. This is a complicated type. So we
-    apply this only to methods."""
+    apply this only to methods.
 
-    def __str__(self):
-        s = ' and '.join(['(%s)' % str(t) for t in self.types])
-        return s
+    Members are kept distinct: a type equal to, or subsumed by, an existing
+    member is not added again. Once there are more than `max_types`
+    members, the intersection is saturated and collapses to a single
+    summary member which later types are merged into. The canonical forms
+    of the types merged into the summary stay in `_members`, so merging an
+    equal type again is a set lookup."""
+
+    # Maximum number of distinct members. None means unbounded.
+    max_types = 16
+
+    def __init__(self, types, **kwargs):
+        super(IntersectionType, self).__init__([], **kwargs)
+        self.saturated = False
+        self._members = set()
+        for t in types:
+            if t not in self._members:
+                self._members.add(t)
+                self.types.append(t)
+
+    def add_type(self, _type):
+        """ Adds another type to the intersection. See absorb()."""
+        self.absorb(_type)
+        self.add_loc(_type.loc)
+        return self
+
+    def absorb(self, _type):
+        """ Merges a type into the intersection and returns whether the
+        intersection changed. Members that are subtypes of the new type
+        make it redundant; members the new type is a subtype of are
+        replaced by it."""
+        if self.saturated:
+            if _type in self._members:
+                return False
+            canon = _canonical_form(_type)
+            if canon is not None:
+                self._members.add(canon)
+            if _covers(self.types[0], _type):
+                return False
+            summary = _summarize(self.types + [_type])
+            if summary == self.types[0]:
+                return False
+            self.types = [summary]
+            self._changed()
+            return True
+        if _type in self._members:
+            if _type.loc is not None:
+                # Count the hit on the equal member.
+                for t in self.types:
+                    if t == _type:
+                        if t is not _type:
+                            t.add_loc(_type.loc)
+                        break
+            return False
+        kept = []
+        for t in self.types:
+            if Typing.is_subtype(t, _type):
+                return False
+            if not Typing.is_subtype(_type, t):
+                kept.append(t)
+        kept.append(_type)
+        if self.max_types is not None and len(kept) > self.max_types:
+            self._collapse(kept)
+        else:
+            self._set_members(kept)
+        return True
+
+    def saturate(self):
+        """ Collapses the intersection to the summary of its members, as
+        if it had grown past `max_types`. Returns whether it changed."""
+        if self.saturated:
+            return False
+        self._collapse(self.types)
+        return True
+
+    def widen(self):
+        """ Collapses the intersection to the top type and saturates it, so
+        nothing merged into it changes it anymore. Returns whether it
+        changed."""
+        if self.saturated and isinstance(self.types[0], TopType):
+            return False
+        self.saturated = True
+        self._set_members([intern_type(TopType())])
+        return True
+
+    def _collapse(self, types):
+        """ Saturates the intersection with the summary of `types`."""
+        self.saturated = True
+        self._set_members([_summarize(types)])
+        for t in types:
+            canon = _canonical_form(t)
+            if canon is not None:
+                self._members.add(canon)
+
+    def _set_members(self, types):
+        self.types = types
+        self._members = set(types)
+        self._changed()
+
+    def _render(self):
+        return ' and '.join(['(%s)' % str(t) for t in self.types])
+
+
+def _union(types):
+    """ Returns the union of the given types, flattening nested unions and
+    dropping duplicates. A single remaining type is returned as is."""
+    flat = []
+    seen = set()
+    objects = []    # object types hash by identity; compared instead
+    for t in types:
+        for u in (t.types if isinstance(t, UnionType) else [t]):
+            if u in seen:
+                continue
+            if isinstance(u, ObjectType):
+                if any(u == o for o in objects):
+                    continue
+                objects.append(u)
+            seen.add(u)
+            flat.append(u)
+    return flat[0] if len(flat) == 1 else UnionType(flat)
+
+
+def _canonical_form(t):
+    """ Returns the canonical type equal to `t` but for its location, or
+    None if there is none."""
+    if t._canonical:
+        return t
+    if isinstance(t, MethodType) and t._frozen:
+        return MethodType.of(t.arg_types, t.kwarg_types, t.ret_type)
+    return None
+
+
+def _covers(summary, t):
+    """ Returns whether a summary made by _summarize() already has every
+    part of `t`, so merging `t` into it would leave it as it is. Parts are
+    looked up, not checked for subtyping, like _summarize() merges them."""
+    if isinstance(summary, TopType):
+        return True
+    if not isinstance(summary, MethodType) or \
+            not isinstance(t, MethodType):
+        return False
+    if len(t.arg_types) != len(summary.arg_types) or \
+            len(t.kwarg_types) != len(summary.kwarg_types):
+        return False
+    for k, kwarg_type in t.kwarg_types.items():
+        if not _has_part(summary.kwarg_types.get(k), kwarg_type):
+            return False
+    for arg_type, part in zip(t.arg_types, summary.arg_types):
+        if not _has_part(part, arg_type):
+            return False
+    return _has_part(summary.ret_type, t.ret_type)
+
+
+def _has_part(union, t):
+    if union is None:
+        return False
+    if isinstance(union, UnionType) and not isinstance(t, UnionType):
+        if t in union._members:
+            return True
+        # Object types hash by identity: an equal one is not found.
+        return not t._canonical and Typing.is_subtype(t, union)
+    return union == t
+
+
+def _summarize(types):
+    """ Widens a list of types to a single type covering all of them. Method
+    types of the same shape become one method type whose argument and
+    return types are unions. Anything else widens to the top type."""
+    if not all(isinstance(t, MethodType) for t in types):
+        return TopType()
+    arity = len(types[0].arg_types)
+    keys = sorted(types[0].kwarg_types)
+    for t in types[1:]:
+        if len(t.arg_types) != arity or sorted(t.kwarg_types) != keys:
+            return TopType()
+    arg_types = [_union([t.arg_types[i] for t in types])
+                 for i in range(arity)]
+    kwarg_types = dict((k, _union([t.kwarg_types[k] for t in types]))
+                       for k in keys)
+    ret_type = _union([t.ret_type for t in types])
+    return MethodType(arg_types, kwarg_types, ret_type)
 
 
 class MethodType(PydytyType):
@@ -109,6 +414,50 @@ class MethodType(PydytyType):
         self.arg_types = arg_types
         self.kwarg_types = kwarg_types
         self.ret_type = ret_type
+        self._key = MethodType._make_key(arg_types, kwarg_types, ret_type)
+        self._frozen = all(t is None or t._frozen
+                           for t in self._components())
+        self._hash = hash(self._key) if self._frozen else None
+
+    @staticmethod
+    def _make_key(arg_types, kwarg_types, ret_type):
+        key = ['M', len(arg_types)]
+        key.extend(arg_types)
+        for k in sorted(kwarg_types):
+            key.append(k)
+            key.append(kwarg_types[k])
+        key.append(ret_type)
+        return tuple(key)
+
+    def _can_intern(self):
+        """ A method type is shared only if all of its components are."""
+        return (self._frozen and self.loc is None and
+                all(t is None or t._canonical for t in self._components()))
+
+    def _children(self):
+        return self._components()
+
+    def _components(self):
+        for t in self.arg_types:
+            yield t
+        for k in self.kwarg_types:
+            yield self.kwarg_types[k]
+        yield self.ret_type
+
+    @classmethod
+    def of(cls, arg_types, kwarg_types, ret_type):
+        """ Returns the canonical method type for the given argument and
+        return types, allocating a new one only the first time the
+        signature is seen."""
+        arg_types = [intern_type(t) for t in arg_types]
+        kwarg_types = dict((k, intern_type(t))
+                           for k, t in kwarg_types.items())
+        ret_type = intern_type(ret_type)
+        canon = _interned.get(cls._make_key(arg_types, kwarg_types,
+                                            ret_type))
+        if canon is not None:
+            return canon
+        return intern_type(cls(arg_types, kwarg_types, ret_type))
 
     @classmethod
     def create_empty(self, num_of_args, kwarg_keys, **kwargs):
@@ -122,7 +471,7 @@ class MethodType(PydytyType):
         ret_type = BottomType(**kwargs)
         return MethodType(arg_types, kwargs_types, ret_type, **kwargs)
 
-    def __str__(self):
+    def _render(self):
         args = [str(arg_type) for arg_type in self.arg_types]
         if args:
             args = ', '.join(args)
@@ -141,8 +490,12 @@ class MethodType(PydytyType):
         return ('(%s) -> %s' % (all_args, self.ret_type))
 
     def __eq__(self, other):
+        if self is other:
+            return True
+        if self._canonical and getattr(other, '_canonical', False):
+            return False
         result = isinstance(other, self.__class__)
-        if len(self.arg_types) != len(other.arg_types):
+        if result and len(self.arg_types) != len(other.arg_types):
             result = False
         if result:
             if len(self.kwarg_types) != len(other.kwarg_types):
@@ -158,41 +511,123 @@ class MethodType(PydytyType):
                 if self.kwarg_types[k] != other.kwarg_types.get(k):
                     result = False
                     break
+        if result:
+            result = self.ret_type == other.ret_type
         return result
 
+    def __hash__(self):
+        if self._hash is not None:
+            return self._hash
+        return hash(self._key)
+
+
+def _is_wrapper(obj):
+    # Looked up on the class, so the ObjectWrapper class itself is not
+    # mistaken for a wrapper.
+    return getattr(type(obj), '__pydyty__', False)
+
 
 class NominalType(PydytyType):
-    """ Represents a nominal type. """
+    """ Represents a nominal type. A nominal type created from an object
+    keeps a weak reference to its class, and is identified by the qualified
+    name of the class (module and name; builtins go by their bare name).
+    A nominal type created from a name has no class and is identified by
+    that name."""
+
+    _frozen = True
 
-    def __init__(self, name_or_obj, is_object=False, **kwargs):
+    def __init__(self, name_or_obj, is_object=False, qualname=None,
+                 is_class=False, **kwargs):
         """ For convenience, we allow either name of the nominal type or an
-        object from which you'd like to retrive type information."""
+        object from which you'd like to retrive type information, or with
+        is_class, the class of such objects."""
         super(NominalType, self).__init__(**kwargs)
-        if is_object:
-            if hasattr(name_or_obj, '__pydyty__'):  # object wrapper
-                self.name = name_or_obj.__pydyty_obj__.__class__.__name__
+        self._klass = None
+        if is_class:
+            self._set_class(name_or_obj)
+        elif is_object:
+            if _is_wrapper(name_or_obj):  # object wrapper
+                klass = name_or_obj.__pydyty_obj__.__class__
             elif hasattr(name_or_obj, '__class__'):
-                self.name = name_or_obj.__class__.__name__
+                klass = name_or_obj.__class__
             else:
-                self.name = type(name_or_obj).__name__
+                klass = type(name_or_obj)
+            self._set_class(klass)
         elif not isinstance(name_or_obj, basestring):
             raise NominalTypeInitError()
         else:
             self.name = name_or_obj
+            self.qualname = qualname or name_or_obj
+        self._key = ('N', self.qualname)
+        self._hash = hash(self._key)
+
+    def _set_class(self, klass):
+        self.name = klass.__name__
+        self.qualname = hierarchy.qualname(klass)
+        try:
+            self._klass = weakref.ref(klass)
+        except TypeError:
+            pass
+
+    @property
+    def klass(self):
+        """ The class of this type, or None if it was created from a name
+        or the class is gone."""
+        return self._klass() if self._klass is not None else None
+
+    @classmethod
+    def of_class(cls, klass):
+        """ Returns the canonical nominal type of instances of the given
+        class."""
+        t = _nominal_by_class.get(klass)
+        if t is None:
+            t = intern_type(cls(klass, is_class=True))
+            _nominal_by_class[klass] = t
+        return t
+
+    @classmethod
+    def of(cls, obj):
+        """ Returns the canonical nominal type of the given object. The
+        type is looked up by the class of the object, so no new type is
+        allocated for a class that has been seen before."""
+        klass = obj.__class__
+        t = _nominal_by_class.get(klass)
+        if t is None:
+            if _is_wrapper(obj):  # object wrapper
+                return cls.of(obj.__pydyty_obj__)
+            t = intern_type(cls(obj, is_object=True))
+            _nominal_by_class[klass] = t
+        return t
 
     def __str__(self):
         return self.name
 
     def __eq__(self, other):
+        if self is other:
+            return True
+        if self._canonical and getattr(other, '_canonical', False):
+            return False
         result = isinstance(other, self.__class__)
-        return result and (self.name == other.name)
+        return result and (self.qualname == other.qualname)
+
+    def __hash__(self):
+        return self._hash
+
+
+def _is_nominal_value(t):
+    return isinstance(t, NominalType) and not isinstance(t, ObjectType)
 
 
 class ObjectType(PydytyType):
     """ Represents a structural type. It only represents a single layer
     without a meta layer. In other words, class level type information is
     not part of an object type. Use ClassType. Or use InferredNominalType to
-    do both at the same time."""
+    do both at the same time.
+
+    Attributes are added in place, so an object type is hashed by identity:
+    a hash of its attributes would change under the sets holding it. Equal
+    but distinct object types are told apart by hashed containers and
+    compared structurally elsewhere."""
 
     def __init__(self, attrs=None, **kwargs):
         super(ObjectType, self).__init__(**kwargs)
@@ -201,28 +636,55 @@ class ObjectType(PydytyType):
     def add_attr(self, name, attr_type):
         """ Adds a method to the object type. If there exists an entry
         with the same name, then we do subtyping comparisons to see if we
-        can consolidate. If not, we create an intersection type."""
+        can consolidate. If not, we create an intersection type. Returns
+        whether the type of the attribute changed."""
         if name in self.attrs:
             exist_attr_type = self.attrs[name]
+            if exist_attr_type is attr_type:
+                return False
+            if _is_nominal_value(exist_attr_type) and \
+                    _is_nominal_value(attr_type):
+                # A value attribute widens to the common supertype.
+                if Typing.is_subtype(attr_type, exist_attr_type):
+                    return False
+                elif Typing.is_subtype(exist_attr_type, attr_type):
+                    self._set_attr(name, attr_type)
+                    return True
             if isinstance(exist_attr_type, IntersectionType):
-                exist_attr_type.add_type(attr_type)
+                changed = exist_attr_type.absorb(attr_type)
+                exist_attr_type.add_loc(attr_type.loc)
+                return changed
             elif Typing.is_subtype(attr_type, exist_attr_type):
-                self.attrs[name] = attr_type
+                if attr_type == exist_attr_type and \
+                        exist_attr_type.loc is not None:
+                    # Same type again; keep it and count the new site.
+                    exist_attr_type.add_loc(attr_type.loc)
+                    return False
+                self._set_attr(name, attr_type)
+                return attr_type != exist_attr_type
             elif Typing.is_subtype(exist_attr_type, attr_type):
-                pass
+                return False
             else:
-                attr_type = IntersectionType([exist_attr_type, attr_type])
-                self.attrs[name] = attr_type
+                self._set_attr(name, IntersectionType([exist_attr_type,
+                                                       attr_type]))
         else:
-            self.attrs[name] = attr_type
+            self._set_attr(name, attr_type)
+        return True
+
+    def _set_attr(self, name, attr_type):
+        self.attrs[name] = attr_type
+        self._changed()
+
+    def _children(self):
+        return list(self.attrs.values())
 
     def add_empty_method(self, name, num_of_args, kwarg_keys):
         """ Adds an empty method type to the list. This WILL overwrite the
         existing type for the method if there exists one already."""
         attr_type = MethodType.create_empty(num_of_args, kwarg_keys)
-        self.attrs[name] = attr_type
+        self._set_attr(name, attr_type)
 
-    def __str__(self):
+    def _render(self):
         types = sorted(self.attrs)
         tlist = ['%s: %s' % (n, self.attrs[n]) for n in types]
         return '[%s]' % ', '.join(tlist) if tlist else '[]'
@@ -233,24 +695,32 @@ class ObjectType(PydytyType):
             if len(self.attrs) != len(other.attrs):
                 result = False
         if result:
-            for n, t in self.attrs.iteritems():
+            for n, t in self.attrs.items():
                 other_method = other.attrs.get(n, None)
                 if (other_method is None) or t != other.attrs.get(n, None):
                     result = False
                     break
         return result
 
+    def __hash__(self):
+        return object.__hash__(self)
+
 
 class FusionType(NominalType, ObjectType):
     """ Similar to ObjectType except it has a name. For instance A[foo, bar]
     can be understood as an object with foo and bar methods like A."""
 
+    _frozen = False
+
     def __init__(self, name_or_obj, attrs={},
-                 is_object=False, **kwargs):
-        NominalType.__init__(self, name_or_obj, is_object)
+                 is_object=False, qualname=None, **kwargs):
+        NominalType.__init__(self, name_or_obj, is_object, qualname)
         ObjectType.__init__(self, attrs=attrs, **kwargs)
 
-    def __str__(self):
+    # NominalType renders its name directly; use the cached rendering.
+    __str__ = PydytyType.__str__
+
+    def _render(self):
         types = sorted(self.attrs)
         tlist = ['%s: %s' % (n, self.attrs[n]) for n in types]
         return '%s[%s]' % (self.name, ', '.join(tlist))
@@ -258,13 +728,17 @@ class FusionType(NominalType, ObjectType):
     def __eq__(self, other):
         result = isinstance(other, self.__class__)
         if result:
-            result = self.name == other.name
+            result = self.qualname == other.qualname
         if result:
             if len(self.attrs) != len(other.attrs):
                 result = False
         if result:
-            for n, t in self.attrs.iteritems():
+            for n, t in self.attrs.items():
                 if t != other.attrs.get(n, None):
                     result = False
                     break
         return result
+
+    def __hash__(self):
+        # The name does not change as attributes are added.
+        return self._hash
@@ -1,31 +1,92 @@
-import types
+import importlib
+import threading
+from . import hierarchy
+
+# pydyty.types imports this module while it is being initialized, which a
+# relative "from . import types" cannot handle on Python 2.
+types = importlib.import_module('pydyty.types')
 
 
 class Typing(object):
-    """ This class serves as staticmethod grouping related to subtyping. """
+    """ This class serves as staticmethod grouping related to subtyping.
+
+    Results for pairs of canonical (interned, immutable) types are cached.
+    The cache holds up to `cache_size` pairs in two generations: when the
+    young generation is full it becomes the old one, and the previous old
+    generation is dropped. Hits in the old generation are promoted. Set
+    `cache_size` to 0 to disable caching, including the results remembered
+    during a comparison of object types. Registering a virtual subclass
+    with an ABC changes nominal subtyping, so it empties the cache."""
+
+    cache_size = 4096
+    _young = {}
+    _old = {}
+    _abc_token = None   # ABC cache token the cache was filled under
+
+    # Object type comparisons of the current thread. A pair that is
+    # reached again while it is being compared is assumed to hold, so
+    # recursive object types terminate. While the outermost comparison
+    # runs, results are remembered by the ids of the pair, so types shared
+    # by several attributes are compared once.
+    _in_progress = threading.local()
+
+    @staticmethod
+    def clear_cache():
+        Typing._young = {}
+        Typing._old = {}
+
+    @staticmethod
+    def _true(l_t, r_t):
+        return True
+
+    @staticmethod
+    def _false(l_t, r_t):
+        return False
 
     @staticmethod
     def _is_top_subtype(l_t, r_t):
         return isinstance(r_t, l_t.__class__)
 
     @staticmethod
-    def _is_bottom_subtype(l_t, r_t):
-        return True
+    def _is_union_subtype(l_t, r_t):
+        """ Every member of the union must be a subtype."""
+        return all(Typing.is_subtype(t, r_t) for t in l_t.types)
 
     @staticmethod
-    def _is_nominal_subtype_of_nominal(l_t, r_t):
-        if l_t == r_t:
+    def _is_subtype_of_intersection(l_t, r_t):
+        """ l_t must be a subtype of every member of the intersection."""
+        return all(Typing.is_subtype(l_t, t) for t in r_t.types)
+
+    @staticmethod
+    def _is_intersection_subtype(l_t, r_t):
+        """ Some member of the intersection must be a subtype."""
+        return any(Typing.is_subtype(t, r_t) for t in l_t.types)
+
+    @staticmethod
+    def _is_subtype_of_union(l_t, r_t):
+        """ l_t must be a subtype of some member of the union."""
+        if l_t in r_t._members:
             return True
-        # TODO: check subtype relationship here.
-        return False
+        return any(Typing.is_subtype(l_t, t) for t in r_t.types)
 
     @staticmethod
-    def _is_nominal_subtype(l_t, r_t):
-        if isinstance(r_t, types.NominalType):
-            result = Typing._is_nominal_subtype_of_nominal(l_t, r_t)
-        else:
-            raise Exception('Not yet implemented')
-        return result
+    def _is_intersection_subtype_of_union(l_t, r_t):
+        return (Typing._is_intersection_subtype(l_t, r_t) or
+                Typing._is_subtype_of_union(l_t, r_t))
+
+    @staticmethod
+    def _is_nominal_subtype_of_nominal(l_t, r_t):
+        """ Uses the class hierarchy when the class of l_t is known. A type
+        created from a name only matches by name."""
+        if l_t.qualname == r_t.qualname:
+            return True
+        l_cls = l_t.klass
+        if l_cls is None:
+            return False
+        r_cls = r_t.klass
+        if r_cls is None:
+            return r_t.qualname in hierarchy.ancestors(l_cls)
+        return hierarchy.is_subclass(l_cls, r_cls)
 
     @staticmethod
     def _is_method_subtype_of_method(l_t, r_t):
@@ -51,55 +112,179 @@ class Typing(object):
         return result
 
     @staticmethod
-    def _is_method_subtype(l_t, r_t):
-        """ Assumes l_t IS a method type. """
-        if isinstance(r_t, types.MethodType):
-            # life is easier
-            result = Typing._is_method_subtype_of_method(l_t, r_t)
-        else:
-            result = False
-        return result
+    def _comparisons():
+        state = Typing._in_progress
+        if not hasattr(state, 'depths'):
+            state.depths = {}   # pair -> nesting depth of its comparison
+            state.memo = {}     # pair -> result
+            state.low = _NO_DEPTH
+        return state
 
     @staticmethod
     def _is_object_subtype_of_object(l_t, r_t):
-        result = True
-        if len(l_t.methods) < len(r_t.methods):
-            result = False
-        else:
-            for meth_name, meth_type in l_t.methods.iteritems():
-                if meth_name not in r_t.methods:
-                    result = False
-                    break
-                r_t_meth_type = r_t.methods[meth_name]
-                if not Typing._is_method_subtype(meth_type, r_t_meth_type):
-                    result = False
-                    break
+        """ Width and depth subtyping: l_t must have every attribute of r_t,
+        each with a subtype of the attribute type in r_t.
+
+        `low` is the smallest depth of the pairs assumed to hold so far by
+        the current comparison. A result that relies on a pair still being
+        compared further out may not hold once that pair is decided, so
+        only results that do not are remembered. False holds whatever was
+        assumed."""
+        state = Typing._comparisons()
+        depths = state.depths
+        key = (id(l_t), id(r_t))
+        result = state.memo.get(key)
+        if result is not None:
+            return result
+        depth = depths.get(key)
+        if depth is not None:
+            if depth < state.low:
+                state.low = depth
+            return True
+        depth = depths[key] = len(depths)
+        low = state.low
+        state.low = _NO_DEPTH
+        try:
+            result = True
+            if len(l_t.attrs) < len(r_t.attrs):
+                result = False
+            else:
+                for name, r_t_attr_type in r_t.attrs.items():
+                    l_t_attr_type = l_t.attrs.get(name)
+                    if (l_t_attr_type is None or
+                            not Typing.is_subtype(l_t_attr_type,
+                                                  r_t_attr_type)):
+                        result = False
+                        break
+        finally:
+            del depths[key]
+            assumed = state.low
+            state.low = min(low, assumed) if assumed < depth else low
+            if not depths:
+                state.memo.clear()
+        if depths and Typing.cache_size and (not result or assumed >= depth):
+            state.memo[key] = result
         return result
 
     @staticmethod
-    def _is_object_subtype_of_nominal(l_t, r_t):
-        pass
+    def _is_fusion_subtype_of_fusion(l_t, r_t):
+        return (Typing._is_nominal_subtype_of_nominal(l_t, r_t) and
+                Typing._is_object_subtype_of_object(l_t, r_t))
 
     @staticmethod
-    def _is_object_subtype(l_t, r_t):
+    def is_subtype(l_t, r_t):
+        if l_t is r_t:
+            return True
+        if (Typing.cache_size and getattr(l_t, '_canonical', False) and
+                getattr(r_t, '_canonical', False)):
+            token = hierarchy.abc_cache_token()
+            if token != Typing._abc_token:
+                Typing.clear_cache()
+                Typing._abc_token = token
+            key = (l_t, r_t)
+            result = Typing._young.get(key)
+            if result is None:
+                result = Typing._old.get(key)
+                if result is None:
+                    result = Typing._is_subtype(l_t, r_t)
+                Typing._remember(key, result)
+            return result
+        return Typing._is_subtype(l_t, r_t)
 
-        if isinstance(r_t, types.ObjectType):
-            result = Typing._is_object_subtype_of_object(l_t, r_t)
-        elif isinstance(r_t, types.NominalType):
-            raise Exception("Not yet implemented")
-        else:
-            result = False
-        return result
+    @staticmethod
+    def _remember(key, result):
+        young = Typing._young
+        if len(young) >= Typing.cache_size // 2:
+            Typing._old = young
+            Typing._young = young = {}
+        young[key] = result
 
     @staticmethod
-    def is_subtype(l_t, r_t):
-        if isinstance(l_t, types.TopType):
-            return Typing._is_top_subtype(l_t, r_t)
-        elif isinstance(l_t, types.BottomType):
-            return Typing._is_bottom_subtype(l_t, r_t)
-        elif isinstance(l_t, types.NominalType):
-            return Typing._is_nominal_subtype(l_t, r_t)
-        elif isinstance(l_t, types.MethodType):
-            return Typing._is_method_subtype(l_t, r_t)
-        elif isinstance(l_t, types.ObjectType):
-            return Typing._is_object_subtype(l_t, r_t)
+    def _lookup(l_cls, r_cls):
+        """ Finds the rule for a pair of classes that is not in the table,
+        such as subclasses of pydyty types, and adds it to the table."""
+        if not _RULES:
+            _RULES.update(_build_rules())
+            if (l_cls, r_cls) in _RULES:
+                return _RULES[l_cls, r_cls]
+        rule = Typing._false
+        for l_base in l_cls.__mro__:
+            for r_base in r_cls.__mro__:
+                if (l_base, r_base) in _RULES:
+                    rule = _RULES[l_base, r_base]
+                    break
+            else:
+                continue
+            break
+        _RULES[l_cls, r_cls] = rule
+        return rule
+
+    @staticmethod
+    def _is_subtype(l_t, r_t):
+        l_cls = type(l_t)
+        r_cls = type(r_t)
+        try:
+            rule = _RULES[l_cls, r_cls]
+        except KeyError:
+            rule = Typing._lookup(l_cls, r_cls)
+        return rule(l_t, r_t)
+
+
+def _build_rules():
+    """ Builds the table of subtyping rules for every pair of type kinds.
+    For a pair, the first of these applies:
+
+    1. the bottom type is a subtype of anything;
+    2. anything is a subtype of the top type;
+    3. a union is a subtype if all its members are;
+    4. a subtype of an intersection must be a subtype of all its members;
+    5. an intersection is a subtype if any of its members is (or, when
+       compared with a union, if it is a subtype of any union member);
+    6. a subtype of a union must be a subtype of any of its members;
+    7. the rule for the two kinds below, or False for unrelated kinds.
+    """
+    top = types.TopType
+    bottom = types.BottomType
+    nominal = types.NominalType
+    method = types.MethodType
+    obj = types.ObjectType
+    fusion = types.FusionType
+    union = types.UnionType
+    inter = types.IntersectionType
+    pairs = {
+        (top, top): Typing._is_top_subtype,
+        (nominal, nominal): Typing._is_nominal_subtype_of_nominal,
+        (method, method): Typing._is_method_subtype_of_method,
+        (obj, obj): Typing._is_object_subtype_of_object,
+        (fusion, nominal): Typing._is_nominal_subtype_of_nominal,
+        (fusion, obj): Typing._is_object_subtype_of_object,
+        (fusion, fusion): Typing._is_fusion_subtype_of_fusion,
+    }
+    kinds = (top, bottom, nominal, method, obj, fusion, union, inter)
+    rules = {}
+    for l_cls in kinds:
+        for r_cls in kinds:
+            if l_cls is bottom or r_cls is top:
+                rule = Typing._true
+            elif l_cls is union:
+                rule = Typing._is_union_subtype
+            elif r_cls is inter:
+                rule = Typing._is_subtype_of_intersection
+            elif l_cls is inter and r_cls is union:
+                rule = Typing._is_intersection_subtype_of_union
+            elif l_cls is inter:
+                rule = Typing._is_intersection_subtype
+            elif r_cls is union:
+                rule = Typing._is_subtype_of_union
+            else:
+                rule = pairs.get((l_cls, r_cls), Typing._false)
+            rules[l_cls, r_cls] = rule
+    return rules
+
+
+# Depth of no comparison, above every actual one.
+_NO_DEPTH = float('inf')
+
+# Subtyping rules keyed by (type(l_t), type(r_t)). Filled on first use,
+# since pydyty.types is not fully initialized when this module loads.
+_RULES = {}
@@ -0,0 +1,116 @@
+""" Test cases for coroutine methods. Kept apart from test_aio.py because
+async syntax does not parse on Python 2."""
+import asyncio
+import inspect
+from pydyty.monitor import Monitored
+from pydyty.sampling import EveryNthSampler
+
+
+class AioCases(object):
+
+    def setUp(self):
+        super(AioCases, self).setUp()
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        super(AioCases, self).tearDown()
+
+    def run_loop(self, coro):
+        result = self.loop.run_until_complete(coro)
+        # Let deferred recording run.
+        self.loop.run_until_complete(asyncio.sleep(0))
+        return result
+
+    def test_coroutine(self):
+
+        class A(Monitored):
+            async def foo(self, x):
+                """ Docstring of foo."""
+                await asyncio.sleep(0)
+                return x
+
+        self.assertTrue(inspect.iscoroutinefunction(A.foo))
+        self.assertTrue(asyncio.iscoroutinefunction(A.foo))
+        self.assertEqual('foo', A.foo.__name__)
+        self.assertEqual('Docstring of foo.', A.foo.__doc__.strip())
+        self.assertEqual(1, self.run_loop(A().foo(1)))
+        self.assertEqual('[foo: (int) -> int]', str(A.__pydyty_type__))
+        self.assertEqual('a', self.run_loop(A().foo(x='a')))
+        self.assertEqual('[foo: ((int) -> int) and ((x:str) -> str)]',
+                         str(A.__pydyty_type__))
+
+    def test_coroutine_structural_arg(self):
+
+        class B(object):
+            def bar(self):
+                return 1
+
+        class A(Monitored):
+            async def foo(self, b):
+                return b.bar()
+
+        self.assertEqual(1, self.run_loop(A().foo(B())))
+        self.assertEqual('[foo: ([bar: () -> int]) -> int]',
+                         str(A.__pydyty_type__))
+
+    def test_async_generator(self):
+
+        class A(Monitored):
+            async def foo(self, last):
+                for i in range(2):
+                    yield i
+                yield last
+
+        self.assertTrue(inspect.isasyncgenfunction(A.foo))
+
+        async def consume():
+            return [item async for item in A().foo('done')]
+
+        self.assertEqual([0, 1, 'done'], self.run_loop(consume()))
+        self.assertEqual(
+            '[foo: (str) -> [__anext__: () -> (int) or (str)]]',
+            str(A.__pydyty_type__))
+
+    def test_async_generator_forwarding(self):
+        events = []
+
+        class A(Monitored):
+            async def foo(self):
+                try:
+                    total = 0
+                    while True:
+                        try:
+                            value = yield total
+                        except KeyError:
+                            value = -1
+                        total += value or 0
+                finally:
+                    events.append('closed')
+
+        async def drive():
+            agen = A().foo()
+            results = [await agen.__anext__(), await agen.asend(2),
+                       await agen.asend(3), await agen.athrow(KeyError())]
+            await agen.aclose()
+            events.append('after close')
+            return results
+
+        self.assertEqual([0, 2, 5, 4], self.run_loop(drive()))
+        self.assertEqual(['closed', 'after close'], events)
+        self.assertEqual('[foo: () -> [__anext__: () -> int, '
+                         'asend: (int) -> int]]', str(A.__pydyty_type__))
+
+    def test_sampling(self):
+        sampler = EveryNthSampler(2)
+
+        class A(Monitored):
+            __pydyty_sampler__ = sampler
+
+            async def foo(self, x):
+                return x
+
+        for i in range(4):
+            self.run_loop(A().foo(i))
+        self.assertEqual(2, sampler.counters['A.foo'].sampled)
+        self.assertEqual('[foo: (int) -> int]', str(A.__pydyty_type__))
@@ -0,0 +1,15 @@
+""" Module attached to by test_instrument."""
+
+
+def double(x):
+    return x * 2
+
+
+class Counter(object):
+
+    def __init__(self):
+        self.count = 0
+
+    def add(self, n):
+        self.count += n
+        return self.count
@@ -0,0 +1,14 @@
+import sys
+import unittest
+from base_test import BaseTestCase
+
+if sys.version_info >= (3, 6):
+    from aio_cases import AioCases
+else:
+    class AioCases(object):
+        pass
+
+
+@unittest.skipIf(sys.version_info < (3, 6), 'requires Python 3.6+')
+class AioTestCase(AioCases, BaseTestCase):
+    pass
@@ -0,0 +1,185 @@
+import gc
+from base_test import BaseTestCase
+from pydyty import budget
+from pydyty import hierarchy
+from pydyty import recorder
+from pydyty import registry
+from pydyty import types
+from pydyty.loc import Location
+from pydyty.monitor import Monitored
+
+
+def _method(value, sites=()):
+    loc = None
+    if sites:
+        loc = Location()
+        for site in sites:
+            loc.add_trace_slice(site)
+    t = types.NominalType.of(value)
+    return types.MethodType([t], {}, t, loc=loc)
+
+
+def _site(i):
+    return ('file.py', i, 'f', 'x = %d' % i)
+
+
+class BudgetTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(BudgetTestCase, self).setUp()
+        self.monitored = registry.monitored
+        registry.monitored = registry.Registry()
+        self.max_sites = Location.max_sites
+        self.recheck_every = budget.recheck_every
+        self.flush_every = recorder.flush_every
+
+    def tearDown(self):
+        recorder.set_flush_every(self.flush_every)
+        budget.set_limit(None)
+        budget.reset()
+        budget.recheck_every = self.recheck_every
+        Location.max_sites = self.max_sites
+        registry.monitored = self.monitored
+        super(BudgetTestCase, self).tearDown()
+
+    def test_sizeof(self):
+        plain = _method(1)
+        self.assertTrue(budget.sizeof(plain) > 0)
+        self.assertTrue(budget.sizeof(_method(1, [_site(1)])) >
+                        budget.sizeof(plain))
+        inter = types.IntersectionType([_method(1), _method('a')])
+        self.assertTrue(budget.sizeof(inter) > budget.sizeof(plain))
+
+    def test_stats(self):
+        class A(Monitored):
+            def foo(self, x):
+                return x
+
+            def bar(self):
+                pass
+
+        budget.set_limit(1 << 30)
+        a = A()
+        a.foo(1)
+        a.foo('a')
+        a.bar()
+        stats = budget.stats()
+        self.assertEqual(1 << 30, stats.limit)
+        self.assertEqual('normal', stats.level)
+        self.assertEqual(2, stats.entries)
+        sizes = stats.classes[hierarchy.qualname(A)]
+        self.assertEqual(['bar', 'foo'], sorted(sizes))
+        self.assertTrue(sizes['foo'] > sizes['bar'])
+        self.assertEqual(sum(sizes.values()), stats.bytes)
+        self.assertEqual({'sites': 0, 'intersections': 0, 'methods': 0},
+                         stats.evictions)
+
+    def test_existing_types(self):
+        class A(Monitored):
+            def foo(self, x):
+                return x
+
+        A().foo(1)
+        budget.set_limit(1 << 30)
+        self.assertEqual(1, budget.stats().entries)
+
+    def test_coarsen(self):
+        obj_type = types.ObjectType()
+        budget.set_limit(1 << 30)
+        recorder.record(obj_type, 'foo',
+                        _method(1, [_site(i) for i in range(50)]))
+        recorder.record(obj_type, 'foo', _method(1, [_site(0)]))
+        full = budget.stats().bytes
+        budget.set_limit(full - 1)
+        stats = budget.stats()
+        self.assertEqual('coarse', stats.level)
+        self.assertEqual(49, stats.evictions['sites'])
+        self.assertTrue(stats.bytes < full)
+        loc = obj_type.attrs['foo'].loc
+        self.assertEqual(1, len(loc))
+        self.assertEqual(51, loc.hits)
+        self.assertEqual(1, Location.max_sites)
+        budget.set_limit(None)
+        self.assertEqual(self.max_sites, Location.max_sites)
+
+    def test_widen(self):
+        obj_type = types.ObjectType()
+        budget.set_limit(1 << 30)
+        for value in (1, 'a', 1.0, None, True, (), [], {}):
+            recorder.record(obj_type, 'foo', _method(value, [_site(1)]))
+        full = budget.stats().bytes
+        budget.set_limit(full - 1)
+        stats = budget.stats()
+        self.assertEqual('wide', stats.level)
+        self.assertEqual(1, stats.evictions['intersections'])
+        foo = obj_type.attrs['foo']
+        self.assertEqual('(<<Top>>)', str(foo))
+        self.assertFalse(recorder.record(obj_type, 'foo', _method(1.0j)))
+        self.assertEqual('(<<Top>>)', str(foo))
+
+    def test_closed(self):
+        obj_type = types.ObjectType()
+        budget.set_limit(1)
+        recorder.record(obj_type, 'foo', _method(1))
+        self.assertEqual(budget.CLOSED, budget.level())
+        self.assertFalse(recorder.record(obj_type, 'bar', _method(1)))
+        self.assertNotIn('bar', obj_type.attrs)
+        self.assertTrue(recorder.record(obj_type, 'foo', _method('a')))
+        self.assertEqual(1, budget.stats().evictions['methods'])
+
+    def test_buffered(self):
+        obj_type = types.ObjectType()
+        budget.set_limit(1)
+        recorder.record(obj_type, 'foo', _method(1))
+        recorder.set_flush_every(8)
+        recorder.record(obj_type, 'bar', _method(1))
+        recorder.flush()
+        self.assertNotIn('bar', obj_type.attrs)
+
+    def test_recheck(self):
+        obj_type = types.ObjectType()
+        budget.recheck_every = 10
+        budget.set_limit(1 << 30)
+        recorder.record(obj_type, 'foo', _method(1, [_site(0)]))
+        before = budget.stats().bytes
+        for i in range(1, 10):
+            recorder.record(obj_type, 'foo', _method(1, [_site(i)]))
+        self.assertEqual(before, budget.stats().bytes)
+        recorder.record(obj_type, 'foo', _method(1, [_site(10)]))
+        self.assertTrue(budget.stats().bytes > before)
+
+    def test_recheck_touched(self):
+        observed = types.ObjectType()
+        idle = types.ObjectType()
+        budget.recheck_every = 2
+        budget.set_limit(1 << 30)
+        recorder.record(observed, 'foo', _method(1, [_site(0)]))
+        recorder.record(idle, 'foo', _method(1, [_site(0)]))
+        sizes = budget.stats().classes
+        idle_key = '<type 0x%x>' % id(idle)
+        for i in range(1, 20):
+            idle.attrs['foo'].loc.add_trace_slice(_site(i))
+        recorder.record(observed, 'foo', _method(1, [_site(1)]))
+        recorder.record(observed, 'foo', _method(1, [_site(2)]))
+        classes = budget.stats().classes
+        self.assertEqual(sizes[idle_key], classes[idle_key])
+        observed_key = '<type 0x%x>' % id(observed)
+        self.assertTrue(classes[observed_key]['foo'] >
+                        sizes[observed_key]['foo'])
+        budget.enforce()
+        self.assertTrue(budget.stats().classes[idle_key]['foo'] >
+                        sizes[idle_key]['foo'])
+
+    def test_forget(self):
+        obj_type = types.ObjectType()
+        budget.set_limit(1 << 30)
+        recorder.record(obj_type, 'foo', _method(1))
+        self.assertTrue(budget.stats().bytes > 0)
+        del obj_type
+        gc.collect()
+        stats = budget.stats()
+        self.assertEqual(0, stats.bytes)
+        self.assertEqual(0, stats.entries)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, budget.set_limit, 0)
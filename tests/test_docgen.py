@@ -0,0 +1,185 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+from base_test import BaseTestCase
+from pydyty import docgen
+from pydyty import store
+from pydyty import types
+from pydyty.monitor import Monitored
+
+
+class Point(object):
+
+    def __init__(self):
+        self.x = 1
+
+    def norm(self, scale):
+        return self.x * scale
+
+
+class Calc(Monitored):
+
+    def add(self, a, **opts):
+        return a
+
+    def norm(self, p):
+        return p.norm(2) + p.x
+
+    def nothing(self):
+        pass
+
+
+def _profile():
+    calc = Calc()
+    calc.add(1)
+    calc.add('a', b=1)
+    calc.norm(Point())
+    calc.nothing()
+    return store.Profile.collect([Calc])
+
+
+class DocgenTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(DocgenTestCase, self).setUp()
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        super(DocgenTestCase, self).tearDown()
+
+    def _read(self, *parts):
+        with open(os.path.join(self.dir, *parts)) as f:
+            return f.read()
+
+    def test_stub(self):
+        stub = docgen.render_stub(
+            'test_docgen', [('Calc', _profile().classes['test_docgen.Calc'])])
+        self.assertIn('from typing import Any, Protocol, overload', stub)
+        self.assertIn('class _Calc_norm_arg0(Protocol):\n'
+                      '    def norm(self, __arg0: int) -> int: ...\n'
+                      '    x: int\n', stub)
+        self.assertIn('class Calc:\n'
+                      '    @overload\n'
+                      '    def add(self, __arg0: int) -> int: ...\n'
+                      '    @overload\n'
+                      '    def add(self, __arg0: str, *, b: int) -> str: ...\n'
+                      '    def norm(self, __arg0: _Calc_norm_arg0) -> int: '
+                      '...\n'
+                      '    def nothing(self) -> None: ...\n', stub)
+        if sys.version_info >= (3, 0):
+            compile(stub, 'test_docgen.pyi', 'exec')
+
+    def test_split_name(self):
+        self.assertEqual(('test_docgen', 'Calc'),
+                         docgen.split_name('test_docgen.Calc'))
+        self.assertEqual(('test_docgen', 'Calc.Inner'),
+                         docgen.split_name('test_docgen.Calc.Inner'))
+        self.assertEqual(('pkg.mod', 'f.<locals>.A'),
+                         docgen.split_name('pkg.mod.f.<locals>.A'))
+        self.assertEqual(('pkg.mod', 'A'), docgen.split_name('pkg.mod.A'))
+        self.assertEqual(('__main__', 'A'), docgen.split_name('A'))
+
+    def test_nested_stub(self):
+        int_t = types.NominalType.of(1)
+        m = types.ObjectType({'m': types.MethodType([], {}, int_t)})
+        stub = docgen.render_stub('mod', [('Outer.Inner', m),
+                                          ('f.<locals>.Local', m)])
+        self.assertIn('class Outer:\n\n'
+                      '    class Inner:\n'
+                      '        def m(self) -> int: ...\n', stub)
+        self.assertNotIn('Local', stub)
+
+    def test_annotations(self):
+        writer = docgen._StubWriter('mod')
+        int_t = types.NominalType.of(1)
+        self.assertEqual('Union[int, str]', writer.annotation(
+            types.UnionType([int_t, types.NominalType.of('')]), 'h'))
+        self.assertEqual('Any', writer.annotation(types.TopType(), 'h'))
+        self.assertEqual('NoReturn',
+                         writer.annotation(types.BottomType(), 'h'))
+        self.assertEqual('Callable[[int], int]', writer.annotation(
+            types.MethodType([int_t], {}, int_t), 'h'))
+        self.assertEqual('B', writer.annotation(
+            types.NominalType('B', qualname='mod.B'), 'h'))
+        self.assertEqual('other.C', writer.annotation(
+            types.NominalType('C', qualname='other.C'), 'h'))
+        self.assertEqual('Any', writer.annotation(
+            types.NominalType('D', qualname='mod.f.<locals>.D'), 'h'))
+        self.assertEqual('object', writer.annotation(types.ObjectType(), 'h'))
+        self.assertEqual(['Any', 'Callable', 'NoReturn', 'Union'],
+                         sorted(writer.typing))
+        self.assertEqual(set(['other']), writer.imports)
+
+    def test_shared_protocol(self):
+        writer = docgen._StubWriter('mod')
+        int_t = types.NominalType.of(1)
+        a = writer.annotation(types.ObjectType({'x': int_t}), 'a')
+        b = writer.annotation(types.ObjectType({'x': int_t}), 'b')
+        self.assertEqual('_a', a)
+        self.assertEqual(a, b)
+        self.assertEqual(1, len(writer.protocols))
+
+    def test_schema(self):
+        data = json.loads(docgen.render_schema(
+            'test_docgen', [('Calc', _profile().classes['test_docgen.Calc'])]))
+        calc = data['definitions']['Calc']
+        self.assertEqual('object', calc['type'])
+        self.assertEqual(2, len(calc['properties']['add']['allOf']))
+        norm = calc['properties']['norm']['x-method']
+        self.assertEqual({'type': 'integer'},
+                         norm['args'][0]['properties']['x'])
+        self.assertEqual({'type': 'null'},
+                         calc['properties']['nothing']['x-method']['returns'])
+        self.assertEqual({'anyOf': [{'type': 'integer'},
+                                    {'x-python-class': 'mod.A'}]},
+                         docgen.schema(types.UnionType([
+                             types.NominalType.of(1),
+                             types.NominalType('A', qualname='mod.A')])))
+
+    def test_generate(self):
+        paths = docgen.generate(_profile(), self.dir)
+        self.assertEqual(sorted([os.path.join(self.dir, 'test_docgen.pyi'),
+                                 os.path.join(self.dir, 'test_docgen.json'),
+                                 os.path.join(self.dir, 'test_docgen.md')]),
+                         sorted(paths))
+        self.assertIn('class Calc:', self._read('test_docgen.pyi'))
+        self.assertIn('## `Calc`', self._read('test_docgen.md'))
+        self.assertIn('### `norm`', self._read('test_docgen.md'))
+
+    def test_generate_monitored(self):
+        _profile()
+        paths = docgen.generate(None, self.dir, formats=['pyi'])
+        self.assertIn(os.path.join(self.dir, 'test_docgen.pyi'), paths)
+        stub = self._read('test_docgen.pyi')
+        self.assertIn('class Calc:', stub)
+        self.assertIn('def nothing(self) -> None: ...', stub)
+
+    def _package_profile(self, n):
+        profile = store.Profile()
+        for i in range(n):
+            profile.merge_class('pkg.mod%d.A' % i, types.ObjectType({
+                'm': types.MethodType([types.NominalType.of(i)], {},
+                                      types.NominalType.of(''))}))
+        return profile
+
+    def test_generate_jobs(self):
+        paths = docgen.generate(self._package_profile(4), self.dir,
+                                formats=['pyi'], jobs=2)
+        self.assertEqual(4, len(paths))
+        self.assertIn('def m(self, __arg0: int) -> str: ...',
+                      self._read('pkg', 'mod3.pyi'))
+
+    def test_unknown_format(self):
+        self.assertRaises(ValueError, docgen.generate, store.Profile(),
+                          self.dir, ['html'])
+
+    def test_main(self):
+        path = os.path.join(self.dir, 'profile.json')
+        self._package_profile(2).dump(path)
+        out = os.path.join(self.dir, 'out')
+        docgen.main(['-o', out, '-f', 'md,json', path])
+        self.assertEqual(['pkg.mod0.json', 'pkg.mod0.md', 'pkg.mod1.json',
+                          'pkg.mod1.md'], sorted(os.listdir(out)))
@@ -0,0 +1,198 @@
+import os
+import shutil
+import tempfile
+import unittest
+from base_test import BaseTestCase
+from pydyty import export
+from pydyty import hierarchy
+from pydyty import registry
+from pydyty import ring
+from pydyty import types
+from pydyty.loc import Location
+from pydyty.monitor import Monitored
+
+
+def _make_class(deferred=False):
+    class A(Monitored):
+        __pydyty_deferred__ = deferred
+
+        def foo(self, x):
+            return x
+
+    return A
+
+
+class ExportTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(ExportTestCase, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'types-{pid}.log')
+        self.classes = []
+        self.exporter = export.Exporter(self.path, lambda: self.classes)
+
+    def tearDown(self):
+        self.exporter.stop()
+        ring.capture_sites = False
+        shutil.rmtree(self.dir)
+        super(ExportTestCase, self).tearDown()
+
+    def _records(self):
+        self.exporter.close()
+        return list(export.read(self.exporter.segments()))
+
+    def test_export(self):
+        A = _make_class()
+        self.classes.append(A)
+        A().foo(1)
+        self.assertEqual(1, self.exporter.export())
+        self.assertEqual(0, self.exporter.export())
+        A().foo('a')
+        self.assertEqual(1, self.exporter.export())
+        records = self._records()
+        self.assertEqual(['(int) -> int', '(str) -> str'],
+                         [str(r.type) for r in records])
+        record = records[0]
+        self.assertEqual(hierarchy.qualname(A), record.cls)
+        self.assertEqual('foo', record.name)
+        self.assertIsNone(record.count)
+        self.assertEqual([], record.sites)
+        self.assertEqual(os.getpid(), record.pid)
+
+    def test_counts(self):
+        ring.capture_sites = True
+        A = _make_class(deferred=True)
+        self.classes.append(A)
+        a = A()
+        for _ in range(3):
+            a.foo(1)
+        self.exporter.export()
+        a.foo(1)
+        self.exporter.export()
+        records = self._records()
+        self.assertEqual([3, 1], [r.count for r in records])
+        site = records[0].sites[0]
+        self.assertEqual('test_counts', site[2])
+        self.assertEqual(3, site[4])
+        self.assertEqual(1, records[1].sites[0][4])
+
+    def test_count_after_location(self):
+        class A(object):
+            pass
+
+        int_t = types.NominalType.of(1)
+        A.__pydyty_type__ = types.ObjectType(
+            {'foo': types.MethodType.of([int_t], {}, int_t)})
+        registry.monitored.register(A, A.__pydyty_type__)
+        self.addCleanup(registry.monitored.unregister, A)
+        self.classes.append(A)
+        self.exporter.export()
+        loc = Location.create(('f.py', 1, 'f', 'x = 1'))
+        A.__pydyty_type__.add_attr(
+            'foo', types.MethodType([int_t], {}, int_t, loc=loc))
+        self.exporter.export()
+        self.assertEqual([None, 1], [r.count for r in self._records()])
+
+    def test_unmonitored(self):
+        class B(object):
+            pass
+
+        A = _make_class()
+        A().foo(1)
+        self.classes.extend([B, A])
+        self.assertEqual(1, self.exporter.export())
+        registry.monitored.unregister(A)
+        A().foo('a')
+        self.assertEqual(0, self.exporter.export())
+        self.assertEqual(['(int) -> int'],
+                         [str(r.type) for r in self._records()])
+
+    def test_rotation(self):
+        self.exporter.max_bytes = 200
+        self.exporter.backup_count = 2
+        A = _make_class()
+        self.classes.append(A)
+        a = A()
+        for value in (1, 'a', 1.0, None, True, (), [], {}):
+            a.foo(value)
+            self.exporter.export()
+        segments = self.exporter.segments()
+        self.assertEqual(3, len(segments))
+        for path in segments:
+            self.assertTrue(os.path.getsize(path) <= 200)
+        self.assertTrue(segments[0].endswith('.log.5'))
+        self.assertEqual(3, len(self._records()))
+
+    def test_restart(self):
+        A = _make_class()
+        self.classes.append(A)
+        A().foo(1)
+        self.exporter.export()
+        self.exporter.close()
+        self.exporter.export()
+        self.assertEqual(1, len(self.exporter.segments()))
+        A().foo('a')
+        self.exporter.export()
+        self.assertEqual(2, len(self.exporter.segments()))
+
+    def test_truncated(self):
+        A = _make_class()
+        self.classes.append(A)
+        A().foo(1)
+        self.exporter.export()
+        self.exporter.close()
+        path = self.exporter.segments()[0]
+        with open(path, 'ab') as f:
+            f.write(b'{"class":"A","na')
+        self.assertEqual(1, len(list(export.read([path]))))
+
+    def test_to_profile(self):
+        ring.capture_sites = True
+        A = _make_class(deferred=True)
+        self.classes.append(A)
+        a = A()
+        a.foo(1)
+        a.foo('a')
+        self.exporter.export()
+        a.foo(1)
+        self.exporter.export()
+        self.exporter.close()
+        profile = export.to_profile(self.exporter.segments())
+        foo = profile.classes[hierarchy.qualname(A)].attrs['foo']
+        self.assertEqual('((int) -> int) and ((str) -> str)', str(foo))
+        self.assertEqual(2, foo.types[0].loc.hits)
+
+    def test_thread(self):
+        self.exporter.interval = 0.01
+        A = _make_class()
+        self.classes.append(A)
+        self.exporter.start()
+        A().foo(1)
+        self.exporter.stop()
+        self.assertEqual(1, len(self._records()))
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+    def test_fork(self):
+        A = _make_class()
+        self.classes.append(A)
+        A().foo(1)
+        self.exporter.export()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                A().foo('a')
+                self.exporter.export()
+                self.exporter.close()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        child = export.segments(self.path.format(pid=pid))
+        records = list(export.read(child))
+        self.assertEqual(['(str) -> str'], [str(r.type) for r in records])
+        self.assertEqual(pid, records[0].pid)
+        A().foo(1.0)
+        self.assertEqual(1, self.exporter.export())
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, export.Exporter, self.path, list,
+                          max_bytes=0)
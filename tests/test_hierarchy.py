@@ -0,0 +1,43 @@
+import abc
+from base_test import BaseTestCase
+from pydyty import hierarchy
+
+
+class Base(object):
+    pass
+
+
+class Sub(Base):
+    pass
+
+
+class HierarchyTestCase(BaseTestCase):
+
+    def test_qualname(self):
+        self.assertEqual('int', hierarchy.qualname(int))
+        self.assertEqual('object', hierarchy.qualname(object))
+        self.assertEqual('test_hierarchy.Sub', hierarchy.qualname(Sub))
+
+    def test_ancestors(self):
+        names = hierarchy.ancestors(Sub)
+        self.assertEqual(set(['test_hierarchy.Sub', 'test_hierarchy.Base',
+                              'object']), set(names))
+        self.assertIs(names, hierarchy.ancestors(Sub))
+
+    def test_is_subclass(self):
+        self.assertTrue(hierarchy.is_subclass(Sub, Base))
+        self.assertTrue(hierarchy.is_subclass(bool, int))
+        self.assertFalse(hierarchy.is_subclass(Base, Sub))
+
+    def test_is_subclass_abc(self):
+        Abstract = abc.ABCMeta('Abstract', (object,), {})
+        Abstract.register(Base)
+        self.assertTrue(hierarchy.is_subclass(Sub, Abstract))
+        self.assertTrue(hierarchy._abc_results[Sub][Abstract])
+        self.assertFalse(hierarchy.is_subclass(int, Abstract))
+
+    def test_is_subclass_abc_register(self):
+        Abstract = abc.ABCMeta('Abstract', (object,), {})
+        self.assertFalse(hierarchy.is_subclass(Sub, Abstract))
+        Abstract.register(Base)
+        self.assertTrue(hierarchy.is_subclass(Sub, Abstract))
@@ -0,0 +1,122 @@
+import instrument_cases
+from base_test import BaseTestCase
+from pydyty import instrument
+from pydyty import monitor
+from pydyty.monitor import Monitored
+
+
+class Shape(object):
+
+    def area(self, scale):
+        return 2 * scale
+
+    @staticmethod
+    def unit():
+        return 1
+
+
+class InstrumentTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(InstrumentTestCase, self).setUp()
+        for target in (Shape, instrument_cases, instrument_cases.Counter):
+            if '__pydyty_type__' in vars(target):
+                delattr(target, '__pydyty_type__')
+
+    def tearDown(self):
+        instrument.detach_all()
+        monitor.enable()
+        super(InstrumentTestCase, self).tearDown()
+
+    def test_attach_class(self):
+        area = Shape.__dict__['area']
+        self.assertIs(Shape, instrument.attach(Shape))
+        self.assertIsNot(area, Shape.__dict__['area'])
+        self.assertEqual(4, Shape().area(2))
+        self.assertEqual(1, Shape.unit())
+        self.assertEqual('[area: (int) -> int]', str(Shape.__pydyty_type__))
+        self.assertEqual([Shape], instrument.attached())
+
+        instrument.detach(Shape)
+        self.assertIs(area, Shape.__dict__['area'])
+        self.assertEqual(6, Shape().area(3))
+        self.assertEqual('[area: (int) -> int]', str(Shape.__pydyty_type__))
+        self.assertEqual([], instrument.attached())
+
+    def test_attach_twice(self):
+        instrument.attach(Shape)
+        proxy = Shape.__dict__['area']
+        instrument.attach(Shape)
+        self.assertIs(proxy, Shape.__dict__['area'])
+
+    def test_attach_monitored(self):
+
+        class A(Monitored):
+            def foo(self, x):
+                return x
+
+        proxy = A.__dict__['foo']
+        instrument.attach(A)
+        self.assertIs(proxy, A.__dict__['foo'])
+        self.assertEqual([], instrument.attached())
+
+    def test_attach_module(self):
+        double = instrument_cases.double
+        add = instrument_cases.Counter.__dict__['add']
+        instrument.attach(instrument_cases)
+        self.assertEqual(4, instrument_cases.double(2))
+        self.assertEqual(3, instrument_cases.Counter().add(3))
+        self.assertEqual('[double: (int) -> int]',
+                         str(instrument_cases.__pydyty_type__))
+        self.assertIn('add: (int) -> int',
+                      str(instrument_cases.Counter.__pydyty_type__))
+
+        instrument.detach(instrument_cases)
+        self.assertIs(double, instrument_cases.double)
+        self.assertIs(add, instrument_cases.Counter.__dict__['add'])
+        self.assertEqual([], instrument.attached())
+
+    def test_attach_function(self):
+        proxy = instrument.attach(instrument_cases.double)
+        self.assertEqual('ab' * 2, proxy('ab'))
+        self.assertEqual('[double: (str) -> str]', str(proxy.__pydyty_type__))
+        self.assertIs(instrument_cases.double, instrument.detach(proxy))
+
+    def test_attach_freeze(self):
+        instrument.attach(Shape, freeze_after=2)
+        proxy = Shape.__dict__['area']
+        for _ in range(3):
+            Shape().area(1)
+        self.assertIsNot(proxy, Shape.__dict__['area'])
+        instrument.detach(Shape)
+        self.assertFalse(hasattr(Shape.__dict__['area'], '__wrapped__'))
+
+    def test_detach_not_attached(self):
+        with self.assertRaises(ValueError):
+            instrument.detach(Shape)
+        with self.assertRaises(TypeError):
+            instrument.attach(1)
+
+    def test_kill_switch(self):
+        instrument.attach(Shape)
+        monitor.disable()
+        self.assertFalse(monitor.is_enabled())
+        self.assertEqual(4, Shape().area(2))
+        self.assertEqual('[]', str(Shape.__pydyty_type__))
+        monitor.enable()
+        Shape().area(2)
+        self.assertEqual('[area: (int) -> int]', str(Shape.__pydyty_type__))
+
+    def test_kill_switch_monitored(self):
+
+        class A(Monitored):
+            def foo(self, x):
+                return x
+
+            def bar(self, *args):
+                return len(args)
+
+        monitor.disable()
+        A().foo(1)
+        A().bar(1)
+        self.assertEqual('[]', str(A.__pydyty_type__))
@@ -2,6 +2,7 @@ import inspect
 import traceback
 from base_test import BaseTestCase
 from pydyty.loc import _SingleLocation, Location
+from pydyty.loc import CAPTURE_FRAME, CAPTURE_TRACEBACK, set_capture_mode
 
 def lineno():
     """Returns the current line number in our program."""
@@ -32,3 +33,105 @@ class LocationTestCase(BaseTestCase):
         self.assertEqual(987, loc.last.line)
         self.assertEqual('foo', loc.last.func)
         self.assertEqual('y = 1', loc.last.code)
+
+    def test_capture_frame(self):
+        prev = set_capture_mode(CAPTURE_FRAME)
+        try:
+            loc = Location.capture()
+        finally:
+            set_capture_mode(prev)
+        self.assertIsNotNone(loc.first._co)
+        self.assertEqual(__file__.rstrip('c'), loc.first.file.rstrip('c'))
+        self.assertEqual(lineno() - 5, loc.first.line)
+        self.assertEqual('test_capture_frame', loc.first.func)
+        self.assertEqual('loc = Location.capture()', loc.first.code)
+        self.assertIsNone(loc.first._co)
+
+    def test_capture_traceback(self):
+        prev = set_capture_mode(CAPTURE_TRACEBACK)
+        try:
+            loc = Location.capture()
+        finally:
+            set_capture_mode(prev)
+        self.assertEqual(lineno() - 3, loc.first.line)
+        self.assertEqual('test_capture_traceback', loc.first.func)
+        self.assertEqual('loc = Location.capture()', loc.first.code)
+
+    def test_capture_depth(self):
+        def callee():
+            return Location.capture(1)
+        loc = callee()
+        self.assertEqual(lineno() - 1, loc.first.line)
+        self.assertEqual('test_capture_depth', loc.first.func)
+
+    def test_capture_mode(self):
+        with self.assertRaises(ValueError):
+            set_capture_mode('foo')
+
+    def test_site_counts(self):
+        loc = Location()
+        for i in range(3):
+            loc.add_trace_slice(('foo', 1, 'bar', 'x = 1'))
+        loc.add_trace_slice(('foo', 2, 'bar', 'y = 1'))
+        self.assertEqual(2, len(loc))
+        self.assertEqual(3, loc.count(loc.first))
+        self.assertEqual(1, loc.count(loc.last))
+        self.assertEqual(4, loc.hits)
+        loc.add_trace_slice(('foo', 1, 'bar', 'x = 1'))
+        self.assertEqual(1, loc.last.line)
+        self.assertEqual([(1, 4), (2, 1)],
+                         [(l.line, n) for l, n in loc.most_common()])
+
+    def test_captured_site_counts(self):
+        loc = Location()
+        for i in range(5):
+            loc.add_loc(Location.capture())
+        self.assertEqual(1, len(loc))
+        self.assertEqual(5, loc.count(loc.first))
+
+    def test_max_sites(self):
+        loc = Location()
+        loc.max_sites = 2
+        loc.add_trace_slice(('foo', 1, 'bar', 'x = 1'))
+        loc.add_trace_slice(('foo', 1, 'bar', 'x = 1'))
+        loc.add_trace_slice(('foo', 2, 'bar', 'y = 1'))
+        loc.add_trace_slice(('foo', 3, 'bar', 'z = 1'))
+        self.assertEqual([1, 3], [l.line for l in loc.locs])
+        self.assertEqual(1, loc.other)
+        self.assertEqual(4, loc.hits)
+        other = Location()
+        other.add_trace_slice(('foo', 4, 'bar', 'w = 1'))
+        other.other = 5
+        loc.add_loc(other)
+        self.assertEqual([1, 4], [l.line for l in loc.locs])
+        self.assertEqual(7, loc.other)
+        self.assertEqual(10, loc.hits)
+        self.assertEqual('foo:1 in bar (x2), foo:4 in bar, 7 more',
+                         str(loc))
+
+    def test_max_sites_admission(self):
+        loc = Location()
+        loc.max_sites = 3
+        loc.add_trace_slice(('foo', 1, 'bar', 'x = 1'), 5)
+        loc.add_trace_slice(('foo', 2, 'bar', 'y = 1'), 3)
+        loc.add_trace_slice(('foo', 3, 'bar', 'z = 1'), 3)
+        loc.add_trace_slice(('foo', 4, 'bar', 'w = 1'))
+        loc.add_trace_slice(('foo', 5, 'bar', 'v = 1'))
+        self.assertEqual([1, 4, 5], [l.line for l in loc.locs])
+        self.assertEqual(6, loc.other)
+        loc.add_trace_slice(('foo', 6, 'bar', 'u = 1'))
+        self.assertEqual([1, 5, 6], [l.line for l in loc.locs])
+        self.assertEqual(7, loc.other)
+        self.assertEqual(14, loc.hits)
+
+    def test_coarsen(self):
+        loc = Location()
+        loc.add_trace_slice(('foo', 1, 'bar', 'x = 1'), 3)
+        loc.add_trace_slice(('foo', 2, 'bar', 'y = 1'))
+        loc.add_trace_slice(('foo', 3, 'bar', 'z = 1'), 2)
+        self.assertEqual(2, loc.coarsen(1))
+        self.assertEqual([1], [l.line for l in loc.locs])
+        self.assertEqual(3, loc.other)
+        self.assertEqual(6, loc.hits)
+        self.assertEqual(None, loc.last)
+        self.assertEqual(0, loc.coarsen(1))
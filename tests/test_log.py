@@ -0,0 +1,59 @@
+import logging
+from base_test import BaseTestCase
+from pydyty import log
+from pydyty.monitor import Monitored
+
+
+class _ListHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class LogTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(LogTestCase, self).setUp()
+        self.handler = _ListHandler()
+        log.logger.addHandler(self.handler)
+        self.level = log.logger.level
+
+    def tearDown(self):
+        log.logger.removeHandler(self.handler)
+        log.logger.setLevel(self.level)
+        super(LogTestCase, self).tearDown()
+
+    def test_no_trace_by_default(self):
+        class A(Monitored):
+            def foo(self, x):
+                return x
+
+        A().foo(1)
+        self.assertNotIn('A.foo is being invoked...', self.handler.messages)
+
+    def test_trace(self):
+        log.logger.setLevel(log.TRACE)
+
+        class A(Monitored):
+            def foo(self, x):
+                return x
+
+        A().foo(1)
+        A().foo(2)
+        self.assertIn('foo method is being monitored...',
+                      self.handler.messages)
+        self.assertEqual(2, self.handler.messages.count(
+            'A.foo is being invoked...'))
+
+    def test_trace_decided_at_class_creation(self):
+        class A(Monitored):
+            def foo(self, x):
+                return x
+
+        log.logger.setLevel(log.TRACE)
+        A().foo(1)
+        self.assertNotIn('A.foo is being invoked...', self.handler.messages)
@@ -1,5 +1,7 @@
 from base_test import BaseTestCase
-from pydyty.monitor import Monitored
+from pydyty import types
+from pydyty.monitor import Monitor, Monitored
+from pydyty.object_wrapper import ObjectWrapper
 
 
 class MonitorTestCase(BaseTestCase):
@@ -10,7 +12,6 @@ class MonitorTestCase(BaseTestCase):
             def foo(self, x):
                 return x
 
-            # This doesn't work yet.
             def bar(self, x, y):
                 return x + y
 
@@ -21,3 +22,241 @@ class MonitorTestCase(BaseTestCase):
         self.assertEqual(2, a.bar(1, 1))
         self.assertEqual("[bar: (int, int) -> int, foo: (int) -> int]",
                          str(A.__pydyty_type__))
+
+    def test_operators(self):
+
+        class Money(object):
+            def __init__(self, amount):
+                self.amount = amount
+
+            def __add__(self, other):
+                return Money(self.amount + other.amount)
+
+            def __lt__(self, other):
+                return self.amount < other.amount
+
+        class A(Monitored):
+            def total(self, x, y):
+                return (x + y).amount if x < y else 0
+
+        a = A()
+        self.assertEqual(3, a.total(Money(1), Money(2)))
+        self.assertEqual('[total: ([__add__: ([]) -> Money, '
+                         '__lt__: ([]) -> bool], []) -> int]',
+                         str(A.__pydyty_type__))
+
+    def test_kwargs(self):
+
+        class A(Monitored):
+            def foo(self, x, y=None):
+                return x
+
+            def bar(self, x):
+                return x
+
+            def baz(self, x, **kwargs):
+                return x
+
+        a = A()
+        self.assertEqual(1, a.foo(x=1))
+        self.assertEqual(1, a.bar(x=1))
+        self.assertEqual(1, a.baz(x=1, y=None))
+        self.assertEqual('[bar: (int) -> int, baz: (int, y:NoneType) -> int, '
+                         'foo: (int) -> int]', str(A.__pydyty_type__))
+        self.assertIs(A.__pydyty_type__.attrs['bar'],
+                      A.__pydyty_type__.attrs['foo'])
+
+    def test_varargs(self):
+
+        class A(Monitored):
+            def foo(self, *args):
+                return len(args)
+
+        a = A()
+        self.assertEqual(2, a.foo(1, 'a'))
+        self.assertEqual('[foo: (int, str) -> int]', str(A.__pydyty_type__))
+
+    def test_unwrapped_values(self):
+
+        class A(Monitored):
+            def foo(self, x, y):
+                return type(x), y.z
+
+        class B(object):
+            z = 'b'
+
+        a = A()
+        self.assertEqual((int, 'b'), a.foo(1, B()))
+        self.assertEqual('[foo: (int, [z: str]) -> tuple]',
+                         str(A.__pydyty_type__))
+
+    def test_specialized_proxy(self):
+
+        class A(Monitored):
+            def foo(self, x, y):
+                """ Docstring of foo."""
+                return y
+
+        a = A()
+        self.assertEqual('foo', A.__dict__['foo'].__name__)
+        self.assertEqual('Docstring of foo.', A.foo.__doc__.strip())
+        self.assertEqual(2, a.foo(1, y=2))
+        self.assertEqual('[foo: (int, int) -> int]', str(A.__pydyty_type__))
+        with self.assertRaises(TypeError):
+            a.foo(1)
+
+    def test_known_shapes(self):
+
+        class A(Monitored):
+            def foo(self, x, y):
+                return y
+
+        class B(object):
+            pass
+
+        a = A()
+        self.assertEqual('a', a.foo(1, 'a'))
+        of = types.MethodType.__dict__['of']
+        calls = []
+
+        def counted(cls, *args):
+            calls.append(args)
+            return of.__func__(cls, *args)
+
+        types.MethodType.of = classmethod(counted)
+        try:
+            self.assertEqual('b', a.foo(2, 'b'))
+            self.assertEqual([], calls)
+            self.assertEqual(1, a.foo(1, 1))
+            self.assertEqual(1, len(calls))
+            # Structural arguments are wrapped and recorded every time.
+            self.assertIsInstance(a.foo(1, B()), B)
+            self.assertIsInstance(a.foo(1, B()), B)
+            self.assertEqual(3, len(calls))
+        finally:
+            types.MethodType.of = of
+        self.assertEqual('[foo: ((int, str) -> str) and ((int, int) -> int) '
+                         'and ((int, []) -> B)]',
+                         str(A.__pydyty_type__))
+
+    def test_specialized_proxy_names(self):
+
+        class A(Monitored):
+            def foo(_pydyty_self, _pydyty_func, proxy):
+                return proxy
+
+        a = A()
+        self.assertEqual('a', a.foo(1, 'a'))
+        self.assertEqual('[foo: (int, str) -> str]', str(A.__pydyty_type__))
+
+    def test_class_type(self):
+
+        class A(Monitored):
+            def foo(self, x):
+                return x
+
+        class B(Monitored):
+            pass
+
+        self.assertIsNot(A.__pydyty_type__, B.__pydyty_type__)
+        self.assertFalse(hasattr(Monitor, '__pydyty_type__'))
+
+
+class FreezeTestCase(BaseTestCase):
+
+    def test_freeze(self):
+
+        class A(Monitored):
+            __pydyty_freeze__ = 3
+
+            def foo(self, x, y):
+                return type(y)
+
+        a = A()
+        proxy = A.__dict__['foo']
+        for _ in range(4):
+            self.assertTrue(issubclass(a.foo(1, Point()), ObjectWrapper))
+        guard = A.__dict__['foo']
+        self.assertIsNot(proxy, guard)
+        self.assertEqual('foo', guard.__name__)
+        # Frozen calls reach the original function with the raw arguments.
+        self.assertIs(Point, a.foo(2, Point()))
+        self.assertIs(guard, A.__dict__['foo'])
+        self.assertEqual('[foo: (int, []) -> type]', str(A.__pydyty_type__))
+
+        # A new shape resumes recording.
+        self.assertIs(str, a.foo(1, 'a'))
+        self.assertIs(proxy, A.__dict__['foo'])
+        self.assertIn('(int, str) -> type', str(A.__pydyty_type__))
+
+    def test_freeze_no_args(self):
+
+        class A(Monitored):
+            __pydyty_freeze__ = 2
+
+            def foo(self):
+                return 1
+
+        a = A()
+        for _ in range(3):
+            a.foo()
+        self.assertEqual('[foo: () -> int]', str(A.__pydyty_type__))
+        self.assertFalse(hasattr(A.__dict__['foo'], '__wrapped__'))
+
+    def test_freeze_generic(self):
+
+        class A(Monitored):
+            __pydyty_freeze__ = 2
+
+            def foo(self, *args, **kwargs):
+                return len(args)
+
+        a = A()
+        for _ in range(3):
+            a.foo(1, 2)
+        guard = A.__dict__['foo']
+        self.assertEqual(2, a.foo(3, 4))
+        self.assertIs(guard, A.__dict__['foo'])
+        self.assertEqual(1, a.foo('a'))
+        self.assertIsNot(guard, A.__dict__['foo'])
+        self.assertIn('(str) -> int', str(A.__pydyty_type__))
+
+        for _ in range(3):
+            a.foo(1, 2)
+        self.assertIs(guard, A.__dict__['foo'])
+        self.assertEqual(0, a.foo(x=1))
+        self.assertIsNot(guard, A.__dict__['foo'])
+        self.assertIn('(x:int) -> int', str(A.__pydyty_type__))
+
+    def test_freeze_generic_keywords(self):
+
+        class A(Monitored):
+            __pydyty_freeze__ = 2
+
+            def foo(self, x, y=None):
+                return x
+
+        a = A()
+        for _ in range(3):
+            a.foo(x=1)
+        guard = A.__dict__['foo']
+        self.assertEqual(2, a.foo(x=2))
+        self.assertEqual(2, a.foo(2))
+        self.assertIs(guard, A.__dict__['foo'])
+        self.assertEqual('[foo: (int) -> int]', str(A.__pydyty_type__))
+
+    def test_no_freeze_by_default(self):
+
+        class A(Monitored):
+            def foo(self, x):
+                return x
+
+        a = A()
+        proxy = A.__dict__['foo']
+        for _ in range(100):
+            a.foo(1)
+        self.assertIs(proxy, A.__dict__['foo'])
+
+
+class Point(object):
+    pass
@@ -1,5 +1,10 @@
 import inspect
+try:
+    from collections.abc import Hashable, Iterable, Sized
+except ImportError:  # Python 2
+    from collections import Hashable, Iterable, Sized
 from base_test import BaseTestCase
+from pydyty import object_wrapper
 from pydyty.object_wrapper import ObjectWrapper
 from pydyty import types
 
@@ -46,6 +51,45 @@ class TestClassB(object):
         return first + second
 
 
+class Vector(object):
+
+    def __init__(self, *items):
+        self.items = list(items)
+
+    def __add__(self, other):
+        return Vector(*[a + b for a, b in zip(self.items, other.items)])
+
+    def __rmul__(self, factor):
+        return Vector(*[factor * a for a in self.items])
+
+    def __eq__(self, other):
+        return self.items == other.items
+
+    def __hash__(self):
+        return hash(tuple(self.items))
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, i):
+        return self.items[i]
+
+    def __setitem__(self, i, value):
+        self.items[i] = value
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
 class ObjectWrapperTestCase(BaseTestCase):
 
     def setUp(self):
@@ -64,6 +108,34 @@ class ObjectWrapperTestCase(BaseTestCase):
         obj_wrapper = ObjectWrapper(1)
         self.assertEqual('int', str(obj_wrapper.__pydyty_type__))
 
+    def test_primitive_method_call(self):
+        obj_wrapper = ObjectWrapper([])
+        obj_wrapper.append(1)
+        self.assertEqual([1], obj_wrapper.__pydyty_obj__)
+        self.assertEqual('list', str(obj_wrapper.__pydyty_type__))
+
+    def test_slots(self):
+        with self.assertRaises(AttributeError):
+            object.__getattribute__(self.obj_wrapper, '__dict__')
+        self.obj_wrapper.y = 1
+        self.assertEqual(1, self.obj.y)
+        self.assertEqual('[y: int]', str(self.obj_wrapper.__pydyty_type__))
+
+    def test_wrap(self):
+        self.assertIs(1, object_wrapper.wrap(1))
+        self.assertIsNone(object_wrapper.wrap(None))
+        self.assertIsInstance(object_wrapper.wrap(self.obj), ObjectWrapper)
+        wrapped = object_wrapper.wrap(self.obj_wrapper)
+        self.assertIsNot(self.obj_wrapper, wrapped)
+        self.assertIs(self.obj, wrapped.__pydyty_obj__)
+        self.assertTrue(object_wrapper._structural[TestClassA])
+        self.assertFalse(object_wrapper._structural[int])
+
+    def test_type_of(self):
+        self.assertIs(types.NominalType.of(1), object_wrapper.type_of(1))
+        self.assertIs(self.obj_wrapper.__pydyty_type__,
+                      object_wrapper.type_of(self.obj_wrapper))
+
     def test_old_class_style(self):
         x = 1
         y = 2
@@ -155,3 +227,79 @@ class ObjectWrapperTestCase(BaseTestCase):
         self.assertEqual('[bar: (first:[x: int], second:[x: int]) -> int,' +
                          ' baz: (first:int, second:int) -> int]',
                          str(b.__pydyty_type__))
+
+
+class DunderTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(DunderTestCase, self).setUp()
+        self.vec = Vector(1, 2)
+        self.wrapper = ObjectWrapper(self.vec)
+
+    def attr_str(self, name):
+        return str(self.wrapper.__pydyty_type__.attrs[name])
+
+    def test_add(self):
+        other = ObjectWrapper(Vector(1, 1))
+        self.assertEqual([2, 3], (self.wrapper + other).items)
+        self.assertEqual('([]) -> Vector', self.attr_str('__add__'))
+
+    def test_reflected(self):
+        self.assertEqual([2, 4], (2 * self.wrapper).items)
+        self.assertEqual('(int) -> Vector', self.attr_str('__rmul__'))
+
+    def test_comparison_and_hash(self):
+        self.assertTrue(self.wrapper == Vector(1, 2))
+        self.assertEqual(hash(self.vec), hash(self.wrapper))
+        self.assertEqual('(Vector) -> bool', self.attr_str('__eq__'))
+        self.assertEqual('() -> int', self.attr_str('__hash__'))
+
+    def test_container(self):
+        self.assertEqual(2, len(self.wrapper))
+        self.assertEqual(2, self.wrapper[1])
+        self.wrapper[0] = 5
+        self.assertTrue(5 in self.wrapper)
+        self.assertEqual([5, 2], list(self.wrapper))
+        self.assertEqual('() -> int', self.attr_str('__len__'))
+        self.assertEqual('(int) -> int', self.attr_str('__getitem__'))
+        self.assertEqual('(int, int) -> NoneType',
+                         self.attr_str('__setitem__'))
+        self.assertEqual('(int) -> bool', self.attr_str('__contains__'))
+        self.assertIn('__iter__', self.wrapper.__pydyty_type__.attrs)
+
+    def test_context_manager(self):
+        with self.wrapper as vec:
+            self.assertIs(self.vec, vec)
+        self.assertEqual('() -> Vector', self.attr_str('__enter__'))
+        self.assertEqual('(NoneType, NoneType, NoneType) -> bool',
+                         self.attr_str('__exit__'))
+
+    def test_unsupported(self):
+        with self.assertRaises(TypeError):
+            -self.wrapper
+        self.assertNotIn('__neg__', self.wrapper.__pydyty_type__.attrs)
+
+    def test_protocols(self):
+        class Unhashable(object):
+            def __eq__(self, other):
+                return True
+            __hash__ = None
+
+        names = ['__len__', '__iter__', '__enter__', '__getitem__',
+                 '__add__', '__neg__', '__hash__']
+        for obj in (TestClassA(), self.vec, Unhashable()):
+            wrapper = ObjectWrapper(obj)
+            self.assertEqual([hasattr(obj, n) for n in names],
+                             [hasattr(wrapper, n) for n in names])
+            for abc in (Hashable, Iterable, Sized):
+                self.assertEqual(isinstance(obj, abc),
+                                 isinstance(wrapper, abc))
+        self.assertFalse(hasattr(ObjectWrapper(TestClassA()), '__len__'))
+        self.assertIs(type(ObjectWrapper(TestClassA())),
+                      type(ObjectWrapper(TestClassB())))
+
+    def test_nominal(self):
+        wrapper = ObjectWrapper([1, 2])
+        self.assertEqual(2, len(wrapper))
+        self.assertEqual([1, 2, 3], wrapper + [3])
+        self.assertEqual('list', str(wrapper.__pydyty_type__))
@@ -0,0 +1,27 @@
+import threading
+from base_test import BaseTestCase
+from pydyty.periodic import Periodic
+
+
+class PeriodicTestCase(BaseTestCase):
+
+    def test_periodic(self):
+        ran = threading.Event()
+        calls = []
+
+        def task():
+            calls.append(threading.current_thread())
+            ran.set()
+
+        worker = Periodic('pydyty-test', task, 0.01)
+        self.assertTrue(worker.daemon)
+        worker.start()
+        self.assertTrue(ran.wait(5))
+        worker.stop()
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(set([worker]), set(calls))
+
+    def test_stop_not_started(self):
+        worker = Periodic('pydyty-test', lambda: None, 0.01)
+        worker.stop()
+        self.assertTrue(worker.stopped.is_set())
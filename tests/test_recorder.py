@@ -0,0 +1,110 @@
+import threading
+from base_test import BaseTestCase
+from pydyty import recorder
+from pydyty import types
+from pydyty.monitor import Monitored
+
+
+class _Shape(object):
+    pass
+
+
+VALUES = [1, 'a', 1.0, None]
+
+
+class RecorderTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(RecorderTestCase, self).setUp()
+        self.flush_every = recorder.flush_every
+
+    def tearDown(self):
+        recorder.set_flush_every(self.flush_every)
+        recorder.stop_flusher()
+        super(RecorderTestCase, self).tearDown()
+
+    def _run_threads(self, target, num_threads=16):
+        threads = [threading.Thread(target=target, args=(i,))
+                   for i in range(num_threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def _make_class(self):
+        class A(Monitored):
+            def foo(self, x):
+                return x
+        return A
+
+    def _stress(self):
+        A = self._make_class()
+        a = A()
+
+        def work(i):
+            for j in range(200):
+                a.foo(VALUES[(i + j) % len(VALUES)])
+
+        self._run_threads(work)
+        recorder.flush()
+        return A.__pydyty_type__
+
+    def test_immediate(self):
+        recorder.set_flush_every(1)
+        cls_type = self._stress()
+        self.assertEqual(0, recorder.pending())
+        self.assertEqual(4, len(cls_type.attrs['foo'].types))
+
+    def test_buffered(self):
+        recorder.set_flush_every(64)
+        cls_type = self._stress()
+        self.assertEqual(0, recorder.pending())
+        self.assertEqual(4, len(cls_type.attrs['foo'].types))
+
+    def test_buffered_merge_is_deterministic(self):
+        recorder.set_flush_every(1000000)
+        results = set()
+        for i in range(3):
+            results.add(str(self._stress()))
+        self.assertEqual(1, len(results))
+
+    def test_buffered_record(self):
+        recorder.set_flush_every(10)
+        o_t = types.ObjectType()
+        m_t = types.MethodType.of([], {}, types.NominalType('A'))
+        self.assertTrue(recorder.record(o_t, 'm', m_t))
+        self.assertEqual({}, o_t.attrs)
+        self.assertEqual(1, recorder.pending())
+        recorder.flush()
+        self.assertEqual('[m: () -> A]', str(o_t))
+        self.assertFalse(recorder.record(o_t, 'm', m_t))
+
+    def test_flusher(self):
+        recorder.set_flush_every(1000000)
+        o_t = types.ObjectType()
+        m_t = types.MethodType.of([], {}, types.NominalType('A'))
+        recorder.start_flusher(0.01)
+        recorder.record(o_t, 'm', m_t)
+        recorder.stop_flusher()
+        self.assertEqual('[m: () -> A]', str(o_t))
+
+    def test_known_without_lock(self):
+        o_t = types.ObjectType()
+        int_t = types.NominalType.of(1)
+        m_t = types.MethodType.of([int_t], {}, int_t)
+        self.assertTrue(recorder.record(o_t, 'm', m_t))
+        results = []
+
+        def work():
+            results.append(recorder.record(o_t, 'm', m_t))
+
+        with recorder.merge_lock:
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join(5)
+            self.assertEqual([False], results)
+        thread.join()
+
+    def test_bad_flush_every(self):
+        with self.assertRaises(ValueError):
+            recorder.set_flush_every(0)
@@ -0,0 +1,82 @@
+import gc
+import instrument_cases
+from base_test import BaseTestCase
+from pydyty import instrument
+from pydyty import registry
+from pydyty import store
+from pydyty.monitor import Monitored
+
+
+class Shape(Monitored):
+
+    def area(self, scale):
+        return 2 * scale
+
+
+class RegistryTestCase(BaseTestCase):
+
+    def test_monitored(self):
+        self.assertIn(Shape, registry.monitored)
+        self.assertNotIn(Monitored, registry.monitored)
+        self.assertIs(Shape.__pydyty_type__,
+                      registry.monitored.type_of(Shape))
+        self.assertIs(Shape, registry.monitored.lookup('test_registry.Shape'))
+        self.assertIn(Shape, registry.monitored.in_module('test_registry'))
+        self.assertIn('test_registry', registry.monitored.modules())
+        self.assertIn((Shape, Shape.__pydyty_type__),
+                      registry.monitored.items())
+        self.assertIn(Shape, list(registry.monitored))
+
+    def test_released(self):
+        reg = registry.Registry()
+
+        class A(object):
+            pass
+
+        obj_type = reg.register(A)
+        name = A.__qualname__ if hasattr(A, '__qualname__') else 'A'
+        self.assertIs(obj_type, reg.register(A))
+        self.assertEqual(1, len(reg))
+        self.assertIs(A, reg.lookup('%s.%s' % (__name__, name)))
+        del A
+        gc.collect()
+        self.assertEqual(0, len(reg))
+        self.assertEqual([], reg.classes())
+        self.assertEqual([], reg.modules())
+        self.assertIsNone(reg.lookup('%s.%s' % (__name__, name)))
+
+    def test_same_name(self):
+        reg = registry.Registry()
+
+        def make():
+            class A(object):
+                pass
+            reg.register(A)
+            return A
+
+        first, second = make(), make()
+        name = registry.hierarchy.qualname(first)
+        self.assertIs(second, reg.lookup(name))
+        self.assertEqual([second], reg.in_module(__name__))
+        self.assertEqual(2, len(reg))
+        del second
+        gc.collect()
+        self.assertIsNone(reg.lookup(name))
+        self.assertEqual([first], reg.classes())
+        reg.unregister(first)
+        self.assertEqual(0, len(reg))
+
+    def test_attached(self):
+        cls = instrument_cases.Counter
+        instrument.attach(cls)
+        try:
+            self.assertIs(cls.__pydyty_type__,
+                          registry.monitored.type_of(cls))
+        finally:
+            instrument.detach_all()
+
+    def test_collect(self):
+        Shape().area(1)
+        profile = store.Profile.collect()
+        self.assertEqual('[area: (int) -> int]',
+                         str(profile.classes['test_registry.Shape']))
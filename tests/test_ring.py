@@ -0,0 +1,192 @@
+import gc
+import threading
+import time
+from base_test import BaseTestCase
+from pydyty import monitor
+from pydyty import ring
+from pydyty import types
+from pydyty.sampling import EveryNthSampler
+from pydyty.store import Profile
+from pydyty.monitor import Monitored
+
+
+class _Shape(object):
+    pass
+
+
+class RingBufferTestCase(BaseTestCase):
+
+    def test_drain_in_order(self):
+        buf = ring.RingBuffer(8)
+        for i in range(5):
+            buf.append(i, (), (), (), int)
+        self.assertEqual([0, 1, 2, 3, 4], [e[1] for e in buf.drain()])
+        self.assertEqual([], buf.drain())
+        buf.append(5, (), (), (), int)
+        self.assertEqual([5], [e[1] for e in buf.drain()])
+        self.assertEqual(0, buf.dropped)
+
+    def test_overwrite(self):
+        buf = ring.RingBuffer(4)
+        for i in range(10):
+            buf.append(i, (), (), (), int)
+        entries = buf.drain()
+        self.assertEqual([6, 7, 8, 9], [e[1] for e in entries])
+        self.assertEqual(6, buf.dropped)
+
+    def test_full_drain(self):
+        buf = ring.RingBuffer(4)
+        for _ in range(3):
+            for i in range(4):
+                buf.append(i, (), (), (), int)
+            self.assertEqual([0, 1, 2, 3], [e[1] for e in buf.drain()])
+            self.assertEqual([], buf.drain())
+        self.assertEqual(0, buf.dropped)
+
+    def test_unwritten_slot(self):
+        buf = ring.RingBuffer(8)
+        buf.append(0, (), (), (), int)
+        next(buf._counter)      # claimed, but not written yet
+        buf.append(2, (), (), (), int)
+        self.assertEqual([0], [e[1] for e in buf.drain()])
+        buf._slots[1] = (1, 1, (), (), (), int, None)
+        self.assertEqual([1, 2], [e[1] for e in buf.drain()])
+
+    def test_invalid_size(self):
+        self.assertRaises(ValueError, ring.RingBuffer, 0)
+
+
+class RingTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(RingTestCase, self).setUp()
+        ring.flush()
+        self.dropped = ring.buffer.dropped
+
+    def tearDown(self):
+        ring.stop_consumer()
+        ring.capture_sites = False
+        ring.flush()
+        super(RingTestCase, self).tearDown()
+
+    def _make_class(self, sampler=None):
+        class A(Monitored):
+            __pydyty_deferred__ = True
+            __pydyty_sampler__ = sampler
+
+            def foo(self, x, y=None):
+                return x
+
+            def bar(self, *args, **kwargs):
+                return len(args)
+
+        return A
+
+    def test_deferred(self):
+        A = self._make_class()
+        a = A()
+        self.assertEqual(1, a.foo(1))
+        self.assertEqual('a', a.foo('a', y=2))
+        self.assertEqual(2, a.bar(1, 2, z=_Shape()))
+        self.assertNotIn('foo', A.__pydyty_type__.attrs)
+        self.assertEqual(3, ring.flush())
+        self.assertEqual('((int) -> int) and ((str, int) -> str)',
+                         str(A.__pydyty_type__.attrs['foo']))
+        self.assertEqual('(int, int, z:_Shape) -> int',
+                         str(A.__pydyty_type__.attrs['bar']))
+
+    def test_nominal_only(self):
+        A = self._make_class()
+        a = A()
+        a.foo(_Shape())
+        ring.flush()
+        method_type = A.__pydyty_type__.attrs['foo']
+        self.assertIsInstance(method_type.arg_types[0], types.NominalType)
+        self.assertIs(types.NominalType.of(_Shape()),
+                      method_type.arg_types[0])
+
+    def test_collect(self):
+        A = self._make_class()
+        A().foo(1)
+        profile = Profile.collect([A])
+        self.assertEqual(1, len(profile.classes))
+        obj_type = list(profile.classes.values())[0]
+        self.assertEqual('(int) -> int', str(obj_type.attrs['foo']))
+
+    def test_sites(self):
+        ring.capture_sites = True
+        A = self._make_class()
+        A().foo(1)
+        ring.flush()
+        loc = A.__pydyty_type__.attrs['foo'].loc
+        self.assertEqual('test_sites', loc.first.func)
+        self.assertTrue(loc.first.file.endswith('test_ring.py'))
+
+    def test_sampler(self):
+        A = self._make_class(EveryNthSampler(3))
+        a = A()
+        for i in range(6):
+            a.foo(i)
+        self.assertEqual(2, ring.flush())
+
+    def test_disabled(self):
+        A = self._make_class()
+        monitor.disable()
+        try:
+            self.assertEqual(1, A().foo(1))
+        finally:
+            monitor.enable()
+        self.assertEqual(0, ring.flush())
+
+    def test_threads(self):
+        A = self._make_class()
+        a = A()
+        values = [1, 'a', 1.0, None]
+
+        def work(i):
+            for j in range(200):
+                a.foo(values[(i + j) % len(values)])
+
+        threads = [threading.Thread(target=work, args=(i,))
+                   for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(1600, ring.flush())
+        self.assertEqual(self.dropped, ring.buffer.dropped)
+        self.assertEqual(4, len(A.__pydyty_type__.attrs['foo'].types))
+
+    def test_forget_collected(self):
+        A = self._make_class()
+        A().foo(1)
+        self.assertEqual(1, ring.flush())
+        ids = [i for i, (ref, _, _) in list(ring._methods.items())
+               if ref() is A.__pydyty_type__]
+        self.assertEqual(2, len(ids))
+        A().foo(1)
+        del A
+        gc.collect()
+        self.assertEqual([], [i for i in ids if i in ring._methods])
+        self.assertEqual(0, ring.flush())
+
+    def test_consumer(self):
+        A = self._make_class()
+        ring.start_consumer(0.01)
+        A().foo(1)
+        for _ in range(200):
+            if 'foo' in A.__pydyty_type__.attrs:
+                break
+            time.sleep(0.01)
+        self.assertEqual('(int) -> int', str(A.__pydyty_type__.attrs['foo']))
+
+    def test_set_size(self):
+        A = self._make_class()
+        A().foo(1)
+        prev = ring.set_size(16)
+        try:
+            self.assertEqual('(int) -> int',
+                             str(A.__pydyty_type__.attrs['foo']))
+            self.assertEqual(16, ring.buffer.size)
+        finally:
+            ring.set_size(prev)
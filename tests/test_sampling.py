@@ -0,0 +1,86 @@
+from base_test import BaseTestCase
+from pydyty.monitor import Monitored
+from pydyty.sampling import (ConvergenceSampler, EveryNthSampler,
+                             RateSampler)
+
+
+class SamplingTestCase(BaseTestCase):
+
+    def test_every_nth(self):
+        sampler = EveryNthSampler(3)
+
+        class A(Monitored):
+            __pydyty_sampler__ = sampler
+
+            def foo(self, x):
+                return x
+
+        a = A()
+        for i in range(10):
+            self.assertEqual(i, a.foo(i))
+        counter = sampler.counters['A.foo']
+        self.assertEqual(10, counter.calls)
+        self.assertEqual(4, counter.sampled)
+        self.assertEqual('[foo: (int) -> int]', str(A.__pydyty_type__))
+
+    def test_rate(self):
+        values = iter([0.9, 0.1, 0.9])
+        sampler = RateSampler(0.5, rand=lambda: next(values))
+
+        class A(Monitored):
+            __pydyty_sampler__ = sampler
+
+            def foo(self, x):
+                return x
+
+        a = A()
+        for i in range(4):
+            a.foo(i)
+        counter = sampler.counters['A.foo']
+        self.assertEqual(4, counter.calls)
+        self.assertEqual(2, counter.sampled)
+        self.assertEqual(0.5, counter.coverage)
+
+    def test_rate_bounds(self):
+        with self.assertRaises(ValueError):
+            RateSampler(2)
+        with self.assertRaises(ValueError):
+            EveryNthSampler(0)
+
+    def test_convergence_backs_off(self):
+        sampler = ConvergenceSampler(patience=2, max_interval=4)
+
+        class A(Monitored):
+            __pydyty_sampler__ = sampler
+
+            def foo(self, x):
+                return x
+
+        a = A()
+        for i in range(100):
+            a.foo(i)
+        counter = sampler.counters['A.foo']
+        self.assertEqual(100, counter.calls)
+        self.assertEqual(4, counter.interval)
+        self.assertTrue(counter.sampled < 40)
+
+    def test_convergence_resets_on_change(self):
+        sampler = ConvergenceSampler(patience=1, max_interval=8)
+
+        class A(Monitored):
+            __pydyty_sampler__ = sampler
+
+            def foo(self, x):
+                return x
+
+        a = A()
+        for i in range(20):
+            a.foo(i)
+        counter = sampler.counters['A.foo']
+        self.assertEqual(8, counter.interval)
+        while counter.skip:
+            a.foo(0)
+        a.foo('a')
+        self.assertEqual(1, counter.interval)
+        self.assertEqual('[foo: ((int) -> int) and ((str) -> str)]',
+                         str(A.__pydyty_type__))
@@ -0,0 +1,211 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from base_test import BaseTestCase
+from pydyty import hierarchy
+from pydyty import ring
+from pydyty import store
+from pydyty import types
+from pydyty.loc import Location
+from pydyty.monitor import Monitored
+
+
+def _method(arg, ret):
+    return types.MethodType([types.NominalType(arg)], {},
+                            types.NominalType(ret))
+
+
+class EncodingTestCase(BaseTestCase):
+
+    def _roundtrip(self, t):
+        decoded = store.decode(store.encode(t))
+        self.assertEqual(t, decoded)
+        self.assertEqual(str(t), str(decoded))
+        return decoded
+
+    def test_simple_types(self):
+        self.assertEqual('T', store.encode(types.TopType()))
+        self.assertEqual(['N', 'A'], store.encode(types.NominalType('A')))
+        self._roundtrip(types.TopType())
+        self._roundtrip(types.BottomType())
+        decoded = self._roundtrip(types.NominalType('A'))
+        self.assertIs(types.intern_type(types.NominalType('A')), decoded)
+
+    def test_qualified_names(self):
+        class ClassA(object):
+            pass
+
+        n_t = types.NominalType.of(ClassA())
+        data = store.encode(n_t)
+        self.assertEqual(['N', 'ClassA', n_t.qualname], data)
+        self.assertEqual(n_t, self._roundtrip(n_t))
+        f_t = types.FusionType(ClassA(), {'m': _method('A', 'B')},
+                               is_object=True)
+        self.assertEqual(f_t.qualname, self._roundtrip(f_t).qualname)
+        loc = Location.create(('foo.py', 1, 'bar', 'x = 1'))
+        t = store.decode(store.encode(
+            types.NominalType('A', qualname='mod.A', loc=loc)))
+        self.assertEqual('mod.A', t.qualname)
+        self.assertEqual(1, len(t.loc))
+
+    def test_composite_types(self):
+        m_t = types.MethodType([types.NominalType('A')],
+                               {'k': types.TopType()},
+                               types.UnionType([types.NominalType('B'),
+                                                types.NominalType('C')]))
+        self._roundtrip(m_t)
+        i_t = types.IntersectionType([_method('A', 'B'), _method('C', 'D')])
+        o_t = types.ObjectType({'m': i_t, 'x': types.NominalType('E')})
+        self._roundtrip(o_t)
+        f_t = types.FusionType('Foo', {'m': _method('A', 'B')})
+        self._roundtrip(f_t)
+
+    def test_locations(self):
+        loc = Location.create(('foo.py', 1, 'bar', 'x = 1'))
+        loc.add_trace_slice(('foo.py', 1, 'bar', 'x = 1'))
+        loc.add_trace_slice(('foo.py', 2, 'bar', 'y = 1'))
+        loc.other = 3
+        t = store.decode(store.encode(types.NominalType('A', loc=loc)))
+        self.assertEqual(2, t.loc.count(t.loc.first))
+        self.assertEqual('x = 1', t.loc.first.code)
+        self.assertEqual(2, t.loc.last.line)
+        self.assertEqual(3, t.loc.other)
+
+
+class ProfileTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(ProfileTestCase, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        super(ProfileTestCase, self).tearDown()
+
+    def _path(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def test_collect_dump_load(self):
+        class A(Monitored):
+            def foo(self, x):
+                return x
+
+        A().foo(1)
+        profile = store.Profile.collect([A])
+        name = hierarchy.qualname(A)
+        self.assertEqual('[foo: (int) -> int]', str(profile.classes[name]))
+        profile.dump(self._path('a.json'))
+        loaded = store.Profile.load(self._path('a.json'))
+        self.assertEqual(profile.classes, loaded.classes)
+
+    def test_collect_copies(self):
+        class A(Monitored):
+            __pydyty_deferred__ = True
+
+            def foo(self, x):
+                return x
+
+        ring.capture_sites = True
+        try:
+            A().foo(1)
+            A().foo(1)
+        finally:
+            ring.capture_sites = False
+        profile = store.Profile.collect([A])
+        live = store.encode(A.__pydyty_type__)
+        profile.dump(self._path('a.json'))
+        loaded = store.Profile.load(self._path('a.json'))
+        profile.merge(loaded).merge(loaded)
+        self.assertEqual(live, store.encode(A.__pydyty_type__))
+        foo = profile.classes[hierarchy.qualname(A)].attrs['foo']
+        self.assertEqual(6, foo.loc.hits)
+
+    @unittest.skipIf(sys.version_info < (3, 3), 'requires __qualname__')
+    def test_collect_same_name(self):
+        def make():
+            class A(Monitored):
+                def foo(self):
+                    return 1
+            return A
+
+        class A(Monitored):
+            def foo(self):
+                return 1.0
+
+        Local = make()
+        Local().foo()
+        A().foo()
+        profile = store.Profile.collect([Local, A])
+        self.assertEqual('[foo: () -> int]',
+                         str(profile.classes[hierarchy.qualname(Local)]))
+        self.assertEqual('[foo: () -> float]',
+                         str(profile.classes[hierarchy.qualname(A)]))
+
+    def test_merge_saturated(self):
+        saturated = types.IntersectionType([_method('A', 'B')])
+        saturated.saturate()
+        merged = store.Profile().merge(
+            store.Profile({'A': types.ObjectType({'m': saturated})}))
+        merged.merge(store.Profile(
+            {'A': types.ObjectType({'m': _method('C', 'D')})}))
+        m = merged.classes['A'].attrs['m']
+        self.assertTrue(m.saturated)
+        self.assertEqual(1, len(m.types))
+        self.assertEqual('((A) or (C)) -> (B) or (D)', str(m.types[0]))
+
+    def test_bad_version(self):
+        with self.assertRaises(ValueError):
+            store.Profile.from_dict({'version': -1, 'classes': {}})
+
+    def test_merge(self):
+        p1 = store.Profile({'A': types.ObjectType({'m': _method('A', 'B')})})
+        p2 = store.Profile({'A': types.ObjectType({'m': _method('C', 'D')}),
+                            'B': types.ObjectType({'n': _method('E', 'F')})})
+        p3 = store.Profile({'A': types.ObjectType({'m': _method('A', 'B')})})
+        merged = store.Profile().merge(p1).merge(p2).merge(p3)
+        self.assertEqual('[m: ((A) -> B) and ((C) -> D)]',
+                         str(merged.classes['A']))
+        self.assertEqual('[n: (E) -> F]', str(merged.classes['B']))
+
+    def _write_profiles(self, n):
+        paths = []
+        for i in range(n):
+            arg = 'A%d' % (i % 3)
+            profile = store.Profile(
+                {'A': types.ObjectType({'m': _method(arg, 'B')})})
+            path = self._path('p%d.json' % i)
+            profile.dump(path)
+            paths.append(path)
+        return paths
+
+    def test_merge_files(self):
+        paths = self._write_profiles(10)
+        merged = store.merge_files(paths)
+        self.assertEqual(3, len(merged.classes['A'].attrs['m'].types))
+
+    def test_merge_files_jobs(self):
+        paths = self._write_profiles(10)
+        merged = store.merge_files(paths, jobs=2)
+        self.assertEqual(3, len(merged.classes['A'].attrs['m'].types))
+
+    def test_main(self):
+        paths = self._write_profiles(4)
+        store.main(['-o', self._path('out.json')] + paths)
+        merged = store.Profile.load(self._path('out.json'))
+        self.assertEqual(3, len(merged.classes['A'].attrs['m'].types))
+
+    def test_writer(self):
+        class A(Monitored):
+            def foo(self, x):
+                return x
+
+        A().foo(1)
+        writer = store.ProfileWriter(self._path('w-{pid}.json'),
+                                     lambda: [A], interval=0.01)
+        writer.start()
+        path = writer.stop()
+        self.assertEqual(self._path('w-%d.json' % os.getpid()), path)
+        profile = store.Profile.load(path)
+        self.assertEqual(1, len(profile.classes))
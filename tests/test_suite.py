@@ -0,0 +1,129 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+from base_test import BaseTestCase
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'benchmarks'))
+
+import suite  # noqa
+
+
+def _results(**modules):
+    return {'version': suite.VERSION, 'results': modules}
+
+
+class SuiteTestCase(BaseTestCase):
+
+    def setUp(self):
+        super(SuiteTestCase, self).setUp()
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        super(SuiteTestCase, self).tearDown()
+
+    def _dump(self, name, data):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            json.dump(data, f)
+        return path
+
+    def test_compare(self):
+        baseline = _results(bench_a={'x': 10.0, 'y': 10.0, 'gone': 1.0},
+                            bench_b={'z': 4.0})
+        current = _results(bench_a={'x': 12.0, 'y': 13.0, 'new': 1.0},
+                           bench_b={'z': 2.0}, bench_c={'w': 1.0})
+        self.assertEqual([('bench_a', 'x', 10.0, 12.0, 1.2, False),
+                          ('bench_a', 'y', 10.0, 13.0, 1.3, True),
+                          ('bench_b', 'z', 4.0, 2.0, 0.5, False)],
+                         suite.compare(baseline, current))
+
+    def test_compare_threshold(self):
+        baseline = _results(bench_a={'x': 10.0})
+        current = _results(bench_a={'x': 12.0})
+        self.assertTrue(suite.compare(baseline, current, threshold=0.1)[0][5])
+        self.assertFalse(suite.compare(baseline, current,
+                                       threshold=0.2)[0][5])
+
+    def test_compare_min_usec(self):
+        baseline = _results(bench_a={'x': 0.1, 'zero': 0.0})
+        current = _results(bench_a={'x': 1.0, 'zero': 1.0})
+        rows = suite.compare(baseline, current)
+        self.assertEqual([('bench_a', 'x', 0.1, 1.0, 10.0, False),
+                          ('bench_a', 'zero', 0.0, 1.0, float('inf'),
+                           False)], rows)
+        self.assertEqual([True, True], [row[5] for row in suite.compare(
+            baseline, current, min_usec=0.0)])
+
+    def test_usec(self):
+        calls = []
+        usec = suite.usec(lambda: calls.append(1), 10, repeat=2, ops=5)
+        self.assertEqual(20, len(calls))
+        self.assertTrue(usec >= 0)
+
+    def test_report(self):
+        out = StringIO()
+        suite.report({'b': 2.0, 'long': 1.5}, 'usec/call', out=out)
+        self.assertEqual('b         2.000 usec/call\n'
+                         'long      1.500 usec/call\n', out.getvalue())
+
+    def test_main(self):
+        baseline = self._dump('baseline.json', _results(bench_a={'x': 10.0}))
+        same = self._dump('same.json', _results(bench_a={'x': 11.0}))
+        slower = self._dump('slower.json', _results(bench_a={'x': 20.0}))
+        out = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            self.assertEqual(0, suite.main(['--input', same,
+                                            '--compare', baseline]))
+            self.assertEqual(1, suite.main(['--input', slower,
+                                            '--compare', baseline]))
+            self.assertEqual(0, suite.main(['--input', slower,
+                                            '--compare', baseline,
+                                            '--threshold', '1.5']))
+            self.assertEqual(0, suite.main(['--input', slower,
+                                            '--compare', baseline,
+                                            '--min-usec', '20']))
+            report = sys.stdout.getvalue()
+        finally:
+            sys.stdout = out
+        self.assertIn('REGRESSED', report)
+        self.assertIn('1 measurement(s) regressed by more than 25%', report)
+
+    def test_unsupported_version(self):
+        path = self._dump('old.json', {'version': 0, 'results': {}})
+        self.assertRaises(ValueError, suite.main, ['--input', path])
+
+    def test_check(self):
+        import bench_deep_subtype
+        measures = {}
+        for depth in bench_deep_subtype.DEPTHS:
+            measures['uncached %d' % depth] = 10.0 * depth
+            measures['cached %d' % depth] = 5.0
+        measures['cached 2'] = 30.0
+        self.assertEqual([], suite.check(_results(
+            bench_deep_subtype=measures, bench_a={'x': 1.0})))
+        measures['cached 6'] = 60.0
+        self.assertEqual(['bench_deep_subtype: cached check not faster than '
+                          'uncached at depth 6'],
+                         suite.check(_results(bench_deep_subtype=measures)))
+        path = self._dump('checked.json',
+                          _results(bench_deep_subtype=measures))
+        out, err = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = StringIO(), StringIO()
+        try:
+            self.assertEqual(1, suite.main(['--input', path]))
+            self.assertEqual(1, suite.main(['--input', path,
+                                            '--compare', path]))
+            problems = sys.stderr.getvalue()
+        finally:
+            sys.stdout, sys.stderr = out, err
+        self.assertIn('depth 6', problems)
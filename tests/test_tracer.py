@@ -0,0 +1,95 @@
+import sys
+import threading
+import tracer_cases
+from base_test import BaseTestCase
+from pydyty import tracer
+
+
+class TracerCases(object):
+
+    backend = None
+
+    def setUp(self):
+        super(TracerCases, self).setUp()
+        if self.backend == tracer.BACKEND_MONITORING and \
+                not hasattr(sys, 'monitoring'):
+            self.skipTest('sys.monitoring is not available')
+
+    def trace(self, func, prefixes='tracer_cases'):
+        t = tracer.Tracer(prefixes, backend=self.backend)
+        with t:
+            func()
+        return t
+
+    def test_functions(self):
+        t = self.trace(tracer_cases.run)
+        module_type = t.types['tracer_cases']
+        self.assertIn('run', module_type.attrs)
+        self.assertIn('(int) -> int', str(module_type.attrs['double']))
+        self.assertIn('(str) -> str', str(module_type.attrs['double']))
+        self.assertNotIn('numbers', module_type.attrs)
+
+    def test_exception(self):
+        t = self.trace(tracer_cases.run)
+        module_type = t.types['tracer_cases']
+        self.assertIsNone(module_type.attrs.get('fail'))
+        self.assertEqual('(int) -> int', str(module_type.attrs['recover']))
+        self.assertEqual('(int) -> int', str(module_type.attrs['cleanup']))
+
+    def test_methods(self):
+        t = self.trace(tracer_cases.run)
+        shape_type = t.types['tracer_cases.Shape']
+        self.assertEqual('(float, int) -> float',
+                         str(shape_type.attrs['area']))
+        self.assertEqual('(int) -> Shape', str(shape_type.attrs['unit']))
+        self.assertNotIn('tracer_cases.Square', t.types)
+
+    def test_prefix_filter(self):
+        t = self.trace(tracer_cases.run, prefixes=['other'])
+        self.assertEqual({}, t.types)
+
+    def test_stop(self):
+        t = self.trace(tracer_cases.run)
+        tracer_cases.double(1.5)
+        self.assertFalse(t.running)
+        self.assertNotIn('float', str(t.types['tracer_cases']))
+
+    def test_restart(self):
+        self.trace(tracer_cases.run, prefixes=['other'])
+        t = self.trace(tracer_cases.run)
+        self.assertIn('tracer_cases', t.types)
+
+    def test_threads(self):
+        def run():
+            thread = threading.Thread(target=tracer_cases.run)
+            thread.start()
+            thread.join()
+
+        t = self.trace(run)
+        self.assertIn('double', t.types['tracer_cases'].attrs)
+
+    def test_profile(self):
+        t = self.trace(tracer_cases.run)
+        profile = t.profile()
+        self.assertEqual(str(t.types['tracer_cases.Shape']),
+                         str(profile.classes['tracer_cases.Shape']))
+
+
+class SetprofileTestCase(TracerCases, BaseTestCase):
+
+    backend = tracer.BACKEND_SETPROFILE
+
+
+class MonitoringTestCase(TracerCases, BaseTestCase):
+
+    backend = tracer.BACKEND_MONITORING
+
+
+class BackendTestCase(BaseTestCase):
+
+    def test_default_backend(self):
+        expected = (tracer.BACKEND_MONITORING if hasattr(sys, 'monitoring')
+                    else tracer.BACKEND_SETPROFILE)
+        self.assertEqual(expected, tracer.default_backend())
+        with self.assertRaises(ValueError):
+            tracer.Tracer('x', backend='dtrace')
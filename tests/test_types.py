@@ -1,5 +1,7 @@
 from base_test import BaseTestCase
+from pydyty import recorder
 from pydyty import types
+from pydyty.loc import Location
 
 
 class TypeTestCase(BaseTestCase):
@@ -36,7 +38,29 @@ class TypeTestCase(BaseTestCase):
             pass
 
         t = types.NominalType(ClassA, is_object=True)
-        self.assertEqual('classobj', t.name)
+        self.assertEqual(type(ClassA).__name__, t.name)  # classobj on Py2
+
+    def test_nominal_type_class(self):
+        class ClassA(object):
+            pass
+
+        t = types.NominalType(ClassA(), is_object=True)
+        self.assertIs(ClassA, t.klass)
+        self.assertEqual('ClassA', t.name)
+        self.assertTrue(t.qualname.startswith(__name__ + '.'))
+        self.assertEqual(types.NominalType('int'), types.NominalType.of(1))
+        self.assertIsNone(types.NominalType('int').klass)
+
+    def test_nominal_type_same_name(self):
+        def make():
+            class ClassA(object):
+                pass
+            return ClassA
+
+        a_t = types.NominalType(make()(), is_object=True)
+        b_t = types.NominalType('ClassA')
+        self.assertEqual('ClassA', str(a_t))
+        self.assertNotEqual(a_t, b_t)
 
     def test_union_type_two(self):
         t1 = types.NominalType('A')
@@ -165,6 +189,18 @@ class TypeTestCase(BaseTestCase):
         o_t.add_attr('m1', m3_t)
         self.assertEqual('[m1: ((A) -> B) and ((C) -> D) and ((E) -> F)]', str(o_t))  # noqa
 
+    def test_object_type_add_attr_changed(self):
+        m1_t = types.MethodType([types.NominalType('A')], {},
+                                types.NominalType('B'))
+        m2_t = types.MethodType([types.NominalType('A')], {},
+                                types.NominalType('B'))
+        m3_t = types.MethodType([types.NominalType('C')], {},
+                                types.NominalType('D'))
+        o_t = types.ObjectType()
+        self.assertTrue(o_t.add_attr('m1', m1_t))
+        self.assertFalse(o_t.add_attr('m1', m2_t))
+        self.assertTrue(o_t.add_attr('m1', m3_t))
+
     def test_fusion_type_one_method(self):
         a1_t = types.NominalType('A')
         r_t = types.NominalType('B')
@@ -324,3 +360,335 @@ class TypeEqualityTestCase(BaseTestCase):
         r_m1_t = types.MethodType([r_a1_t], {'k1': r_k1_t}, r_r_t)
         r_o_t = types.ObjectType({'m1': r_m1_t})
         self.assertEqual(l_o_t, r_o_t)
+
+
+class TypeInterningTestCase(BaseTestCase):
+
+    def test_nominal_of(self):
+        t1 = types.NominalType.of(1)
+        t2 = types.NominalType.of(2)
+        self.assertIs(t1, t2)
+        self.assertEqual(types.NominalType('int'), t1)
+        self.assertIsNot(t1, types.NominalType.of('a'))
+        self.assertNotEqual(t1, types.NominalType.of('a'))
+
+    def test_intern_type(self):
+        t1 = types.intern_type(types.NominalType('A'))
+        t2 = types.intern_type(types.NominalType('A'))
+        self.assertIs(t1, t2)
+        self.assertIs(types.intern_type(types.TopType()),
+                      types.intern_type(types.TopType()))
+
+    def test_intern_type_with_location(self):
+        t = types.NominalType('A', loc=object())
+        self.assertIs(t, types.intern_type(t))
+        o_t = types.ObjectType()
+        self.assertIs(o_t, types.intern_type(o_t))
+
+    def test_method_of(self):
+        m1_t = types.MethodType.of([types.NominalType('A')],
+                                   {'k': types.NominalType('B')},
+                                   types.NominalType('C'))
+        m2_t = types.MethodType.of([types.NominalType('A')],
+                                   {'k': types.NominalType('B')},
+                                   types.NominalType('C'))
+        m3_t = types.MethodType.of([types.NominalType('A')],
+                                   {'k': types.NominalType('B')},
+                                   types.NominalType('D'))
+        self.assertIs(m1_t, m2_t)
+        self.assertNotEqual(m1_t, m3_t)
+        self.assertEqual(types.MethodType([types.NominalType('A')],
+                                          {'k': types.NominalType('B')},
+                                          types.NominalType('C')), m1_t)
+
+    def test_method_of_structural_arg(self):
+        o_t = types.ObjectType()
+        m1_t = types.MethodType.of([o_t], {}, types.NominalType('A'))
+        m2_t = types.MethodType.of([o_t], {}, types.NominalType('A'))
+        self.assertIsNot(m1_t, m2_t)
+        self.assertEqual(m1_t, m2_t)
+
+    def test_hash(self):
+        m1_t = types.MethodType([types.NominalType('A')], {},
+                                types.NominalType('B'))
+        m2_t = types.MethodType([types.NominalType('A')], {},
+                                types.NominalType('B'))
+        self.assertEqual(hash(m1_t), hash(m2_t))
+        self.assertEqual(1, len(set([m1_t, m2_t])))
+        i_t = types.IntersectionType([m1_t, types.TopType()])
+        self.assertEqual(hash(i_t),
+                         hash(types.IntersectionType([m2_t,
+                                                      types.TopType()])))
+
+    def test_hash_object_type(self):
+        o_t = types.ObjectType({'x': types.NominalType('A')})
+        m_t = types.MethodType([o_t], {}, types.NominalType('B'))
+        f_t = types.FusionType('F', attrs={'x': types.NominalType('A')})
+        members = set([o_t, m_t, f_t])
+        o_t.add_attr('y', types.NominalType('B'))
+        f_t.add_attr('y', types.NominalType('B'))
+        self.assertIn(o_t, members)
+        self.assertIn(m_t, members)
+        self.assertIn(f_t, members)
+        i_t = types.IntersectionType([m_t])
+        o_t.add_attr('z', types.NominalType('C'))
+        self.assertFalse(i_t.absorb(m_t))
+        self.assertEqual([m_t], i_t.types)
+
+
+class IntersectionAccumulationTestCase(BaseTestCase):
+
+    def _method(self, arg, ret):
+        return types.MethodType([types.NominalType(arg)], {},
+                                types.NominalType(ret))
+
+    def test_distinct_members(self):
+        o_t = types.ObjectType()
+        for i in range(100):
+            o_t.add_attr('m', self._method('A', 'B'))
+            o_t.add_attr('m', self._method('C', 'D'))
+        self.assertEqual('[m: ((A) -> B) and ((C) -> D)]', str(o_t))
+        self.assertEqual(2, len(o_t.attrs['m'].types))
+
+    def test_constructor_drops_duplicates(self):
+        i_t = types.IntersectionType([self._method('A', 'B'),
+                                      self._method('A', 'B')])
+        self.assertEqual('((A) -> B)', str(i_t))
+
+    def test_absorb(self):
+        i_t = types.IntersectionType([self._method('A', 'B'),
+                                      self._method('C', 'D')])
+        self.assertFalse(i_t.absorb(self._method('C', 'D')))
+        self.assertTrue(i_t.absorb(self._method('E', 'F')))
+        self.assertEqual(3, len(i_t.types))
+
+    def test_subsumed_member_is_replaced(self):
+        i_t = types.IntersectionType([self._method('A', 'B'),
+                                      self._method('C', 'D')])
+        wider = types.MethodType(
+            [types.UnionType([types.NominalType('A'),
+                              types.NominalType('E')])],
+            {}, types.NominalType('B'))
+        self.assertTrue(i_t.absorb(wider))
+        self.assertEqual('((C) -> D) and (((A) or (E)) -> B)', str(i_t))
+        self.assertFalse(i_t.absorb(self._method('A', 'B')))
+
+    def test_saturation(self):
+        prev = types.IntersectionType.max_types
+        types.IntersectionType.max_types = 2
+        try:
+            o_t = types.ObjectType()
+            o_t.add_attr('m', self._method('A', 'B'))
+            o_t.add_attr('m', self._method('C', 'D'))
+            self.assertTrue(o_t.add_attr('m', self._method('E', 'F')))
+            i_t = o_t.attrs['m']
+            self.assertTrue(i_t.saturated)
+            self.assertEqual('(((A) or (C) or (E)) -> (B) or (D) or (F))',
+                             str(i_t))
+            self.assertFalse(o_t.add_attr('m', self._method('C', 'D')))
+            self.assertTrue(o_t.add_attr('m', self._method('G', 'B')))
+            self.assertEqual(1, len(i_t.types))
+        finally:
+            types.IntersectionType.max_types = prev
+
+    def test_saturated_absorb(self):
+        prev = types.IntersectionType.max_types
+        types.IntersectionType.max_types = 2
+
+        def method(arg, ret):
+            return types.MethodType.of([types.NominalType(arg)], {},
+                                       types.NominalType(ret))
+
+        try:
+            sigs = [method('A', 'B'), method('C', 'D'), method('E', 'F')]
+            o_t = types.ObjectType()
+            for sig in sigs:
+                o_t.add_attr('m', sig)
+            i_t = o_t.attrs['m']
+            summary = i_t.types[0]
+            for sig in sigs:
+                self.assertIn(sig, i_t._members)
+                self.assertTrue(recorder._is_known(o_t, 'm', sig))
+            # Covered by the summary, though never seen.
+            self.assertFalse(i_t.absorb(method('A', 'D')))
+            located = types.MethodType(
+                [types.NominalType('C')], {}, types.NominalType('F'),
+                loc=Location.create(('foo', 1, 'bar', 'x = 1')))
+            self.assertFalse(i_t.absorb(located))
+            self.assertIs(summary, i_t.types[0])
+            self.assertTrue(i_t.absorb(method('G', 'B')))
+            self.assertEqual('(((A) or (C) or (E) or (G)) -> '
+                             '(B) or (D) or (F))', str(i_t))
+        finally:
+            types.IntersectionType.max_types = prev
+
+    def test_saturated_absorb_object_args(self):
+        prev = types.IntersectionType.max_types
+        types.IntersectionType.max_types = 1
+        try:
+            i_t = types.IntersectionType([])
+            for ret in ('A', 'B', 'A', 'B', 'C'):
+                i_t.absorb(types.MethodType([types.ObjectType()], {},
+                                            types.NominalType(ret)))
+            self.assertFalse(i_t.absorb(types.MethodType(
+                [types.ObjectType()], {}, types.NominalType('B'))))
+            self.assertEqual('(([]) -> (A) or (B) or (C))', str(i_t))
+        finally:
+            types.IntersectionType.max_types = prev
+
+    def test_saturation_to_top(self):
+        prev = types.IntersectionType.max_types
+        types.IntersectionType.max_types = 1
+        try:
+            i_t = types.IntersectionType([self._method('A', 'B')])
+            i_t.absorb(types.MethodType([], {}, types.NominalType('C')))
+            self.assertEqual('(<<Top>>)', str(i_t))
+            self.assertFalse(i_t.absorb(self._method('D', 'E')))
+        finally:
+            types.IntersectionType.max_types = prev
+
+
+class TypeLocationTestCase(BaseTestCase):
+
+    def test_add_loc_does_not_share(self):
+        loc1 = Location.create(('foo', 1, 'bar', 'x = 1'))
+        loc2 = Location.create(('foo', 2, 'bar', 'y = 1'))
+        t1 = types.NominalType('A', loc=loc1)
+        t2 = types.NominalType('B', loc=loc2)
+        i_t = types.IntersectionType([])
+        i_t.add_type(t1)
+        i_t.add_type(t2)
+        i_t.add_type(t1)
+        self.assertEqual(1, len(loc1))
+        self.assertEqual(2, len(i_t.loc))
+        self.assertEqual(2, i_t.loc.count(loc1.first))
+
+    def test_add_attr_counts_repeated_type(self):
+        def method(arg, line):
+            loc = Location.create(('foo', line, 'bar', 'x = 1'))
+            return types.MethodType([types.NominalType(arg)], {},
+                                    types.NominalType(arg), loc=loc)
+
+        o_t = types.ObjectType()
+        o_t.add_attr('m', method('A', 1))
+        self.assertFalse(o_t.add_attr('m', method('A', 2)))
+        self.assertEqual(2, o_t.attrs['m'].loc.hits)
+        o_t.add_attr('m', method('B', 3))
+        self.assertFalse(o_t.add_attr('m', method('A', 1)))
+        self.assertEqual(3, o_t.attrs['m'].types[0].loc.hits)
+
+
+class NominalWideningTestCase(BaseTestCase):
+
+    def test_widen_builtin(self):
+        o_t = types.ObjectType()
+        self.assertTrue(o_t.add_attr('x', types.NominalType.of(True)))
+        self.assertTrue(o_t.add_attr('x', types.NominalType.of(1)))
+        self.assertEqual('[x: int]', str(o_t))
+        self.assertFalse(o_t.add_attr('x', types.NominalType.of(False)))
+        self.assertEqual('[x: int]', str(o_t))
+
+    def test_widen_subclass(self):
+        class Base(object):
+            pass
+
+        class Sub(Base):
+            pass
+
+        o_t = types.ObjectType()
+        o_t.add_attr('x', types.NominalType.of(Sub()))
+        o_t.add_attr('x', types.NominalType.of(Base()))
+        self.assertIs(Base, o_t.attrs['x'].klass)
+
+    def test_unrelated_intersect(self):
+        o_t = types.ObjectType()
+        o_t.add_attr('x', types.NominalType.of(1))
+        o_t.add_attr('x', types.NominalType.of(''))
+        self.assertIsInstance(o_t.attrs['x'], types.IntersectionType)
+
+
+class RenderingTestCase(BaseTestCase):
+
+    def _method(self, arg, ret):
+        return types.MethodType([arg], {}, ret)
+
+    def test_cached(self):
+        o_t = types.ObjectType({'m': self._method(types.NominalType('A'),
+                                                  types.NominalType('B'))})
+        s = str(o_t)
+        self.assertEqual('[m: (A) -> B]', s)
+        self.assertIs(s, str(o_t))
+
+    def test_add_attr(self):
+        o_t = types.ObjectType()
+        self.assertEqual('[]', str(o_t))
+        o_t.add_attr('x', types.NominalType('A'))
+        self.assertEqual('[x: A]', str(o_t))
+        o_t.add_attr('m', self._method(types.NominalType('A'),
+                                       types.NominalType('B')))
+        o_t.add_attr('m', self._method(types.NominalType('C'),
+                                       types.NominalType('D')))
+        self.assertEqual('[m: ((A) -> B) and ((C) -> D), x: A]', str(o_t))
+        o_t.add_empty_method('e', 0, [])
+        self.assertEqual('[e: () -> <<Bottom>>, m: ((A) -> B) and '
+                         '((C) -> D), x: A]', str(o_t))
+
+    def test_propagates_to_parents(self):
+        arg_t = types.ObjectType()
+        method_t = self._method(arg_t, types.NominalType('B'))
+        cls_t = types.ObjectType()
+        cls_t.add_attr('m', method_t)
+        other_t = types.FusionType('F', {'m': method_t})
+        self.assertEqual('[m: ([]) -> B]', str(cls_t))
+        self.assertEqual('F[m: ([]) -> B]', str(other_t))
+        arg_t.add_attr('x', types.NominalType('A'))
+        self.assertEqual('[m: ([x: A]) -> B]', str(cls_t))
+        self.assertEqual('F[m: ([x: A]) -> B]', str(other_t))
+
+    def test_intersection(self):
+        cls_t = types.ObjectType()
+        cls_t.add_attr('m', self._method(types.NominalType('A'),
+                                         types.NominalType('B')))
+        cls_t.add_attr('m', self._method(types.NominalType('C'),
+                                         types.NominalType('D')))
+        str(cls_t)
+        cls_t.add_attr('m', self._method(types.NominalType('E'),
+                                         types.NominalType('F')))
+        self.assertEqual('[m: ((A) -> B) and ((C) -> D) and ((E) -> F)]',
+                         str(cls_t))
+        u_t = types.UnionType([types.NominalType('A')])
+        self.assertEqual('(A)', str(u_t))
+        u_t.add_type(types.NominalType('B'))
+        self.assertEqual('(A) or (B)', str(u_t))
+
+    def test_change_while_rendering(self):
+        arg_t = types.ObjectType()
+        str(arg_t)
+
+        class Changing(types.NominalType):
+            def __str__(self):
+                arg_t.add_attr('x', types.NominalType('A'))
+                return self.name
+
+        method_t = types.MethodType([arg_t, Changing('C')], {},
+                                    types.NominalType('B'))
+        self.assertEqual('([], C) -> B', str(method_t))
+        self.assertEqual('([x: A], C) -> B', str(method_t))
+
+    def test_dead_parents(self):
+        arg_t = types.ObjectType()
+        for _ in range(3):
+            str(self._method(arg_t, types.NominalType('B')))
+        method_t = self._method(arg_t, types.NominalType('C'))
+        self.assertEqual('([]) -> C', str(method_t))
+        self.assertEqual(1, len([r for r in arg_t._parents
+                                 if r() is not None]))
+        self.assertTrue(len(arg_t._parents) <= 2)
+
+    def test_linked_when_rendered(self):
+        arg_t = types.ObjectType()
+        method_t = self._method(arg_t, types.NominalType('B'))
+        self.assertIsNone(arg_t._parents)
+        str(method_t)
+        self.assertIs(method_t, arg_t._parents[0]())
+        self.assertIsNone(types.NominalType('B')._parents)
@@ -1,3 +1,5 @@
+import abc
+import random
 from base_test import BaseTestCase
 from pydyty import types
 from pydyty.typing import Typing
@@ -30,6 +32,36 @@ class TestTyping(BaseTestCase):
         r_t = types.NominalType('A')
         self.assertTrue(Typing.is_subtype(l_t, r_t))
 
+    def test_nominal_subclass(self):
+        class Base(object):
+            pass
+
+        class Sub(Base):
+            pass
+
+        base_t = types.NominalType.of(Base())
+        sub_t = types.NominalType.of(Sub())
+        self.assertTrue(Typing.is_subtype(sub_t, base_t))
+        self.assertFalse(Typing.is_subtype(base_t, sub_t))
+        self.assertTrue(Typing.is_subtype(types.NominalType.of(True),
+                                          types.NominalType('int')))
+        self.assertTrue(Typing.is_subtype(sub_t, types.NominalType('object')))
+        self.assertFalse(Typing.is_subtype(types.NominalType('int'),
+                                           types.NominalType.of(True)))
+
+    def test_nominal_abc(self):
+        Base = abc.ABCMeta('Base', (object,), {})
+
+        class Impl(object):
+            pass
+
+        base_t = types.NominalType.of(Base())
+        impl_t = types.NominalType.of(Impl())
+        self.assertFalse(Typing.is_subtype(impl_t, base_t))
+        self.assertFalse(Typing.is_subtype(impl_t, base_t))
+        Base.register(Impl)
+        self.assertTrue(Typing.is_subtype(impl_t, base_t))
+
     def test_method_and_method_no_args_nominal_ret(self):
         l_rt = types.NominalType('A')
         l_mt = types.MethodType([], {}, l_rt)
@@ -43,3 +75,202 @@ class TestTyping(BaseTestCase):
         r_rt = types.NominalType('B')
         r_mt = types.MethodType([], {}, r_rt)
         self.assertFalse(Typing.is_subtype(l_mt, r_mt))
+
+    def test_union_type(self):
+        a_t = types.NominalType('A')
+        b_t = types.NominalType('B')
+        u_t = types.UnionType([a_t, b_t])
+        self.assertTrue(Typing.is_subtype(a_t, u_t))
+        self.assertFalse(Typing.is_subtype(u_t, a_t))
+        self.assertTrue(Typing.is_subtype(u_t, u_t))
+        self.assertTrue(Typing.is_subtype(types.UnionType([a_t]), a_t))
+
+    def test_cached_result(self):
+        a_t = types.NominalType.of(1)
+        b_t = types.NominalType.of('')
+        l_mt = types.MethodType.of([a_t], {}, a_t)
+        r_mt = types.MethodType.of([b_t], {}, a_t)
+        Typing.clear_cache()
+        self.assertFalse(Typing.is_subtype(l_mt, r_mt))
+        self.assertIn((l_mt, r_mt), Typing._young)
+        self.assertFalse(Typing.is_subtype(l_mt, r_mt))
+        self.assertTrue(Typing.is_subtype(l_mt, l_mt))
+
+    def test_cache_generations(self):
+        prev = Typing.cache_size
+        Typing.cache_size = 4
+        try:
+            Typing.clear_cache()
+            ts = [types.NominalType.of(v) for v in (1, '', 1.0, [])]
+            Typing.is_subtype(ts[0], ts[1])
+            Typing.is_subtype(ts[0], ts[2])
+            Typing.is_subtype(ts[0], ts[3])
+            self.assertIn((ts[0], ts[1]), Typing._old)
+            self.assertIn((ts[0], ts[3]), Typing._young)
+            Typing.is_subtype(ts[0], ts[1])
+            self.assertIn((ts[0], ts[1]), Typing._young)
+        finally:
+            Typing.cache_size = prev
+            Typing.clear_cache()
+
+    def test_cache_disabled(self):
+        prev = Typing.cache_size
+        Typing.cache_size = 0
+        try:
+            Typing.clear_cache()
+            a_t = types.NominalType.of(1)
+            b_t = types.NominalType.of('')
+            self.assertFalse(Typing.is_subtype(a_t, b_t))
+            self.assertEqual({}, Typing._young)
+        finally:
+            Typing.cache_size = prev
+
+    def test_non_canonical_not_cached(self):
+        Typing.clear_cache()
+        l_t = types.ObjectType()
+        r_t = types.ObjectType()
+        self.assertTrue(Typing.is_subtype(l_t, r_t))
+        self.assertEqual({}, Typing._young)
+
+    def test_object_width_subtype(self):
+        a_t = types.NominalType('A')
+        l_t = types.ObjectType()
+        l_t.add_attr('x', a_t)
+        l_t.add_attr('y', a_t)
+        r_t = types.ObjectType()
+        r_t.add_attr('x', a_t)
+        self.assertTrue(Typing.is_subtype(l_t, r_t))
+        self.assertFalse(Typing.is_subtype(r_t, l_t))
+
+    def test_recursive_object_types(self):
+        l_t = types.ObjectType()
+        l_t.add_attr('next', l_t)
+        r_t = types.ObjectType()
+        r_t.add_attr('next', r_t)
+        self.assertTrue(Typing.is_subtype(l_t, r_t))
+
+    def test_shared_object_types(self):
+        def nested(depth, leaf):
+            t = leaf
+            for _ in range(depth):
+                t = types.ObjectType(dict(('m%d' % i, types.MethodType(
+                    [], {}, t)) for i in range(4)))
+            return t
+
+        a_t = types.NominalType('A')
+        # 4 ** 40 paths; each pair of levels is compared once.
+        self.assertTrue(Typing.is_subtype(nested(40, a_t), nested(40, a_t)))
+        self.assertFalse(Typing.is_subtype(nested(40, a_t),
+                                           nested(40, types.NominalType('B'))))
+
+    def test_recursive_object_types_not_remembered(self):
+        # M <: N holds only if L <: R, which does not. It is first reached
+        # while L <: R is being compared, and must not be remembered as
+        # holding then.
+        l_t = types.ObjectType()
+        m_t = types.ObjectType({'p': l_t})
+        l_t.add_attr('a', m_t)
+        l_t.add_attr('b', types.NominalType('A'))
+        r_t = types.ObjectType()
+        n_t = types.ObjectType({'p': r_t})
+        r_t.add_attr('a', n_t)
+        r_t.add_attr('b', types.NominalType('B'))
+        root_l = types.ObjectType({'x': l_t, 'y': m_t})
+        root_r = types.ObjectType({
+            'x': types.UnionType([r_t, types.ObjectType()]), 'y': n_t})
+        self.assertFalse(Typing.is_subtype(m_t, n_t))
+        self.assertFalse(Typing.is_subtype(root_l, root_r))
+
+    def test_object_and_nominal(self):
+        o_t = types.ObjectType()
+        o_t.add_attr('x', types.NominalType('A'))
+        n_t = types.NominalType('A')
+        self.assertFalse(Typing.is_subtype(o_t, n_t))
+        self.assertFalse(Typing.is_subtype(n_t, o_t))
+
+    def test_fusion_type(self):
+        a_t = types.NominalType('A')
+        f_t = types.FusionType('A', attrs={'x': a_t})
+        o_t = types.ObjectType()
+        o_t.add_attr('x', a_t)
+        self.assertTrue(Typing.is_subtype(f_t, a_t))
+        self.assertTrue(Typing.is_subtype(f_t, o_t))
+        self.assertFalse(Typing.is_subtype(o_t, f_t))
+        self.assertFalse(Typing.is_subtype(f_t, types.NominalType('B')))
+        self.assertFalse(Typing.is_subtype(
+            types.FusionType('A', attrs={}), f_t))
+
+    def test_intersection_type(self):
+        a_t = types.NominalType('A')
+        b_t = types.NominalType('B')
+        i_t = types.IntersectionType([a_t, b_t])
+        self.assertTrue(Typing.is_subtype(i_t, a_t))
+        self.assertFalse(Typing.is_subtype(a_t, i_t))
+        self.assertTrue(Typing.is_subtype(types.BottomType(), i_t))
+        self.assertTrue(Typing.is_subtype(i_t, types.UnionType([a_t])))
+
+    def test_unknown_kinds(self):
+        class CustomNominal(types.NominalType):
+            pass
+        self.assertTrue(Typing.is_subtype(CustomNominal('A'),
+                                          types.NominalType('A')))
+        self.assertFalse(Typing.is_subtype(types.NominalType('A'), None))
+
+
+class TestTypingProperties(BaseTestCase):
+    """ Checks that subtyping is reflexive and transitive over randomly
+    generated types."""
+
+    seed = 20170311
+    count = 60
+
+    def gen(self, rand, depth=2):
+        leaves = [types.TopType, types.BottomType,
+                  lambda: types.NominalType(rand.choice('ABC'))]
+        if depth == 0:
+            return rand.choice(leaves)()
+        kind = rand.randrange(8)
+        sub = lambda: self.gen(rand, depth - 1)  # noqa
+        if kind == 0:
+            return types.MethodType([sub() for _ in range(rand.randrange(3))],
+                                    {}, sub())
+        elif kind == 1:
+            names = rand.sample('xyz', rand.randrange(3))
+            return types.ObjectType(dict((name, sub()) for name in names))
+        elif kind == 2:
+            name = rand.choice('AB')
+            names = rand.sample('xy', rand.randrange(3))
+            return types.FusionType(name, attrs=dict(
+                (n, sub()) for n in names))
+        elif kind == 3:
+            return types.UnionType([sub() for _ in range(rand.randint(1, 3))])
+        elif kind == 4:
+            return types.IntersectionType(
+                [sub() for _ in range(rand.randint(1, 3))])
+        return rand.choice(leaves)()
+
+    def population(self):
+        rand = random.Random(self.seed)
+        return [self.gen(rand) for _ in range(self.count)]
+
+    def test_reflexive(self):
+        for t in self.population():
+            self.assertTrue(Typing.is_subtype(t, t), str(t))
+
+    def test_reflexive_on_copies(self):
+        first = self.population()
+        second = self.population()
+        for l_t, r_t in zip(first, second):
+            self.assertTrue(Typing.is_subtype(l_t, r_t), str(l_t))
+
+    def test_transitive(self):
+        population = self.population()
+        below = dict((i, [j for j, u in enumerate(population)
+                          if Typing.is_subtype(t, u)])
+                     for i, t in enumerate(population))
+        for i, t in enumerate(population):
+            for j in below[i]:
+                for k in below[j]:
+                    self.assertTrue(
+                        Typing.is_subtype(t, population[k]),
+                        '%s <: %s <: %s' % (t, population[j], population[k]))
@@ -0,0 +1,60 @@
+""" Module traced by test_tracer."""
+
+
+def double(x):
+    return x * 2
+
+
+def fail(x):
+    raise ValueError(x)
+
+
+def recover(x):
+    try:
+        raise KeyError(x)
+    except KeyError:
+        return x
+
+
+def cleanup(x):
+    try:
+        return 1 // x
+    finally:
+        pass
+
+
+def numbers(n):
+    for i in range(n):
+        yield i
+
+
+class Shape(object):
+
+    def area(self, scale, offset=0):
+        return 2 * scale + offset
+
+    @classmethod
+    def unit(cls, n):
+        return cls()
+
+
+class Square(Shape):
+    pass
+
+
+def run():
+    double(2)
+    double('a')
+    try:
+        fail(1)
+    except ValueError:
+        pass
+    recover(1)
+    cleanup(1)
+    try:
+        cleanup(0)
+    except ZeroDivisionError:
+        pass
+    list(numbers(2))
+    Square().area(1.0)
+    Shape.unit(1)